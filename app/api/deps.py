@@ -1,13 +1,13 @@
-from typing import Generator, Annotated, Optional # Optional اضافه شد
+from typing import Any, Generator, Annotated, Optional # Optional اضافه شد
 import uuid # برای استفاده از uuid در صورت نیاز
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from jose import JWTError
 
 from app.db.session import SessionLocal 
 from app.core.config import settings
+from app.core.rate_limit import rate_limiter
 from app.core.security import decode_access_token 
 from app.models.user import User
 from app.schemas.user import UserInDB 
@@ -75,4 +75,41 @@ def get_current_admin(current_user: Annotated[User, Depends(get_current_user)])
 
 # ------------------- Alias های نقش ها -------------------
 CurrentUser = Annotated[User, Depends(get_current_user)]
-CurrentAdmin = Annotated[User, Depends(get_current_admin)]
\ No newline at end of file
+CurrentAdmin = Annotated[User, Depends(get_current_admin)]
+
+# ------------------- Dependencies محدودیت نرخ -------------------
+
+def limit_by_ip(name: str) -> Any:
+    """محدودیت نرخ بودجه name بر اساس IP کلاینت (برای مسیرهای بدون احراز هویت مثل login)."""
+    def dependency(request: Request) -> None:
+        client_ip = request.client.host if request.client else "unknown"
+        rate_limiter.hit(name, f"ip:{client_ip}")
+    return Depends(dependency)
+
+def limit_by_user(name: str) -> Any:
+    """محدودیت نرخ بودجه name بر اساس شناسه کاربر احراز هویت شده."""
+    def dependency(current_user: CurrentUser) -> None:
+        rate_limiter.hit(name, f"user:{current_user.id}")
+    return Depends(dependency)
+
+# ------------------- Dependency پروفایل درخواست -------------------
+
+def authorize_profile_capture(request: Request, db: DbDependency) -> None:
+    """
+    پروفایلی که با هدر X-Profile-Token درخواست شده فقط برای ادمین انجام می شود (داشتن راز مشترک کافی نیست).
+    برای غیر ادمین خطا داده نمی شود؛ درخواست بدون پروفایل اجرا می شود.
+    """
+    from app.core.profiling import current_capture
+
+    capture = current_capture()
+    if capture is None or capture.reason != "header":
+        return
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    payload = decode_access_token(token) if scheme.lower() == "bearer" and token else None
+    try:
+        user_id = uuid.UUID(payload["sub"]) if payload and payload.get("sub") else None
+    except ValueError:
+        user_id = None
+    user = db.get(User, user_id) if user_id else None
+    if user is None or user.role != "admin":
+        capture.reject()
@@ -0,0 +1,54 @@
+import os
+import stat
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.core.metrics import registry
+from app.services import image_variants
+from app.services.access_tracker import access_tracker
+
+IMAGE_RESPONSES = registry.counter(
+    "image_responses_total",
+    "Garment image responses by served format (png, webp, avif).",
+    ("format",),
+)
+
+
+class NegotiatedImageFiles(StaticFiles):
+    """
+    سرو تصاویر لباس با انتخاب فرمت بر اساس هدر Accept.
+
+    برای درخواست فایل‌های PNG، اگر کلاینت WebP یا AVIF را صریحاً بپذیرد نسخه متناظر
+    (در صورت نبود، همان لحظه ساخته و کنار PNG ذخیره می شود) با همان URL سرو می شود.
+    همه پاسخ‌های PNG هدر Vary: Accept دارند تا کش‌های میانی نسخه‌ها را جدا نگه دارند.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD") or not path.lower().endswith(".png"):
+            return await super().get_response(path, scope)
+
+        full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path)
+        if not stat_result or not stat.S_ISREG(stat_result.st_mode):
+            raise HTTPException(status_code=404)
+        access_tracker.record(path, "image")
+
+        request_headers = Headers(scope=scope)
+        media_type, served_format = "image/png", "png"
+        variant = image_variants.negotiate(request_headers.get("accept"))
+        if variant is not None:
+            variant_path = await anyio.to_thread.run_sync(image_variants.ensure_variant, full_path, variant)
+            if variant_path is not None:
+                full_path, stat_result = variant_path, await anyio.to_thread.run_sync(os.stat, variant_path)
+                media_type, served_format = variant.media_type, variant.name
+
+        response = FileResponse(full_path, stat_result=stat_result, media_type=media_type)
+        response.headers["Vary"] = "Accept"
+        IMAGE_RESPONSES.inc(format=served_format)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,133 @@
+from datetime import date, datetime
+from typing import Any, Literal, Optional
+import uuid
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+
+from app.api.deps import CurrentAdmin, DbDependency
+from app.core.profiling import profile_store
+from app.schemas.stats import ARSessionHourlyCount, DressDailyCount, StatsRebuildResult, UserDressCount
+from app.services.export_service import export_service, EXPORT_MEDIA_TYPES
+from app.services.stats_service import stats_service
+
+router = APIRouter()
+
+# ------------------- پروفایل‌های ذخیره شده درخواست‌ها -------------------
+@router.get("/profiles", summary="List Request Profiles", description="""
+<b style="color: #0277bd;">GET</b>: **Profiling**.
+- **Logic**: Lists stored request profiles (newest first). Requests are profiled when an admin sends them with a valid `X-Profile-Token` header, or when they fall within `PROFILING_SAMPLE_RATE`. Only one request at a time is traced with cProfile; concurrent ones get the stack-sampler flamegraph only (`cprofile: false`, no `/pstats`).
+- **Security**: Admin role required.
+""")
+def list_profiles(current_admin: CurrentAdmin) -> Any:
+    """فهرست پروفایل‌های ذخیره شده در بافر حلقوی."""
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}/flamegraph", response_class=PlainTextResponse, summary="Download Collapsed Stacks", description="""
+<b style="color: #0277bd;">GET</b>: **Profiling**.
+- **Logic**: Returns sampled stacks in collapsed format (`frame;frame;frame count`), ready for `flamegraph.pl` or speedscope.
+- **Security**: Admin role required.
+""")
+def get_profile_flamegraph(profile_id: uuid.UUID, current_admin: CurrentAdmin) -> Any:
+    """خروجی collapsed-stack یک پروفایل."""
+    path = profile_store.get_file(profile_id, ".collapsed")
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found.")
+    return FileResponse(path, media_type="text/plain; charset=utf-8")
+
+@router.get("/profiles/{profile_id}/pstats", summary="Download pstats File", description="""
+<b style="color: #0277bd;">GET</b>: **Profiling**.
+- **Logic**: Returns the cProfile output of the request; open it with `python -m pstats` or snakeviz.
+- **Security**: Admin role required.
+""")
+def get_profile_pstats(profile_id: uuid.UUID, current_admin: CurrentAdmin) -> Any:
+    """فایل pstats یک پروفایل."""
+    path = profile_store.get_file(profile_id, ".pstats")
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found.")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
+
+# ------------------- خروجی حجیم کاربران و لباس‌ها -------------------
+@router.get("/export/{entity}", summary="Bulk Export", response_class=StreamingResponse, description="""
+<b style="color: #0277bd;">GET</b>: **Analytics Export**.
+- **Logic**: Streams every `users` or `dresses` row ordered by `created_at` as NDJSON (default) or CSV. Rows are read in `EXPORT_BATCH_SIZE` batches from a server-side cursor, so memory stays constant regardless of table size. Password hashes are never exported.
+- **Incremental exports**: `created_from` is inclusive and `created_to` exclusive, so back-to-back windows never overlap.
+- **Compression**: `gzip=true` compresses while streaming and returns a `.gz` attachment.
+- **Security**: Admin role required.
+""")
+def export_entity(
+    entity: Literal["users", "dresses"],
+    db: DbDependency,
+    current_admin: CurrentAdmin,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    gzip: bool = False
+) -> Any:
+    """خروجی NDJSON یا CSV یک جدول به صورت Stream (اختیاری با gzip)."""
+    filename = f"{entity}.{format}"
+    media_type = EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        filename, media_type = f"{filename}.gz", "application/gzip"
+
+    chunks = export_service.stream_export(db, entity, format, created_from, created_to, compress=gzip)
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
+
+# ------------------- آمار تجمیعی داشبورد -------------------
+@router.get("/stats/dresses-per-day", response_model=list[DressDailyCount], summary="Dresses Per Gender Per Day", description="""
+<b style="color: #0277bd;">GET</b>: **Dashboard Statistics**.
+- **Logic**: Number of existing dresses by creation day (UTC) and gender, read from the `dress_daily_stats` rollup. The rollup is updated in the same transaction as uploads, edits and deletes, so the cost depends on the number of days, not on the size of `dresses`.
+- **Range**: `start` is inclusive and `end` exclusive; both optional.
+- **Security**: Admin role required.
+""")
+def dresses_per_day(
+    db: DbDependency,
+    current_admin: CurrentAdmin,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    gender: Optional[Literal["male", "female"]] = None
+) -> Any:
+    """تعداد لباس‌ها به تفکیک روز و جنسیت."""
+    return stats_service.dresses_per_day(db, start, end, gender)
+
+@router.get("/stats/uploads-per-user", response_model=list[UserDressCount], summary="Uploads Per User", description="""
+<b style="color: #0277bd;">GET</b>: **Dashboard Statistics**.
+- **Logic**: Users with the most dresses (highest first), read from the `user_dress_stats` rollup.
+- **Security**: Admin role required.
+""")
+def uploads_per_user(
+    db: DbDependency,
+    current_admin: CurrentAdmin,
+    limit: int = Query(50, ge=1, le=1000)
+) -> Any:
+    """کاربران با بیشترین تعداد لباس."""
+    return stats_service.dresses_per_user(db, limit)
+
+@router.get("/stats/ar-sessions-per-hour", response_model=list[ARSessionHourlyCount], summary="AR Sessions Per Hour", description="""
+<b style="color: #0277bd;">GET</b>: **Dashboard Statistics**.
+- **Logic**: Number of AR sessions started in each hour (UTC), read from the `ar_session_hourly_stats` rollup. Hours without sessions are omitted.
+- **Range**: `start` is inclusive and `end` exclusive; both optional.
+- **Security**: Admin role required.
+""")
+def ar_sessions_per_hour(
+    db: DbDependency,
+    current_admin: CurrentAdmin,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Any:
+    """تعداد جلسات AR به تفکیک ساعت."""
+    return stats_service.ar_sessions_per_hour(db, start, end)
+
+@router.post("/stats/rebuild", response_model=StatsRebuildResult, summary="Rebuild Statistics", description="""
+<b style="color: #0277bd;">POST</b>: **Dashboard Statistics**.
+- **Logic**: Recomputes the dress rollups from the `dresses` table in one transaction (same as `python -m app.services.stats_service rebuild`). AR session counts have no raw table and are kept.
+- **Security**: Admin role required.
+""")
+def rebuild_stats(db: DbDependency, current_admin: CurrentAdmin) -> Any:
+    """بازسازی آمار لباس‌ها از جداول خام."""
+    result = stats_service.rebuild(db)
+    db.commit()
+    return result
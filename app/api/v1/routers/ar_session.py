@@ -1,17 +1,22 @@
 from typing import Any
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 import uuid
 
-from app.api.deps import CurrentUser, DbDependency
-from app.schemas.dress import ARSessionCreate, ARSessionStatus
+from app.api.deps import CurrentUser, DbDependency, limit_by_user
+from app.core.profiling import ProfiledRoute
+from app.core.metrics import timed
+from app.schemas.dress import ARArtifactList, ARSessionCreate, ARSessionStatus
+from app.services.ar_artifacts import AR_ARTIFACT_RESPONSES, artifact_store
 from app.services.ar_orchestrator import ar_orchestrator
 from app.services.dress_service import dress_service
 from app.models.dress import Dress
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # ------------------- ۴.۳.۱ و ۴.۳.۲ اجرای کد پایتون -------------------
-@router.post("/start", response_model=ARSessionStatus)
+@router.post("/start", response_model=ARSessionStatus, dependencies=[limit_by_user("ar_start")])
 def start_virtual_try_on(
     session_in: ARSessionCreate, 
     db: DbDependency,
@@ -22,7 +27,8 @@ def start_virtual_try_on(
     """
     
     # ۱. بازیابی لباس انتخاب شده
-    dress = dress_service.get_dress_by_id(db, session_in.dress_id)
+    with timed("ar.ownership_lookup"):
+        dress = dress_service.get_dress_by_id(db, session_in.dress_id)
     
     if not dress:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Selected dress not found.")
@@ -31,7 +37,75 @@ def start_virtual_try_on(
     if dress.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot run AR for a dress you didn't upload.")
 
+    # تصویر نهایی لباس تا پایان پردازش در صف کارها وجود ندارد
+    if dress.status != "ready":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Dress image is not ready (status: {dress.status}).")
+
     # ۳. شروع فرآیند AR
     session_status = ar_orchestrator.start_ar_session(db, dress)
     
-    return session_status
\ No newline at end of file
+    return session_status
+
+def _get_owned_session(session_id: uuid.UUID, current_user) -> dict:
+    """جلسه از وضعیت مشترک (مستقل از worker اجرا کننده)؛ برای غیر مالک 404 برمی گردد."""
+    session = ar_orchestrator.get_session(session_id)
+    if not session or session["user_id"] != str(current_user.id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="AR session not found.")
+    return session
+
+@router.get("/{session_id}", response_model=ARSessionStatus)
+def get_virtual_try_on_status(session_id: uuid.UUID, current_user: CurrentUser) -> Any:
+    """
+    وضعیت یک جلسه پرو مجازی؛ از وضعیت مشترک خوانده می شود و به worker اجرا کننده وابسته نیست.
+    """
+    session = _get_owned_session(session_id, current_user)
+
+    running = ar_orchestrator.is_session_running(session_id)
+    return ARSessionStatus(
+        session_id=session_id,
+        status="running" if running else "finished",
+        message=f"PID: {session['pid']}" if session["pid"] else None,
+    )
+
+# ------------------- دریافت خروجی موتور AR -------------------
+@router.get("/{session_id}/artifacts", response_model=ARArtifactList)
+def list_try_on_artifacts(session_id: uuid.UUID, current_user: CurrentUser) -> Any:
+    """فهرست فایل‌های خروجی جلسه؛ تا وقتی موتور در حال اجراست complete=False است و فهرست رشد می کند."""
+    _get_owned_session(session_id, current_user)
+    return ARArtifactList(
+        session_id=session_id,
+        complete=not ar_orchestrator.is_session_running(session_id),
+        artifacts=artifact_store.list_artifacts(str(session_id)),
+    )
+
+@router.get("/{session_id}/artifacts/{name:path}")
+async def get_try_on_artifact(session_id: uuid.UUID, name: str, request: Request, current_user: CurrentUser) -> Response:
+    """
+    دریافت یک فایل خروجی با پشتیبانی از HTTP Range.
+    اگر موتور هنوز در حال نوشتن باشد، درخواست بدون Range داده موجود را فوراً و بقیه را همزمان با نوشته شدن
+    (Chunked) دریافت می کند؛ درخواست Range فقط بایت‌های نوشته شده تا همان لحظه را برمی گرداند.
+    """
+    await run_in_threadpool(_get_owned_session, session_id, current_user)
+    resolved = await run_in_threadpool(artifact_store.resolve, str(session_id), name)
+    if resolved is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Artifact not found.")
+    path, stat_result = resolved
+
+    running = await run_in_threadpool(ar_orchestrator.is_session_running, session_id)
+    media_type = artifact_store.media_type(name)
+    headers = {
+        "X-Artifact-Complete": "false" if running else "true",
+        "Cache-Control": "private, no-store" if running else "private, max-age=3600",
+    }
+
+    if running and "range" not in request.headers:
+        AR_ARTIFACT_RESPONSES.inc(mode="follow")
+        return StreamingResponse(
+            artifact_store.follow(path, lambda: ar_orchestrator.is_session_running(session_id)),
+            media_type=media_type,
+            headers={**headers, "Accept-Ranges": "bytes"},
+        )
+
+    AR_ARTIFACT_RESPONSES.inc(mode="range" if "range" in request.headers else "full")
+    # stat_result گرفته شده در همین لحظه طول فایل را ثابت می کند؛ Range روی بایت‌های موجود اعمال می شود
+    return FileResponse(path, stat_result=stat_result, media_type=media_type, headers=headers)
@@ -1,48 +1,196 @@
 from typing import Any, Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+import time
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Header, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from starlette.requests import ClientDisconnect
 from sqlalchemy.orm import Session
 import uuid
 
-from app.api.deps import CurrentUser, DbDependency
-from app.schemas.dress import DressInDB, DressCreate, DressUpdate
+from app.api.deps import CurrentUser, DbDependency, limit_by_user
+from app.core.profiling import ProfiledRoute
+from app.schemas.dress import DressInDB, DressCreate, DressUpdate, DressListAdapter, ResumableUploadCreate, ResumableUploadStatus
 from app.services.dress_service import dress_service
+from app.services.resumable_upload_service import resumable_upload_service
+from app.services.version_stamps import etag_matches, version_stamps
 from app.models.dress import Dress
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
+
+# داده‌های دریافتی آپلود تکه‌ای در بلوک‌های این اندازه روی دیسک نوشته می شوند
+CHUNK_FLUSH_BYTES = 1024 * 1024
+
+# انتظار برای پایان پردازش تصویر (GET /{dress_id}?wait=...)
+MAX_STATUS_WAIT_SECONDS = 30.0
 
 # ------------------- ۴.۲.۱ بارگذاری تصاویر -------------------
-@router.post("/", response_model=DressInDB, status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=DressInDB, status_code=status.HTTP_202_ACCEPTED, dependencies=[limit_by_user("dress_upload")])
 def upload_new_dress(
     db: DbDependency,
     current_user: CurrentUser,
+    request: Request,
+    response: Response,
     file: Annotated[UploadFile, File()], # دریافت فایل تصویر
     gender: Annotated[str, Form(pattern=r"^(male|female)$")], # دریافت فیلدهای متادیتا [cite: 45]
-    title: Annotated[Optional[str], Form()] = None
+    title: Annotated[Optional[str], Form()] = None,
+    idempotency_key: Annotated[Optional[str], Header(max_length=255)] = None
 ) -> Any:
-    """امکان آپلود تصویر لباس توسط کاربر را فراهم می کند."""
+    """
+    امکان آپلود تصویر لباس توسط کاربر را فراهم می کند.
+    فایل خام ذخیره و لباس با وضعیت processing برگردانده می شود؛ پردازش تصویر در صف کارها انجام می شود.
+    """
     
     dress_in = DressCreate(title=title, gender=gender)
     
     try:
-        new_dress = dress_service.upload_dress(db, current_user, file, dress_in)
+        new_dress = dress_service.upload_dress(db, current_user, file, dress_in, idempotency_key)
+        response.headers["Location"] = str(request.url_for("read_dress", dress_id=new_dress.id))
         return new_dress
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Upload failed: {e}")
 
+# ------------------- آپلود تکه‌ای (Resumable) -------------------
+@router.post("/uploads", response_model=ResumableUploadStatus, status_code=status.HTTP_201_CREATED)
+def create_resumable_upload(
+    upload_in: ResumableUploadCreate,
+    current_user: CurrentUser,
+    request: Request,
+    response: Response
+) -> Any:
+    """شروع آپلود تکه‌ای: اطلاعات فایل و متادیتای لباس ثبت و شناسه آپلود برگردانده می شود."""
+    upload = resumable_upload_service.create_upload(current_user, upload_in)
+    response.headers["Location"] = str(request.url_for("get_resumable_upload", upload_id=upload.upload_id))
+    response.headers["Upload-Offset"] = str(upload.offset)
+    return upload
+
+@router.get("/uploads/{upload_id}", response_model=ResumableUploadStatus)
+def get_resumable_upload(upload_id: uuid.UUID, current_user: CurrentUser, response: Response) -> Any:
+    """offset فعلی آپلود؛ کلاینت بعد از قطع اتصال ادامه ارسال را از همین offset شروع می کند."""
+    upload = resumable_upload_service.get_status(upload_id, current_user)
+    response.headers["Upload-Offset"] = str(upload.offset)
+    return upload
+
+@router.patch("/uploads/{upload_id}", response_model=ResumableUploadStatus)
+async def append_resumable_upload_chunk(
+    upload_id: uuid.UUID,
+    request: Request,
+    current_user: CurrentUser,
+    response: Response,
+    upload_offset: Annotated[int, Header(ge=0)]
+) -> Any:
+    """
+    ارسال یک تکه (بدنه خام درخواست) از offset مشخص شده در هدر Upload-Offset.
+    داده‌ها همزمان با دریافت روی دیسک نوشته می شوند، پس با قطع اتصال فقط بخش ارسال نشده از دست می رود.
+    """
+    meta, lock = await run_in_threadpool(resumable_upload_service.begin_chunk, upload_id, current_user, upload_offset)
+    try:
+        buffer = bytearray()
+        try:
+            async for chunk in request.stream():
+                buffer += chunk
+                if len(buffer) >= CHUNK_FLUSH_BYTES:
+                    await run_in_threadpool(resumable_upload_service.append, upload_id, meta, bytes(buffer), lock)
+                    buffer.clear()
+        except ClientDisconnect:
+            pass  # بخش رسیده ذخیره می شود تا کلاینت از offset جدید ادامه دهد
+        if buffer:
+            await run_in_threadpool(resumable_upload_service.append, upload_id, meta, bytes(buffer), lock)
+    finally:
+        await run_in_threadpool(resumable_upload_service.end_chunk, upload_id, meta, lock)
+
+    upload = await run_in_threadpool(resumable_upload_service.get_status, upload_id, current_user)
+    response.headers["Upload-Offset"] = str(upload.offset)
+    return upload
+
+@router.post(
+    "/uploads/{upload_id}/finalize",
+    response_model=DressInDB,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[limit_by_user("dress_upload")]
+)
+def finalize_resumable_upload(
+    upload_id: uuid.UUID,
+    db: DbDependency,
+    current_user: CurrentUser,
+    request: Request,
+    response: Response
+) -> Any:
+    """پایان آپلود: لباس با وضعیت processing ساخته و فایل کامل شده به صف پردازش (ریسایز و PNG) سپرده می شود."""
+    dress = resumable_upload_service.finalize(db, upload_id, current_user)
+    response.headers["Location"] = str(request.url_for("read_dress", dress_id=dress.id))
+    return dress
+
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def cancel_resumable_upload(upload_id: uuid.UUID, current_user: CurrentUser) -> None:
+    """لغو آپلود و حذف داده‌های ذخیره شده آن."""
+    resumable_upload_service.get_upload(upload_id, current_user)
+    resumable_upload_service.discard(upload_id)
+
 # ------------------- ۴.۲.۵ مدیریت لیست -------------------
-@router.get("/", response_model=list[DressInDB])
+@router.get("/", response_model=list[DressInDB], response_class=ORJSONResponse)
 def list_user_dresses(
     db: DbDependency,
     current_user: CurrentUser,
-    gender: Optional[str] = None # فیلتر بر اساس جنسیت (اختیاری)
+    gender: Optional[str] = None, # فیلتر بر اساس جنسیت (اختیاری)
+    if_none_match: Annotated[Optional[str], Header()] = None
 ) -> Any:
     """مشاهده لیست تمام لباس های آپلود شده توسط کاربر فعلی."""
     
-    # می‌توانیم در اینجا از پارامتر gender برای فیلتر کردن استفاده کنیم.
-    dresses = dress_service.get_user_dresses(db, current_user.id, gender=gender)
-    return dresses
+    # Conditional GET: اگر لیست تغییری نکرده، بدون اجرای کوئری کامل 304 برمی گردد.
+    etag = dress_service.get_wardrobe_etag(db, current_user.id, gender=gender)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # فقط ستون‌های لازم خوانده می شوند و کل لیست یکجا اعتبارسنجی می شود؛
+    # پاسخ مستقیما با orjson ساخته می شود و FastAPI دوباره آن را اعتبارسنجی نمی کند.
+    rows = dress_service.get_user_dress_rows(db, current_user.id, gender=gender)
+    dresses = DressListAdapter.validate_python(rows)
+    return ORJSONResponse(content=DressListAdapter.dump_python(dresses), headers=headers)
+
+@router.get("/{dress_id}", response_model=DressInDB)
+async def read_dress(
+    dress_id: uuid.UUID,
+    db: DbDependency,
+    current_user: CurrentUser,
+    wait: Annotated[float, Query(ge=0, le=MAX_STATUS_WAIT_SECONDS)] = 0
+) -> Any:
+    """
+    جزئیات و وضعیت پردازش یک لباس (processing، ready یا failed).
+    با پارامتر wait (ثانیه)، تا پایان پردازش یا پایان مهلت منتظر می ماند (Long Polling).
+    """
+    # نسخه قبل از خواندن لباس گرفته می شود؛ worker صف بعد از commit وضعیت، نسخه کاربر را bump می کند
+    version = await run_in_threadpool(version_stamps.get, current_user.id)
+    dress = await run_in_threadpool(dress_service.get_dress_by_id, db, dress_id)
+
+    if not dress:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dress not found.")
+
+    if dress.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions to view this dress.")
+
+    if dress.status != "processing" or wait <= 0:
+        return dress
+
+    # در طول انتظار اتصال دیتابیس به Pool برمی گردد؛ هر بار خواندن دوباره اتصال را فقط لحظه‌ای می گیرد
+    await run_in_threadpool(db.close)
+    deadline = time.monotonic() + wait
+    while dress.status == "processing" and (remaining := deadline - time.monotonic()) > 0:
+        await version_stamps.wait_for_change(current_user.id, version, remaining)
+        version = await run_in_threadpool(version_stamps.get, current_user.id)
+        dress = await run_in_threadpool(_reload_dress, db, dress_id)
+        if not dress:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dress not found.")
+    return dress
+
+def _reload_dress(db: Session, dress_id: uuid.UUID) -> Optional[Dress]:
+    """خواندن دوباره لباس و آزاد کردن فوری اتصال (Session بعد از close دوباره قابل استفاده است)."""
+    try:
+        return dress_service.get_dress_by_id(db, dress_id)
+    finally:
+        db.close()
 
 @router.delete("/{dress_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_dress(
@@ -82,12 +230,4 @@ def update_dress_metadata(
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions to modify this dress.")
     
     # بروزرسانی مدل
-    update_data = dress_in.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(dress, key, value)
-        
-    db.add(dress)
-    db.commit()
-    db.refresh(dress)
-    
-    return dress
\ No newline at end of file
+    return dress_service.update_dress(db, dress, dress_in)
\ No newline at end of file
@@ -1,18 +1,22 @@
-from typing import Any
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Any, Annotated, Optional
+import uuid
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Request, Response
+from fastapi.responses import ORJSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from app.api.deps import get_db, CurrentUser, DbDependency
-from app.schemas.user import UserCreate, UserLogin, UserInDB, Token, UserUpdate
+from app.api.deps import get_db, CurrentUser, DbDependency, limit_by_ip
+from app.core.profiling import ProfiledRoute
+from app.schemas.user import UserCreate, UserLogin, UserInDB, Token, UserUpdate, AccountDeletionStatus
 from app.services.user_service import user_service
+from app.services.version_stamps import etag_matches
 
-router = APIRouter()
+router = APIRouter(route_class=ProfiledRoute)
 
 # ------------------- ۴.۱.۱ ثبت نام (Sign Up) -------------------
-@router.post("/signup", response_model=UserInDB, status_code=status.HTTP_201_CREATED, summary="Register User", description="""
+@router.post("/signup", response_model=UserInDB, status_code=status.HTTP_201_CREATED, dependencies=[limit_by_ip("signup")], summary="Register User", description="""
 <b style="color: #2e7d32;">POST</b>: **Account Creation**.
 - **Logic**: Receives `email`, `password`, and `name`. It hashes the password for security and stores the user in the database.
-- **Errors**: Returns 400 if the email is already registered.
+- **Errors**: Returns 400 if the email is already registered. Returns 429 (with `Retry-After`) when the signup budget is exhausted.
 """)
 def register_user(
     user_in: UserCreate, 
@@ -30,10 +34,10 @@ def register_user(
     return new_user
 
 # ------------------- ۴.۱.۲ ورود (Login) -------------------
-@router.post("/login", response_model=Token, summary="Login Access Token", description="""
+@router.post("/login", response_model=Token, dependencies=[limit_by_ip("login")], summary="Login Access Token", description="""
 <b style="color: #2e7d32;">POST</b>: **Authentication**.
 - **Logic**: Validates credentials. If correct, generates a **JWT (JSON Web Token)** for secure session management.
-- **Errors**: Returns 400 for incorrect email or password.
+- **Errors**: Returns 400 for incorrect email or password. Returns 429 (with `Retry-After`) after too many attempts from the same IP.
 """)
 def login_access_token(
     db: DbDependency,
@@ -56,23 +60,32 @@ def login_access_token(
     }
     
 # ------------------- ۴.۱.۳ پروفایل کاربر -------------------
-@router.get("/profile", response_model=UserInDB, summary="Read User Profile", description="""
+@router.get("/profile", response_model=UserInDB, response_class=ORJSONResponse, summary="Read User Profile", description="""
 <b style="color: #0277bd;">GET</b>: **Data Retrieval**.
 - **Logic**: Decodes the Bearer Token to identify the user and returns profile information including the total count of uploaded garments.
+- **Caching**: Returns a weak `ETag`; send it back in `If-None-Match` to get `304 Not Modified` when nothing changed.
 """)
 def read_user_profile(
     current_user: CurrentUser, 
-    db: DbDependency
+    db: DbDependency,
+    response: Response,
+    if_none_match: Annotated[Optional[str], Header()] = None
 ) -> Any:
     """مشاهده پروفایل کاربر فعلی (نیاز به توکن دارد)."""
     uploaded_count = user_service.get_user_dresses_count(db, current_user.id)
     
+    etag = user_service.get_profile_etag(current_user, uploaded_count)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
     user_data = UserInDB.model_validate(current_user)
     user_data.uploaded_dress_count = uploaded_count
     
     return user_data
 
-@router.put("/profile", response_model=UserInDB, summary="Update User Profile", description="""
+@router.put("/profile", response_model=UserInDB, response_class=ORJSONResponse, summary="Update User Profile", description="""
 <b style="color: #ef6c00;">PUT</b>: **Data Modification**.
 - **Logic**: Allows the authenticated user to update personal fields like `name` or `gender`.
 """)
@@ -90,15 +103,43 @@ def update_user_profile(
     return user_data
 
 # ------------------- ۴.۱.۴ حذف اکانت -------------------
-@router.delete("/me", summary="Delete My Account", description="""
+def _deletion_status(job) -> AccountDeletionStatus:
+    messages = {
+        "queued": "Account deletion is queued.",
+        "running": "Account deletion is in progress.",
+        "succeeded": "User account and all associated data deleted successfully.",
+        "failed": "Account deletion failed; send DELETE /me again to retry it.",
+    }
+    return AccountDeletionStatus(
+        job_id=job.id,
+        status=job.status,
+        deleted_dress_count=(job.result or {}).get("deleted_dress_count", 0),
+        message=messages[job.status],
+    )
+
+@router.delete("/me", response_model=AccountDeletionStatus, status_code=status.HTTP_202_ACCEPTED, summary="Delete My Account", description="""
 <b style="color: #c62828;">DELETE</b>: **Account Removal**.
-- **Logic**: Permanently deletes the authenticated user's account and all associated data from the database.
+- **Logic**: Queues a background job that deletes the user's garments in batches with set-based `DELETE` statements, unlinks their image files, then removes the account itself. Returns **202** with a `job_id` and a `Location` header pointing to the deletion status; repeating the request returns the same job, and re-queues it if it has `failed`.
 - **Security**: This action is irreversible and requires a valid Bearer Token.
 """)
 def delete_user_account(
+    request: Request,
+    response: Response,
     current_user: CurrentUser, 
     db: DbDependency
 ) -> Any:
-    """حذف دائمی حساب کاربری کاربر فعلی."""
-    user_service.delete_user(db, user_id=current_user.id)
-    return {"message": "User account and all associated data deleted successfully."}
\ No newline at end of file
+    """ثبت درخواست حذف دائمی حساب کاربری کاربر فعلی."""
+    job = user_service.request_account_deletion(db, current_user)
+    response.headers["Location"] = str(request.url_for("get_account_deletion", job_id=job.id))
+    return _deletion_status(job)
+
+@router.get("/deletions/{job_id}", response_model=AccountDeletionStatus, summary="Account Deletion Status", description="""
+<b style="color: #0277bd;">GET</b>: **Account Removal**.
+- **Logic**: Reports the status of an account deletion job (`queued`, `running`, `succeeded`, `failed`) and, once finished, the number of deleted garments. No token is needed, because the account no longer exists once the job succeeds; the random `job_id` is the only handle.
+""")
+def get_account_deletion(job_id: uuid.UUID, db: DbDependency) -> Any:
+    """وضعیت کار حذف حساب."""
+    job = user_service.get_account_deletion(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Account deletion job not found.")
+    return _deletion_status(job)
@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 from dotenv import load_dotenv
@@ -26,10 +27,118 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24
 
     STORAGE_PATH: str = "storage/dresses"
+
+    # پروفایل پردازش تصویر هنگام آپلود: fast (CPU کمتر)، balanced، compact (حجم کمتر)
+    IMAGE_INGEST_PROFILE: Literal["fast", "balanced", "compact"] = "balanced"
+
+    # نسخه‌های کم‌حجم تصاویر برای سرو بر اساس هدر Accept (به ترتیب ترجیح؛ لیست خالی = فقط PNG)
+    IMAGE_VARIANT_FORMATS: list[str] = ["avif", "webp"]
+    # ساخت نسخه‌ها هنگام آپلود؛ در غیر این صورت در اولین درخواست ساخته و کنار PNG ذخیره می شوند
+    IMAGE_VARIANT_PRECOMPUTE: bool = True
+    # 100 = WebP کاملاً بدون اتلاف؛ مقادیر کمتر = near-lossless
+    IMAGE_WEBP_NEAR_LOSSLESS: int = 100
+    IMAGE_AVIF_QUALITY: int = 90
+
+    # آپلود تکه‌ای (Resumable): محل نگهداری داده‌های ناقص و مدت اعتبار آپلودهای رها شده
+    UPLOAD_STAGING_PATH: str = "storage/uploads"
+    UPLOAD_EXPIRY_MINUTES: int = 60 * 24
+    # قفل نویسنده هر آپلود با هر نوشتن تمدید می شود؛ اگر درخواستی این مدت چیزی ننویسد (یا worker کرش کند) قفل آزاد است
+    UPLOAD_LOCK_TTL_SECONDS: float = 120.0
+    # فاصله حذف دوره‌ای آپلودهای منقضی در هر فرآیند وب (0 = فقط هنگام ایجاد آپلود جدید)
+    UPLOAD_CLEANUP_INTERVAL_SECONDS: float = 600.0
+
+    # فایل‌های خام آپلود شده تا پایان پردازش در صف کارها اینجا نگهداری می شوند
+    RAW_UPLOAD_PATH: str = "storage/raw"
+    # فایل‌های خامی که لباس در حال پردازشی ندارند (و حداقل این مدت از آنها گذشته) حذف می شوند؛
+    # بررسی حداکثر یک بار در هر RAW_ORPHAN_SWEEP_INTERVAL ثانیه بعد از کارهای نرمال‌سازی انجام می شود
+    RAW_ORPHAN_MIN_AGE_SECONDS: float = 3600.0
+    RAW_ORPHAN_SWEEP_INTERVAL: float = 600.0
+
+    # ------------------- صف کارهای پس‌زمینه (جدول jobs) -------------------
+    # تعداد Thread های worker در هر فرآیند وب؛ 0 = غیرفعال (اجرا با python -m app.services.job_queue)
+    JOB_WORKERS: int = 2
+    JOB_POLL_INTERVAL: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 5
+    # فاصله تلاش مجدد: JOB_RETRY_BASE_SECONDS * 2^(تلاش-1)، حداکثر JOB_RETRY_MAX_SECONDS
+    JOB_RETRY_BASE_SECONDS: float = 2.0
+    JOB_RETRY_MAX_SECONDS: float = 300.0
+    # کار در حال اجرایی که worker آن بیش از این مدت جواب نداده (Heartbeat نفرستاده) دوباره برداشته می شود
+    JOB_LEASE_SECONDS: float = 300.0
+
+    # تعداد ردیف‌هایی که در هر دور از حذف حساب کاربری پاک می‌شوند
+    ACCOUNT_DELETE_BATCH_SIZE: int = 500
+    
+    # تعداد ردیف‌هایی که در خروجی حجیم ادمین در هر دسته از دیتابیس خوانده می شوند
+    EXPORT_BATCH_SIZE: int = 1000
     
     # مسیر اسکریپت AR را به یک فایل ساختگی تغییر دهید (در مرحله بعد می‌سازیم)
     AR_ENGINE_SCRIPT_PATH: str = "mock_ar.py"
-    
+
+    # ------------------- خروجی جلسات AR -------------------
+    # هر جلسه یک پوشه {AR_OUTPUT_PATH}/{session_id} دارد که موتور AR فایل‌های خروجی را در آن می نویسد
+    AR_OUTPUT_PATH: str = "storage/ar_sessions"
+    # سیاست نگهداری: خروجی جلسات تمام شده قدیمی‌تر از این مدت، و قدیمی‌ترین‌ها تا رسیدن به سقف حجم، حذف می شوند
+    AR_OUTPUT_MAX_AGE_HOURS: float = 24.0
+    AR_OUTPUT_MAX_TOTAL_MB: int = 2048
+    # حداقل فاصله (ثانیه) بین دو اجرای سیاست نگهداری در هر فرآیند
+    AR_OUTPUT_RETENTION_INTERVAL: float = 60.0
+    # فاصله بررسی داده جدید هنگام Stream فایلی که موتور هنوز در حال نوشتن آن است
+    AR_ARTIFACT_POLL_INTERVAL: float = 0.25
+    # حداکثر مدت دنبال کردن فایل در حال نوشتن در یک پاسخ؛ کلاینت بعد از آن می تواند دوباره درخواست دهد
+    AR_ARTIFACT_MAX_FOLLOW_SECONDS: float = 600.0
+
+    # ------------------- لباس‌های پرتکرار و گرم کردن کش هنگام راه‌اندازی -------------------
+    # Sketch دفعات دسترسی (Count-Min با WIDTH × DEPTH شمارنده) از شروع AR و دریافت تصاویر تغذیه می شود
+    ACCESS_SKETCH_ENABLED: bool = True
+    ACCESS_SKETCH_WIDTH: int = 2048
+    ACCESS_SKETCH_DEPTH: int = 4
+    # تعداد کلیدهای پرتکراری که نگهداری می شوند
+    ACCESS_SKETCH_TOP_K: int = 100
+    # فاصله ذخیره Sketch در وضعیت مشترک و نیمه‌عمر شمارنده‌ها
+    ACCESS_SKETCH_FLUSH_SECONDS: float = 60.0
+    ACCESS_SKETCH_HALF_LIFE_HOURS: float = 24.0
+    # هنگام راه‌اندازی، تصاویر WARMUP_TOP_N لباس پرتکرار حداکثر در WARMUP_BUDGET_SECONDS گرم می شوند (0 = غیرفعال)
+    WARMUP_TOP_N: int = 50
+    WARMUP_BUDGET_SECONDS: float = 5.0
+    # بعد از یک گرم کردن موفق، worker های دیگر تا این مدت (و تا زنده بودن worker گرم کننده) دوباره گرم نمی کنند
+    WARMUP_INTERVAL_SECONDS: float = 3600.0
+
+    # ------------------- پایش کوئری‌های SQL -------------------
+    # کوئری‌های کندتر از این مقدار (میلی‌ثانیه) همراه با مسیر درخواست لاگ می شوند
+    SQL_SLOW_QUERY_MS: float = 100.0
+    # تکرار یک عبارت SQL به این تعداد در یک درخواست به عنوان N+1 احتمالی لاگ می شود
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10
+
+    # ------------------- پروفایل درخواست‌ها (Opt-in) -------------------
+    # درخواست‌های ادمین که هدر X-Profile-Token برابر این مقدار دارند پروفایل می شوند (خالی = غیرفعال)
+    PROFILING_HEADER_TOKEN: Optional[str] = None
+    # نسبت درخواست‌هایی که به صورت تصادفی پروفایل می شوند (0 = غیرفعال)
+    PROFILING_SAMPLE_RATE: float = 0.0
+    PROFILING_SAMPLE_INTERVAL_MS: float = 1.0
+    PROFILING_DIR: str = "storage/profiles"
+    PROFILING_MAX_PROFILES: int = 50
+
+    # ------------------- محدودیت نرخ درخواست (Token Bucket) -------------------
+    RATE_LIMIT_ENABLED: bool = True
+    # memory: جداگانه در هر فرآیند؛ shared: مشترک بین همه worker ها (در فایل SHARED_STATE_PATH)
+    RATE_LIMIT_STORAGE: Literal["memory", "shared"] = "memory"
+    # بودجه هر مسیر به فرمت "تعداد/بازه" (second، minute یا hour)؛ ظرفیت Burst برابر همان تعداد است
+    RATE_LIMITS: dict[str, str] = {
+        "login": "10/minute",
+        "signup": "5/minute",
+        "dress_upload": "30/minute",
+        "ar_start": "10/minute",
+    }
+
+    # ------------------- اجرای چند فرآیندی (python -m app.server) -------------------
+    # تعداد worker ها؛ مقدار 0 یعنی به تعداد هسته‌های CPU
+    WEB_CONCURRENCY: int = 1
+    # فایل SQLite وضعیت مشترک بین worker ها (جلسات AR، شمارنده‌ها، پیام‌های ابطال کش)
+    SHARED_STATE_PATH: str = "storage/shared_state.db"
+    SHARED_STATE_POLL_INTERVAL: float = 1.0
+    # حداکثر جلسات AR همزمان در کل سرور (همه worker ها)؛ 0 = نامحدود
+    AR_MAX_CONCURRENT_SESSIONS: int = 0
+
     class Config:
         case_sensitive = True
         env_file = ".env"
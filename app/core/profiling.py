@@ -0,0 +1,308 @@
+import cProfile
+import functools
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+import anyio
+from fastapi.routing import APIRoute
+
+from app.core.config import settings
+
+# ------------------- پروفایلر نمونه‌برداری برای هر درخواست (Opt-in) -------------------
+
+PROFILE_HEADER = "x-profile-token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+class StackSampler:
+    """
+    با یک Thread جداگانه پشته یک Thread مشخص را در فواصل ثابت نمونه‌برداری می کند
+    و خروجی را به فرمت collapsed-stack (ورودی flamegraph.pl و speedscope) جمع می کند.
+    """
+
+    def __init__(self, target_thread_id: int, interval: float) -> None:
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# cProfile در هر لحظه فقط برای یک درخواست فعال می شود: از Python 3.12 به بعد cProfile روی sys.monitoring
+# و برای کل فرآیند است و فعال کردن همزمان دوم خطای ValueError می دهد (و پروفایل Thread های دیگر را هم می گیرد).
+# درخواست‌های همزمان دیگر فقط با StackSampler (که همیشه فقط Thread همان درخواست را می بیند) پروفایل می شوند.
+_cprofile_lock = threading.Lock()
+
+
+class ProfileCapture:
+    """نتیجه پروفایل یک درخواست؛ توسط Middleware ساخته و توسط Route پر می شود."""
+
+    def __init__(self, method: str, path: str, reason: str) -> None:
+        self.id = uuid.uuid4()
+        self.method = method
+        self.path = path
+        self.reason = reason
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status_code: Optional[int] = None
+        self.sampler: Optional[StackSampler] = None
+        self.profiler: Optional[cProfile.Profile] = None
+        # پروفایل درخواستی با هدر، اگر فرستنده ادمین نباشد لغو می شود (authorize_profile_capture)
+        self.allowed = True
+
+    @property
+    def collected(self) -> bool:
+        return self.sampler is not None
+
+    def reject(self) -> None:
+        self.allowed = False
+
+    def _start(self) -> float:
+        """شروع نمونه‌بردار پشته و، اگر درخواست دیگری آن را در اختیار ندارد، cProfile."""
+        self.sampler = StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL_MS / 1000)
+        if _cprofile_lock.acquire(blocking=False):
+            self.profiler = cProfile.Profile()
+        self.sampler.start()
+        if self.profiler is not None:
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # ابزار پروفایل دیگری (خارج از این ماژول) فعال است
+                self.profiler = None
+                _cprofile_lock.release()
+        return time.perf_counter()
+
+    def _finish(self, start: float) -> None:
+        if self.profiler is not None:
+            self.profiler.disable()
+            _cprofile_lock.release()
+        self.sampler.stop()
+        self.duration_ms = (time.perf_counter() - start) * 1000
+
+    def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """اجرای تابع endpoint زیر نمونه‌بردار پشته (و در صورت امکان cProfile) در همان Thread."""
+        if not self.allowed:
+            return func(*args, **kwargs)
+        start = self._start()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self._finish(start)
+
+    async def run_async(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        if not self.allowed:
+            return await func(*args, **kwargs)
+        start = self._start()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._finish(start)
+
+    def metadata(self) -> dict:
+        return {
+            "id": str(self.id),
+            "method": self.method,
+            "path": self.path,
+            "reason": self.reason,
+            "status_code": self.status_code,
+            "duration_ms": round(self.duration_ms or 0, 3),
+            "samples": sum(self.sampler.stacks.values()) if self.sampler else 0,
+            "cprofile": self.profiler is not None,
+            "created_at": self.started_at,
+        }
+
+
+_current_capture: ContextVar[Optional[ProfileCapture]] = ContextVar("current_profile_capture", default=None)
+
+
+def current_capture() -> Optional[ProfileCapture]:
+    return _current_capture.get()
+
+
+# ------------------- ذخیره‌سازی حلقوی روی دیسک -------------------
+
+class ProfileStore:
+    """
+    نگهداری پروفایل‌ها در پوشه PROFILING_DIR به صورت بافر حلقوی:
+    برای هر پروفایل سه فایل (json متادیتا، collapsed و pstats) ذخیره و قدیمی‌ترین ها حذف می شوند.
+    """
+
+    EXTENSIONS = (".json", ".collapsed", ".pstats")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self) -> str:
+        return os.path.abspath(settings.PROFILING_DIR)
+
+    def path_for(self, profile_id: uuid.UUID, extension: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}{extension}")
+
+    def save(self, capture: ProfileCapture) -> None:
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if capture.profiler is not None:
+                capture.profiler.dump_stats(self.path_for(capture.id, ".pstats"))
+            with open(self.path_for(capture.id, ".collapsed"), "w", encoding="utf-8") as f:
+                f.write(capture.sampler.collapsed())
+            # فایل متادیتا آخر نوشته می شود تا فقط پروفایل‌های کامل فهرست شوند
+            with open(self.path_for(capture.id, ".json"), "w", encoding="utf-8") as f:
+                json.dump(capture.metadata(), f)
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = self.list()
+        for entry in entries[settings.PROFILING_MAX_PROFILES:]:
+            for extension in self.EXTENSIONS:
+                try:
+                    os.remove(self.path_for(entry["id"], extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list[dict]:
+        """فهرست پروفایل‌ها از جدیدترین به قدیمی‌ترین."""
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(entries, key=lambda entry: entry["created_at"], reverse=True)
+
+    def get_file(self, profile_id: uuid.UUID, extension: str) -> Optional[str]:
+        path = self.path_for(profile_id, extension)
+        return path if os.path.exists(path) else None
+
+
+profile_store = ProfileStore()
+
+
+# ------------------- Middleware و Route -------------------
+
+def _should_profile(headers: dict[bytes, bytes]) -> Optional[str]:
+    """دلیل پروفایل کردن درخواست را برمی گرداند (هدر ادمین یا نمونه‌برداری تصادفی)."""
+    token = headers.get(PROFILE_HEADER.encode())
+    if token is not None and settings.PROFILING_HEADER_TOKEN:
+        if hmac.compare_digest(token, settings.PROFILING_HEADER_TOKEN.encode()):
+            return "header"
+    if settings.PROFILING_SAMPLE_RATE > 0 and random.random() < settings.PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    برای درخواست‌هایی که هدر X-Profile-Token معتبر دارند یا در نرخ نمونه‌برداری قرار می گیرند
+    یک ProfileCapture در ContextVar قرار می دهد؛ خود پروفایل در ProfiledRoute و در Thread
+    اجرای endpoint انجام می شود و بعد از ارسال پاسخ روی دیسک ذخیره می شود.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        reason = _should_profile(dict(scope["headers"]))
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        capture = ProfileCapture(scope["method"], scope["path"], reason)
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                capture.status_code = message["status"]
+                if capture.collected:
+                    headers = list(message.get("headers", []))
+                    headers.append((PROFILE_ID_HEADER.lower().encode(), str(capture.id).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_capture.set(capture)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_capture.reset(token)
+            if capture.collected:
+                await anyio.to_thread.run_sync(profile_store.save, capture)
+
+
+def _wrap_endpoint(endpoint: Callable) -> Callable:
+    # include_router مسیرها را با همان endpoint دوباره می سازد؛ از پیچیدن دوباره جلوگیری می شود
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            capture = _current_capture.get()
+            if capture is None:
+                return await endpoint(*args, **kwargs)
+            return await capture.run_async(endpoint, *args, **kwargs)
+        async_wrapper.__profiled__ = True
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        capture = _current_capture.get()
+        if capture is None:
+            return endpoint(*args, **kwargs)
+        return capture.run(endpoint, *args, **kwargs)
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route ای که endpoint را در صورت فعال بودن پروفایل، در همان Thread اجرای آن
+    (Threadpool برای endpoint های sync) پروفایل می کند. پروفایل درخواستی با هدر X-Profile-Token
+    فقط وقتی انجام می شود که توکن Bearer همان درخواست متعلق به یک ادمین باشد.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        from fastapi import Depends
+        from app.api.deps import authorize_profile_capture
+
+        kwargs["dependencies"] = [*(kwargs.get("dependencies") or []), Depends(authorize_profile_capture)]
+        super().__init__(path, _wrap_endpoint(endpoint), **kwargs)
@@ -0,0 +1,134 @@
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger("app.sql")
+
+# ------------------- شمارش کوئری‌ها و زمان دیتابیس به ازای هر درخواست -------------------
+
+QUERIES_PER_REQUEST = registry.histogram(
+    "http_request_db_queries",
+    "Number of SQL statements issued per HTTP request.",
+    ("route",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+
+
+@dataclass
+class QueryStats:
+    """آمار کوئری‌های یک درخواست (یا یک بلوک کد در تست‌ها)."""
+    route: str = ""
+    count: int = 0
+    total_seconds: float = 0.0
+    statements: Counter = field(default_factory=Counter)
+    n_plus_one_reported: set = field(default_factory=set)
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_seconds * 1000
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_ms:.2f};desc="{self.count} queries"'
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+@contextmanager
+def track_queries(route: str = "") -> Iterator[QueryStats]:
+    """همه کوئری‌هایی که در این context (و Thread هایی که context را به ارث می برند) اجرا شوند شمرده می شوند."""
+    stats = QueryStats(route=route)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+# ------------------- Event های Engine -------------------
+# روی کلاس Engine ثبت می شوند تا همه Engine ها (اصلی، تست و بنچمارک) پوشش داده شوند.
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+    stats = _current_stats.get()
+    route = stats.route if stats else "-"
+
+    if elapsed * 1000 >= settings.SQL_SLOW_QUERY_MS:
+        logger.warning("Slow query (%.1f ms) on %s: %s", elapsed * 1000, route, " ".join(statement.split()))
+
+    if stats is None:
+        return
+    stats.count += 1
+    stats.total_seconds += elapsed
+    stats.statements[statement] += 1
+
+    # یک عبارت SQL یکسان که بارها در یک درخواست تکرار شود نشانه الگوی N+1 است
+    repeats = stats.statements[statement]
+    if repeats >= settings.SQL_N_PLUS_ONE_THRESHOLD and statement not in stats.n_plus_one_reported:
+        stats.n_plus_one_reported.add(statement)
+        logger.warning("Possible N+1 on %s: statement executed %d times: %s", route, repeats, " ".join(statement.split()))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # دستور ناموفق (مثلاً IntegrityError) به after_cursor_execute نمی رسد؛ بدون این، زمان شروع آن روی
+    # اتصال Pool شده باقی می ماند و زمان کوئری‌های بعدی با شروع اشتباه محاسبه می شد
+    started = context.connection.info.get("query_started_at") if context.connection is not None else None
+    if started and context.execution_context is not None:
+        started.pop()
+
+# ------------------- Middleware -------------------
+
+class QueryAccountingMiddleware:
+    """
+    Middleware خام ASGI که کوئری‌های هر درخواست را می شمارد و نتیجه را در هدر
+    Server-Timing (مثلاً db;dur=1.84;desc="3 queries") برمی گرداند.
+
+    هدرها در http.response.start ارسال می شوند؛ در پاسخ‌های Stream شده (بدون Content-Length و بدنه‌دار، مثل
+    خروجی حجیم ادمین) کوئری‌ها بعد از آن هم اجرا می شوند، پس برای این پاسخ‌ها Server-Timing ارسال
+    نمی شود تا عدد ناقص گزارش نشود. هیستوگرام http_request_db_queries همه کوئری‌ها را می شمارد.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(scope["path"]) as stats:
+
+            async def send_wrapper(message) -> None:
+                if message["type"] == "http.response.start":
+                    route = getattr(scope.get("route"), "path", None)
+                    if route:
+                        stats.route = route
+                    headers = list(message.get("headers", []))
+                    has_body_length = any(name.lower() == b"content-length" for name, _ in headers)
+                    if has_body_length or message["status"] in (204, 304):
+                        headers.append((b"server-timing", stats.server_timing().encode()))
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = getattr(scope.get("route"), "path", None) or "__unmatched__"
+                QUERIES_PER_REQUEST.observe(stats.count, route=route)
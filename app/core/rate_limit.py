@@ -0,0 +1,150 @@
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Protocol
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.shared_state import shared_state
+
+# ------------------- محدودیت نرخ درخواست با Token Bucket -------------------
+# هر مسیر پرهزینه (bcrypt، پردازش تصویر، اجرای فرآیند AR) یک بودجه نام‌دار در settings.RATE_LIMITS
+# دارد؛ کلید هر Bucket ترکیب نام بودجه و شناسه کاربر (یا IP برای مسیرهای بدون احراز هویت) است.
+
+RATE_LIMIT_DECISIONS = registry.counter(
+    "rate_limit_decisions_total",
+    "Rate limiter decisions per budget (allowed / limited).",
+    ("limit", "decision"),
+)
+RATE_LIMIT_TRACKED_KEYS = registry.gauge(
+    "rate_limit_tracked_keys",
+    "Token buckets currently held by the in-process rate limiter storage.",
+)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    """یک بودجه: capacity توکن (Burst) که با سرعت refill_per_second دوباره پر می شود."""
+    capacity: float
+    refill_per_second: float
+
+    @classmethod
+    def parse(cls, spec: str) -> "RateLimitRule":
+        """تبدیل رشته‌ای مثل "10/minute" به قانون Token Bucket."""
+        try:
+            amount, period = spec.split("/")
+            capacity = float(amount)
+            seconds = _PERIODS[period.strip().lower().removesuffix("s")]
+        except (ValueError, KeyError):
+            raise ValueError(f"Invalid rate limit {spec!r}; expected '<count>/<second|minute|hour>'")
+        return cls(capacity=capacity, refill_per_second=capacity / seconds)
+
+    def retry_after(self, tokens: float, cost: float = 1.0) -> float:
+        """ثانیه تا زمانی که توکن کافی برای درخواست بعدی جمع شود."""
+        return max(0.0, (cost - tokens) / self.refill_per_second)
+
+
+class RateLimitStorage(Protocol):
+    """لایه ذخیره‌سازی Bucket ها؛ خروجی take: (مجاز بودن، توکن‌های باقی‌مانده)."""
+
+    def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> tuple[bool, float]:
+        ...
+
+
+class MemoryStorage:
+    """Bucket ها در حافظه همین فرآیند (برای اجرای تک worker)."""
+
+    # بعد از این تعداد کلید، Bucket های پر شده (بی‌استفاده) حذف می شوند
+    MAX_KEYS = 10_000
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (rule.capacity, now))
+            tokens = min(rule.capacity, tokens + (now - updated_at) * rule.refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                self._evict(now)
+            return allowed, tokens
+
+    def _evict(self, now: float) -> None:
+        # Bucket ای که یک ساعت استفاده نشده با هر بودجه معقولی دوباره پر شده است
+        idle = [key for key, (_, updated_at) in self._buckets.items() if now - updated_at > 3600]
+        for key in idle:
+            del self._buckets[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class SharedStorage:
+    """Bucket ها در وضعیت مشترک SQLite تا بودجه بین همه worker ها یکی باشد."""
+
+    # هر چند برداشت یک بار Bucket های بی‌استفاده حذف می شوند
+    PRUNE_EVERY = 1000
+
+    def __init__(self) -> None:
+        self._calls = 0
+
+    def take(self, key: str, rule: RateLimitRule, cost: float = 1.0) -> tuple[bool, float]:
+        self._calls += 1
+        if self._calls % self.PRUNE_EVERY == 0:
+            shared_state.prune_token_buckets(idle_seconds=3600)
+        return shared_state.take_token(key, rule.capacity, rule.refill_per_second, cost)
+
+
+class RateLimiter:
+    """اعمال بودجه‌های نام‌دار settings.RATE_LIMITS روی ذخیره‌سازی انتخاب شده."""
+
+    def __init__(self) -> None:
+        self.memory_storage = MemoryStorage()
+        self.shared_storage = SharedStorage()
+        self._rules: dict[str, RateLimitRule] = {}
+
+    @property
+    def storage(self) -> RateLimitStorage:
+        return self.shared_storage if settings.RATE_LIMIT_STORAGE == "shared" else self.memory_storage
+
+    def rule(self, name: str) -> Optional[RateLimitRule]:
+        spec = settings.RATE_LIMITS.get(name)
+        if not spec:
+            return None
+        rule = self._rules.get(spec)
+        if rule is None:
+            rule = self._rules[spec] = RateLimitRule.parse(spec)
+        return rule
+
+    def hit(self, name: str, identity: str) -> None:
+        """یک توکن از بودجه name برای identity برمی دارد؛ در صورت اتمام بودجه 429 با Retry-After."""
+        rule = self.rule(name)
+        if not settings.RATE_LIMIT_ENABLED or rule is None:
+            return
+        allowed, tokens = self.storage.take(f"rate:{name}:{identity}", rule)
+        RATE_LIMIT_DECISIONS.inc(limit=name, decision="allowed" if allowed else "limited")
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests. Please slow down and retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(rule.retry_after(tokens))))},
+            )
+
+
+rate_limiter = RateLimiter()
+RATE_LIMIT_TRACKED_KEYS.set_callback(lambda: len(rate_limiter.memory_storage))
+
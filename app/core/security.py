@@ -1,22 +1,31 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Any, Union, Optional
-from passlib.context import CryptContext
-from jose import jwt, JWTError
 
 from app.core.config import settings
+from app.core.metrics import timed
 
-# اصلاح: حذف 'deprecated="auto"' برای جلوگیری از خطای طول رمز عبور در تست‌ها
-pwd_context = CryptContext(schemes=["bcrypt"])
+# passlib و jose (همراه cryptography) سنگین هستند و فقط در اولین استفاده import می شوند
+# تا راه‌اندازی worker ها و import تست‌ها سریع بماند.
+
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    from passlib.context import CryptContext
+
+    # اصلاح: حذف 'deprecated="auto"' برای جلوگیری از خطای طول رمز عبور در تست‌ها
+    return CryptContext(schemes=["bcrypt"])
 
 # ------------------- توابع هش و اعتبارسنجی رمز عبور -------------------
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """بررسی می کند که آیا رمز عبور ورودی با رمز عبور هش شده مطابقت دارد."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with timed("security.verify_password"):
+        return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """رمز عبور را هش می کند."""
-    return pwd_context.hash(password)
+    with timed("security.hash_password"):
+        return get_pwd_context().hash(password)
 
 # ------------------- توابع JWT -------------------
 
@@ -27,16 +36,22 @@ def create_access_token(subject: Union[str, Any], expires_delta: Optional[timede
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
+    from jose import jwt
+
     to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    with timed("security.jwt_encode"):
+        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 def decode_access_token(token: str) -> Optional[dict]:
     """توکن دسترسی JWT را دیکد می کند."""
+    from jose import jwt, JWTError
+
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
+        with timed("security.jwt_decode"):
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
         return payload
     except JWTError:
         return None
\ No newline at end of file
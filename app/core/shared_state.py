@@ -0,0 +1,370 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from app.core.config import settings
+
+# ------------------- وضعیت مشترک بین worker ها (SQLite محلی) -------------------
+# همه worker های یک سرور (چه با app.server و چه با uvicorn --workers) از یک فایل SQLite
+# در حالت WAL استفاده می کنند: شمارنده‌های سراسری، مالکیت جلسات AR و پیام‌های
+# ابطال کش (Broadcast). هر Thread اتصال جداگانه خودش را دارد و بعد از fork اتصال‌ها دور ریخته می شوند.
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ar_sessions (
+    session_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    dress_id TEXT NOT NULL,
+    pid INTEGER,
+    worker_pid INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_ar_sessions_running ON ar_sessions (ended_at);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS token_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    name TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# رزرو جلسه‌ای که هنوز PID ندارد (در حال اجرای Popen) فقط تا این مدت معتبر است
+_RESERVATION_TTL_SECONDS = 30
+# پیام‌های Broadcast قدیمی‌تر از این مدت پاک می شوند (subscriber ها هر چند ثانیه آنها را می خوانند)
+_EVENT_TTL_SECONDS = 300
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # فرآیند Zombie (تمام شده ولی هنوز توسط والد wait نشده) به سیگنال 0 جواب می دهد؛ روی لینوکس وضعیت Z مرده حساب می شود
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            return f.read().rpartition(b")")[2].split()[0] != b"Z"
+    except (OSError, IndexError):
+        return True
+
+
+class SharedState:
+    """دسترسی به وضعیت مشترک بین فرآیندها روی یک فایل SQLite محلی."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self._path = path
+        self._local = threading.local()
+        self._subscribers: dict[str, list[Callable[[dict], None]]] = {}
+        self._subscriber_thread: Optional[threading.Thread] = None
+        self._subscriber_lock = threading.Lock()
+        self._subscriber_stop = threading.Event()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def path(self) -> str:
+        return os.path.abspath(self._path or settings.SHARED_STATE_PATH)
+
+    def _after_fork(self) -> None:
+        # اتصال SQLite نباید بین فرآیند والد و فرزند مشترک باشد
+        self._local = threading.local()
+        # Thread خواندن پیام‌ها در فرزند وجود ندارد؛ هر فرآیند دوباره subscribe می کند
+        self._subscribers = {}
+        self._subscriber_thread = None
+
+    def _connection(self) -> sqlite3.Connection:
+        path = self.path
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.path == path:
+            return conn
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('instance_id', ?)", (uuid.uuid4().hex,))
+        self._local.conn, self._local.path = conn, path
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """تراکنش با قفل نوشتن (BEGIN IMMEDIATE) برای عملیات خواندن-و-نوشتن اتمیک بین فرآیندها."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    @property
+    def instance_id(self) -> str:
+        """شناسه یکتای این فایل وضعیت؛ با حذف فایل عوض می شود (برای باطل کردن ETag های قدیمی)."""
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'instance_id'").fetchone()
+        return row[0]
+
+    # ------------------- شمارنده‌ها -------------------
+
+    def incr(self, key: str, delta: int = 1) -> int:
+        return self._connection().execute(
+            "INSERT INTO counters (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + excluded.value RETURNING value",
+            (key, delta),
+        ).fetchone()[0]
+
+    def get(self, key: str) -> int:
+        row = self._connection().execute("SELECT value FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    # ------------------- قفل‌های دارای مالک و انقضا (Lease) -------------------
+
+    def try_acquire_lease(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        گرفتن (یا تمدید) یک قفل انحصاری برای ttl_seconds ثانیه. اگر مالک قبلی همین owner باشد قفل
+        تمدید می شود و اگر منقضی شده یا فرآیند مالک دیگر زنده نباشد، قفل به owner جدید می رسد؛
+        پس کرش یک worker قفل را برای همیشه نگه نمی دارد.
+        """
+        with self._transaction() as conn:
+            now = time.time()
+            row = conn.execute("SELECT owner, pid, expires_at FROM leases WHERE key = ?", (key,)).fetchone()
+            if row and row[0] != owner and row[2] > now and _pid_alive(row[1]):
+                return False
+            conn.execute(
+                "INSERT INTO leases (key, owner, pid, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, pid = excluded.pid, "
+                "expires_at = excluded.expires_at",
+                (key, owner, os.getpid(), now + ttl_seconds),
+            )
+            return True
+
+    def release_lease(self, key: str, owner: str) -> None:
+        """آزاد کردن قفل؛ اگر قفل در این فاصله به مالک دیگری رسیده باشد دست نخورده می ماند."""
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def clear_lease(self, key: str) -> None:
+        self._connection().execute("DELETE FROM leases WHERE key = ?", (key,))
+
+    def take_token(self, key: str, capacity: float, refill_per_second: float, cost: float = 1.0) -> tuple[bool, float]:
+        """
+        برداشت از یک Token Bucket سراسری. خروجی: (مجاز بودن، توکن‌های باقی‌مانده بعد از برداشت
+        یا در صورت رد شدن، توکن‌های موجود).
+        """
+        with self._transaction() as conn:
+            now = time.time()
+            row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO token_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            return allowed, tokens
+
+    def prune_token_buckets(self, idle_seconds: float) -> int:
+        """حذف Bucket هایی که مدتی استفاده نشده‌اند (و در نتیجه دوباره پر شده‌اند)."""
+        return self._connection().execute(
+            "DELETE FROM token_buckets WHERE updated_at < ?", (time.time() - idle_seconds,)
+        ).rowcount
+
+    # ------------------- جلسات AR -------------------
+
+    def _ar_session_alive(self, pid: Optional[int], started_at: float, now: float) -> bool:
+        # رزرو بدون PID فقط تا _RESERVATION_TTL_SECONDS معتبر است
+        return _pid_alive(pid) if pid else now - started_at < _RESERVATION_TTL_SECONDS
+
+    def _running_ar_sessions(self, conn: sqlite3.Connection) -> list[str]:
+        """جلسات باز؛ جلساتی که فرآیندشان دیگر وجود ندارد بسته علامت می خورند."""
+        now = time.time()
+        running = []
+        for session_id, pid, started_at in conn.execute(
+            "SELECT session_id, pid, started_at FROM ar_sessions WHERE ended_at IS NULL"
+        ).fetchall():
+            if self._ar_session_alive(pid, started_at, now):
+                running.append(session_id)
+            else:
+                conn.execute("UPDATE ar_sessions SET ended_at = ? WHERE session_id = ?", (now, session_id))
+        return running
+
+    def reserve_ar_session(self, session_id: str, user_id: str, dress_id: str, limit: int = 0) -> bool:
+        """
+        یک جلسه AR را قبل از اجرای فرآیند ثبت می کند. اگر limit > 0 و تعداد جلسات در حال
+        اجرای کل سرور (همه worker ها) به limit رسیده باشد False برمی گرداند.
+        """
+        with self._transaction() as conn:
+            if limit > 0 and len(self._running_ar_sessions(conn)) >= limit:
+                return False
+            conn.execute(
+                "INSERT INTO ar_sessions (session_id, user_id, dress_id, pid, worker_pid, started_at) "
+                "VALUES (?, ?, ?, NULL, ?, ?)",
+                (session_id, user_id, dress_id, os.getpid(), time.time()),
+            )
+            return True
+
+    def attach_ar_process(self, session_id: str, pid: int) -> None:
+        self._connection().execute("UPDATE ar_sessions SET pid = ? WHERE session_id = ?", (pid, session_id))
+
+    def end_ar_session(self, session_id: str) -> None:
+        self._connection().execute(
+            "UPDATE ar_sessions SET ended_at = ? WHERE session_id = ? AND ended_at IS NULL",
+            (time.time(), session_id),
+        )
+
+    def discard_ar_session(self, session_id: str) -> None:
+        self._connection().execute("DELETE FROM ar_sessions WHERE session_id = ?", (session_id,))
+
+    def get_ar_session(self, session_id: str) -> Optional[dict]:
+        conn = self._connection()
+        cursor = conn.execute("SELECT * FROM ar_sessions WHERE session_id = ?", (session_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip((column[0] for column in cursor.description), row))
+
+    def running_ar_session_ids(self) -> list[str]:
+        with self._transaction() as conn:
+            return self._running_ar_sessions(conn)
+
+    def is_ar_session_running(self, session_id: str) -> bool:
+        """آیا فرآیند جلسه (در هر worker) هنوز اجرا می شود؛ جلسه با فرآیند از بین رفته بسته علامت می خورد."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT pid, started_at FROM ar_sessions WHERE session_id = ? AND ended_at IS NULL", (session_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            now = time.time()
+            if self._ar_session_alive(row[0], row[1], now):
+                return True
+            conn.execute("UPDATE ar_sessions SET ended_at = ? WHERE session_id = ?", (now, session_id))
+            return False
+
+    def prune_ar_sessions(self, ended_before: float) -> int:
+        """حذف جلسات تمام شده قدیمی (بعد از پاک شدن خروجی آنها)."""
+        return self._connection().execute(
+            "DELETE FROM ar_sessions WHERE ended_at IS NOT NULL AND ended_at < ?", (ended_before,)
+        ).rowcount
+
+    # ------------------- داده‌های دودویی (مثلاً Sketch دفعات دسترسی) -------------------
+
+    def get_blob(self, name: str) -> Optional[bytes]:
+        row = self._connection().execute("SELECT data FROM blobs WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def update_blob(self, name: str, update: Callable[[Optional[bytes]], bytes]) -> bytes:
+        """خواندن-تغییر-نوشتن اتمیک یک blob بین همه worker ها؛ update مقدار فعلی (یا None) را می گیرد."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM blobs WHERE name = ?", (name,)).fetchone()
+            data = update(row[0] if row else None)
+            conn.execute(
+                "INSERT INTO blobs (name, data, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (name, data, time.time()),
+            )
+            return data
+
+    # ------------------- Broadcast ابطال کش -------------------
+
+    def publish(self, channel: str, payload: dict) -> int:
+        """یک پیام برای همه worker ها منتشر می کند و شماره ترتیب آن را برمی گرداند."""
+        conn = self._connection()
+        now = time.time()
+        seq = conn.execute(
+            "INSERT INTO events (channel, payload, created_at) VALUES (?, ?, ?)",
+            (channel, json.dumps(payload, default=str), now),
+        ).lastrowid
+        if seq % 100 == 0:
+            conn.execute("DELETE FROM events WHERE created_at < ?", (now - _EVENT_TTL_SECONDS,))
+        return seq
+
+    def last_seq(self) -> int:
+        row = self._connection().execute("SELECT MAX(seq) FROM events").fetchone()
+        return row[0] or 0
+
+    def subscribe(self, channel: str, callback: Callable[[dict], None]) -> None:
+        """
+        callback را برای پیام‌های جدید channel (منتشر شده از هر worker، از جمله همین worker)
+        ثبت می کند. پیام‌ها توسط یک Thread پس‌زمینه هر SHARED_STATE_POLL_INTERVAL ثانیه خوانده می شوند.
+        """
+        with self._subscriber_lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+            if self._subscriber_thread is None:
+                self._subscriber_thread = threading.Thread(target=self._poll_loop, name="shared-state-subscriber", daemon=True)
+                self._subscriber_thread.start()
+
+    def stop_subscriber(self) -> None:
+        """توقف Thread خواندن پیام‌ها؛ بعد از آن پیام‌ها فقط با dispatch_pending تحویل می شوند."""
+        with self._subscriber_lock:
+            thread, self._subscriber_thread = self._subscriber_thread, None
+        if thread is None:
+            return
+        self._subscriber_stop.set()
+        thread.join(5)
+        self._subscriber_stop.clear()
+
+    def _poll_loop(self) -> None:
+        cursor = self.last_seq()
+        while not self._subscriber_stop.wait(settings.SHARED_STATE_POLL_INTERVAL):
+            try:
+                cursor = self.dispatch_pending(cursor)
+            except sqlite3.Error as e:
+                print(f"❌ Shared state polling failed: {e}")
+
+    def dispatch_pending(self, after_seq: int) -> int:
+        """
+        پیام‌های بعد از after_seq را به ترتیب به subscriber ها می رساند و بزرگ‌ترین seq تحویل شده را
+        برمی گرداند (نه MAX(seq) جدول، تا پیامی که بین خواندن و آن لحظه منتشر شده از دست نرود).
+        """
+        subscribers = {channel: list(callbacks) for channel, callbacks in self._subscribers.items()}
+        if not subscribers:
+            return after_seq
+        placeholders = ", ".join("?" for _ in subscribers)
+        rows = self._connection().execute(
+            f"SELECT seq, channel, payload FROM events WHERE seq > ? AND channel IN ({placeholders}) ORDER BY seq",
+            (after_seq, *subscribers),
+        ).fetchall()
+        for seq, channel, payload in rows:
+            for callback in subscribers[channel]:
+                try:
+                    callback(json.loads(payload))
+                except Exception as e:
+                    print(f"❌ Shared state subscriber for {channel} failed: {e}")
+            after_seq = seq
+        return after_seq
+
+
+shared_state = SharedState()
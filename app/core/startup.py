@@ -0,0 +1,44 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.core.metrics import registry
+
+# ------------------- گزارش زمان مراحل راه‌اندازی -------------------
+
+STARTUP_PHASE_SECONDS = registry.gauge(
+    "app_startup_phase_seconds",
+    "Duration of each application startup phase in the current worker.",
+    ("phase",),
+)
+
+
+class StartupReport:
+    """زمان هر مرحله از راه‌اندازی worker (import ها، ساخت اپ، lifespan) را ثبت می کند."""
+
+    def __init__(self) -> None:
+        self.started_at = time.perf_counter()
+        self.phases: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases.append((name, elapsed))
+            STARTUP_PHASE_SECONDS.set(elapsed, phase=name)
+
+    @property
+    def total_seconds(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def render(self) -> str:
+        lines = ["Startup report:"]
+        lines.extend(f"  {name:<28}{elapsed * 1000:>9.1f} ms" for name, elapsed in self.phases)
+        lines.append(f"  {'total (since first import)':<28}{self.total_seconds * 1000:>9.1f} ms")
+        return "\n".join(lines)
+
+
+startup_report = StartupReport()
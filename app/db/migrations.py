@@ -0,0 +1,147 @@
+"""
+مهاجرت‌های نسخه‌دار شِمای دیتابیس.
+
+ساخت و تغییر جداول دیگر هنگام import اپلیکیشن انجام نمی شود و باید با یک دستور جداگانه
+(مثلاً در مرحله deploy و قبل از بالا آمدن worker ها) اجرا شود:
+
+    python -m app.db.migrations upgrade      # اعمال همه مهاجرت‌های باقی‌مانده
+    python -m app.db.migrations current      # نسخه فعلی شِما
+    python -m app.db.migrations history      # فهرست مهاجرت‌ها
+
+هر مهاجرت یک شماره نسخه یکتا و صعودی دارد و در جدول schema_migrations ثبت می شود.
+مهاجرت جدید را به انتهای لیست MIGRATIONS اضافه کنید؛ مهاجرت‌های قبلی نباید تغییر کنند.
+"""
+import argparse
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+# جدول نسخه‌ها عمداً خارج از Base.metadata تعریف شده تا create_all تست‌ها آن را نسازد
+_version_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+# ------------------- مهاجرت‌ها -------------------
+
+def _initial_schema(conn: Connection) -> None:
+    """جداول users و dresses (با checkfirst تا دیتابیس‌های قدیمی ساخته شده با create_all هم پشتیبانی شوند)."""
+    from app.models.user import User
+    from app.models.dress import Dress
+
+    User.__table__.create(conn, checkfirst=True)
+    Dress.__table__.create(conn, checkfirst=True)
+
+
+def _job_queue(conn: Connection) -> None:
+    """جدول jobs برای صف کارهای پس‌زمینه و ستون status لباس‌ها (ردیف‌های موجود ready می شوند)."""
+    from app.models.job import Job
+
+    Job.__table__.create(conn, checkfirst=True)
+    columns = {column["name"] for column in inspect(conn).get_columns("dresses")}
+    if "status" not in columns:
+        conn.execute(text("ALTER TABLE dresses ADD COLUMN status VARCHAR(10) NOT NULL DEFAULT 'ready'"))
+
+
+def _stats_rollups(conn: Connection) -> None:
+    """جداول آمار تجمیعی داشبورد مدیریتی و پر کردن اولیه آنها از جدول dresses."""
+    from app.models.stats import ARSessionHourlyStat, DressDailyStat, UserDressStat
+    from app.services.stats_service import stats_service
+
+    for model in (DressDailyStat, UserDressStat, ARSessionHourlyStat):
+        model.__table__.create(conn, checkfirst=True)
+    stats_service.rebuild(conn)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "initial schema: users, dresses", _initial_schema),
+    Migration(2, "background job queue: jobs table, dresses.status", _job_queue),
+    Migration(3, "admin statistics rollups: dress_daily_stats, user_dress_stats, ar_session_hourly_stats", _stats_rollups),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ------------------- اجرای مهاجرت‌ها -------------------
+
+def current_version(conn: Connection) -> int:
+    """آخرین نسخه اعمال شده (۰ اگر جدول نسخه‌ها وجود نداشته باشد)."""
+    if not inspect(conn).has_table(schema_migrations.name):
+        return 0
+    versions = [row.version for row in conn.execute(schema_migrations.select())]
+    return max(versions, default=0)
+
+
+def pending_migrations(engine: Engine) -> list[Migration]:
+    with engine.connect() as conn:
+        version = current_version(conn)
+    return [migration for migration in MIGRATIONS if migration.version > version]
+
+
+def upgrade(engine: Engine, target: Optional[int] = None) -> list[Migration]:
+    """مهاجرت‌های باقی‌مانده را تا نسخه target (پیش‌فرض: آخرین) هر کدام در یک تراکنش اعمال می کند."""
+    applied = []
+    with engine.connect() as conn:
+        _version_metadata.create_all(conn)
+        conn.commit()
+        version = current_version(conn)
+
+    for migration in MIGRATIONS:
+        if migration.version <= version or (target is not None and migration.version > target):
+            continue
+        with engine.begin() as conn:
+            migration.upgrade(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow(),
+            ))
+        applied.append(migration)
+    return applied
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Versioned schema migrations")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subcommands.add_parser("upgrade", help="apply pending migrations")
+    upgrade_parser.add_argument("--target", type=int, help="stop at this version")
+    subcommands.add_parser("current", help="print the current schema version")
+    subcommands.add_parser("history", help="list all migrations")
+    args = parser.parse_args(argv)
+
+    from app.db.session import engine
+
+    if args.command == "upgrade":
+        applied = upgrade(engine, target=args.target)
+        for migration in applied:
+            print(f"Applied migration {migration.version}: {migration.description}")
+        if not applied:
+            print("Database schema is up to date.")
+    elif args.command == "current":
+        with engine.connect() as conn:
+            print(f"Current schema version: {current_version(conn)} (latest: {LATEST_VERSION})")
+    else:
+        with engine.connect() as conn:
+            version = current_version(conn)
+        for migration in MIGRATIONS:
+            marker = "x" if migration.version <= version else " "
+            print(f"[{marker}] {migration.version:>4}  {migration.description}")
+
+
+if __name__ == "__main__":
+    main()
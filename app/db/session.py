@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
 
 # ------------------- تغییر مهم -------------------
 # اضافه کردن connect_args مخصوص SQLite
@@ -16,6 +18,32 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# ------------------- اندازه‌گیری زمان commit و rollback -------------------
+# روی کلاس Session ثبت می شود تا Session های تست و اسکریپت ها را هم پوشش دهد.
+
+@event.listens_for(Session, "after_begin")
+def _mark_transaction_start(session, transaction, connection):
+    session.info["transaction_started_at"] = time.perf_counter()
+
+@event.listens_for(Session, "before_commit")
+def _mark_commit_start(session):
+    session.info["commit_started_at"] = time.perf_counter()
+
+@event.listens_for(Session, "after_commit")
+def _observe_commit(session):
+    commit_started_at = session.info.pop("commit_started_at", None)
+    if commit_started_at is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - commit_started_at, stage="db.commit")
+
+@event.listens_for(Session, "after_transaction_end")
+def _observe_transaction(session, transaction):
+    # فقط تراکنش اصلی (نه SAVEPOINT ها) اندازه‌گیری می شود
+    if transaction.parent is not None:
+        return
+    transaction_started_at = session.info.pop("transaction_started_at", None)
+    if transaction_started_at is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - transaction_started_at, stage="db.transaction")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -20,6 +20,9 @@ class Dress(Base):
     width = Column(Integer, nullable=False, default=512) 
     height = Column(Integer, nullable=False, default=512) 
 
+    # وضعیت پردازش تصویر: processing (در صف)، ready (آماده نمایش و AR)، failed
+    status = Column(Enum("processing", "ready", "failed", name="dress_status"), default="ready", server_default="ready", nullable=False)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # ارتباط با جدول User (مالک لباس)
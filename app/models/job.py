@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, JSON, UUID, Index
+from datetime import datetime
+import uuid
+
+# فرض میکنیم که Base از app.db.base import شده است
+from app.db.base import Base
+
+class Job(Base):
+    """مدل دیتابیس برای کارهای صف پس‌زمینه (پردازش تصویر و ...)"""
+    __tablename__ = "jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False) # نوع کار، مثلاً dress.normalize
+    payload = Column(JSON, nullable=False, default=dict)
+    status = Column(Enum("queued", "running", "succeeded", "failed", name="job_status"), default="queued", nullable=False)
+
+    # کلید یکتا برای جلوگیری از ثبت دوباره یک کار (مثلاً با تکرار درخواست آپلود)
+    idempotency_key = Column(String, unique=True, nullable=True)
+    user_id = Column(UUID(as_uuid=True), nullable=True) # کاربر درخواست کننده (بدون کلید خارجی تا حذف حساب مسدود نشود)
+
+    # تلاش مجدد با Backoff
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow) # زودترین زمان اجرای بعدی
+    last_error = Column(Text, nullable=True)
+
+    # قفل اجرای کار (Lease)؛ اگر worker از کار بیفتد، بعد از انقضا کار دوباره برداشته می شود
+    locked_by = Column(String, nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+
+    result = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_run_at", "status", "run_at"),
+    )
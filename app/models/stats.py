@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, Date, DateTime, Enum, UUID, Index
+
+# فرض میکنیم که Base از app.db.base import شده است
+from app.db.base import Base
+
+# ------------------- جداول تجمیعی (Rollup) آمار -------------------
+# این جداول در همان تراکنشی که لباس یا جلسه AR ثبت/حذف می شود به صورت افزایشی بروز می شوند
+# تا داشبوردهای مدیریتی بدون اسکن کامل dresses و users خوانده شوند.
+
+class DressDailyStat(Base):
+    """تعداد لباس‌های موجود به تفکیک روز ایجاد (UTC) و جنسیت"""
+    __tablename__ = "dress_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    # نام نوع Enum جداست تا روی PostgreSQL نوع dress_gender جدول dresses دوباره ساخته نشود
+    gender = Column(Enum("male", "female", name="dress_daily_stat_gender"), primary_key=True)
+    dress_count = Column(Integer, nullable=False, default=0)
+
+
+class UserDressStat(Base):
+    """تعداد لباس‌های هر کاربر"""
+    __tablename__ = "user_dress_stats"
+
+    user_id = Column(UUID(as_uuid=True), primary_key=True) # بدون کلید خارجی تا حذف حساب مسدود نشود
+    dress_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_user_dress_stats_dress_count", "dress_count"),
+    )
+
+
+class ARSessionHourlyStat(Base):
+    """تعداد جلسات AR شروع شده در هر ساعت (UTC)"""
+    __tablename__ = "ar_session_hourly_stats"
+
+    hour = Column(DateTime, primary_key=True) # ابتدای ساعت
+    session_count = Column(Integer, nullable=False, default=0)
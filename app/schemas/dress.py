@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from typing import Optional
 from datetime import datetime
 import uuid
@@ -24,11 +24,32 @@ class DressInDB(DressBase):
     file_path: str 
     width: int
     height: int
+    status: str = "ready"
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+# اعتبارسنجی و سریال‌سازی یکجای لیست لباس‌ها (به جای اعتبارسنجی تک به تک)
+DressListAdapter = TypeAdapter(list[DressInDB])
+
+# ستون‌هایی که برای ساخت DressInDB لازم هستند
+DRESS_LIST_COLUMNS = ("id", "user_id", "file_path", "gender", "title", "width", "height", "status", "created_at")
+
+# Resumable Upload Schemas
+class ResumableUploadCreate(DressBase):
+    """شمای ورودی برای شروع آپلود تکه‌ای (اطلاعات فایل و متادیتای لباس)"""
+    filename: str = Field(..., min_length=1, max_length=255)
+    content_type: str
+    length: int = Field(..., gt=0)
+
+class ResumableUploadStatus(BaseModel):
+    """شمای خروجی وضعیت آپلود تکه‌ای"""
+    upload_id: uuid.UUID
+    offset: int
+    length: int
+    expires_at: datetime
+
 # AR Session Schemas
 class ARSessionCreate(BaseModel):
     """شمای ورودی برای شروع جلسه پرو مجازی"""
@@ -38,4 +59,17 @@ class ARSessionStatus(BaseModel):
     """شمای خروجی وضعیت جلسه پرو مجازی"""
     session_id: uuid.UUID
     status: str
-    message: Optional[str] = None
\ No newline at end of file
+    message: Optional[str] = None
+
+class ARArtifact(BaseModel):
+    """یک فایل خروجی موتور AR (تصویر، فریم یا ویدیو)"""
+    name: str
+    size: int
+    media_type: str
+    modified_at: datetime
+
+class ARArtifactList(BaseModel):
+    """فهرست خروجی‌های یک جلسه؛ complete=False یعنی موتور هنوز در حال نوشتن است"""
+    session_id: uuid.UUID
+    complete: bool
+    artifacts: list[ARArtifact]
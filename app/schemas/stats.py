@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+import uuid
+
+# Admin Statistics Schemas (خوانده شده از جداول تجمیعی)
+class DressDailyCount(BaseModel):
+    """تعداد لباس‌های موجود ایجاد شده در یک روز برای یک جنسیت"""
+    day: date
+    gender: str
+    dress_count: int
+
+class UserDressCount(BaseModel):
+    """تعداد لباس‌های یک کاربر"""
+    user_id: uuid.UUID
+    dress_count: int
+
+class ARSessionHourlyCount(BaseModel):
+    """تعداد جلسات AR شروع شده در یک ساعت"""
+    hour: datetime
+    session_count: int
+
+class StatsRebuildResult(BaseModel):
+    """تعداد سطل‌های (Bucket) ساخته شده هنگام بازسازی آمار از جداول خام"""
+    dress_daily_buckets: int
+    user_buckets: int
@@ -41,4 +41,12 @@ class UserInDB(UserBase):
 class Token(BaseModel):
     """شمای توکن امنیتی JWT"""
     access_token: str
-    token_type: str = "bearer"
\ No newline at end of file
+    token_type: str = "bearer"
+
+# Account Deletion Schemas
+class AccountDeletionStatus(BaseModel):
+    """شمای خروجی وضعیت حذف حساب کاربری"""
+    job_id: uuid.UUID
+    status: str
+    deleted_dress_count: int = 0
+    message: Optional[str] = None
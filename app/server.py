@@ -0,0 +1,132 @@
+"""
+اجرای سرور با چند worker (Prefork).
+
+    python -m app.server --workers 4 --host 0.0.0.0 --port 8000
+
+فرآیند والد سوکت را bind می کند، اپلیکیشن (main.app) را یک بار بارگذاری می کند و سپس
+به تعداد worker ها fork می کند؛ هر فرزند یک uvicorn.Server روی همان سوکت اجرا می کند.
+حافظه import های سنگین بین worker ها به صورت copy-on-write مشترک می ماند. worker هایی که
+از کار بیفتند دوباره ساخته می شوند و SIGINT / SIGTERM به همه آنها منتقل می شود.
+
+وضعیت بین worker ها (جلسات AR، شمارنده‌های نسخه و پیام‌های ابطال کش) در app.core.shared_state
+نگهداری می شود، بنابراین رفتار سرور با یک یا چند worker یکسان است. متریک‌های /metrics
+در حافظه هر worker نگهداری می شوند: هر پاسخ فقط مقادیر worker پاسخ دهنده را نشان می دهد.
+روی سیستم‌هایی که os.fork ندارند (Windows) از حالت workers خود uvicorn استفاده می شود.
+"""
+import argparse
+import os
+import signal
+import socket
+import time
+from typing import Optional
+
+import uvicorn
+
+from app.core.config import settings
+
+APP_IMPORT_STRING = "main:app"
+
+
+def resolve_worker_count(workers: Optional[int] = None) -> int:
+    """تعداد worker ها؛ مقدار 0 یا منفی یعنی به تعداد هسته‌های CPU."""
+    count = settings.WEB_CONCURRENCY if workers is None else workers
+    if count <= 0:
+        count = os.cpu_count() or 1
+    return count
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """فرآیند والد: ساخت، پایش و بازسازی worker ها."""
+
+    def __init__(self, config: uvicorn.Config, sock: socket.socket, workers: int) -> None:
+        self.config = config
+        self.sock = sock
+        self.workers = workers
+        self.children: dict[int, int] = {}  # pid -> شماره worker
+        self.should_exit = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            # فرزند: سیگنال‌های والد را به حالت پیش‌فرض برمی گرداند تا uvicorn خودش آنها را مدیریت کند
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                uvicorn.Server(self.config).run(sockets=[self.sock])
+            except BaseException as e:
+                print(f"❌ Worker {index} crashed: {e}")
+                code = 1
+            finally:
+                os._exit(code)
+        self.children[pid] = index
+        print(f"🚀 Worker {index} started | PID: {pid}")
+
+    def handle_exit(self, signum, frame) -> None:
+        self.should_exit = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        for index in range(self.workers):
+            self.spawn(index)
+
+        while self.children:
+            try:
+                pid, exit_status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = self.children.pop(pid, None)
+            if index is None or self.should_exit:
+                continue
+            print(f"⚠️ Worker {index} (PID: {pid}) exited with status {exit_status}; restarting")
+            time.sleep(0.5)
+            self.spawn(index)
+        self.sock.close()
+
+
+def serve(host: str, port: int, workers: Optional[int] = None, log_level: str = "info") -> None:
+    count = resolve_worker_count(workers)
+    if count == 1 or not hasattr(os, "fork"):
+        # یک worker یا سیستم بدون fork: اجرای مستقیم uvicorn (با workers داخلی در صورت نیاز)
+        uvicorn.run(APP_IMPORT_STRING, host=host, port=port, workers=count, log_level=log_level)
+        return
+
+    sock = bind_socket(host, port)
+    # بارگذاری اپلیکیشن قبل از fork تا import ها یک بار انجام شوند
+    from main import app
+
+    config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+    print(f"Serving {APP_IMPORT_STRING} on http://{host}:{port} with {count} workers (supervisor PID: {os.getpid()})")
+    Supervisor(config, sock, count).run()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the API with several preforked workers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, help="number of workers (default: WEB_CONCURRENCY, 0 = CPU count)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
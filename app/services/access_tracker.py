@@ -0,0 +1,198 @@
+import hashlib
+import threading
+import time
+from array import array
+from typing import Optional
+
+import orjson
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.shared_state import SharedState, shared_state
+
+# ------------------- ردیابی دفعات دسترسی (Count-Min Sketch + Top-K) -------------------
+# هر worker دسترسی‌ها (شروع AR و دریافت تصویر لباس) را در یک Sketch محلی جمع می کند و هر
+# ACCESS_SKETCH_FLUSH_SECONDS آن را با Sketch ذخیره شده در وضعیت مشترک ادغام می کند.
+# شمارنده‌ها با نیمه‌عمر ACCESS_SKETCH_HALF_LIFE_HOURS کاهش می یابند تا محبوبیت قدیمی کم‌رنگ شود.
+# حجم Sketch ثابت است (WIDTH × DEPTH شمارنده) و به تعداد لباس‌ها بستگی ندارد.
+
+ACCESS_RECORDS = registry.counter(
+    "access_sketch_records_total",
+    "Accesses recorded in the hot-item sketch by source (ar_start, image).",
+    ("source",),
+)
+
+SKETCH_BLOB_NAME = "access-sketch"
+
+
+class CountMinSketch:
+    """Count-Min Sketch: تخمین تعداد دسترسی هر کلید با خطای فقط رو به بالا و حافظه ثابت."""
+
+    def __init__(self, width: int, depth: int, counts: Optional[array] = None) -> None:
+        self.width, self.depth = width, depth
+        self.counts = counts if counts is not None else array("Q", bytes(8 * width * depth))
+
+    def _indexes(self, key: str) -> list[int]:
+        # Double hashing: یک هش ۱۲۸ بیتی برای همه ردیف‌ها
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        estimate = None
+        for index in self._indexes(key):
+            self.counts[index] += count
+            value = self.counts[index]
+            estimate = value if estimate is None else min(estimate, value)
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(self.counts[index] for index in self._indexes(key))
+
+    def merge(self, other: "CountMinSketch") -> None:
+        for index, value in enumerate(other.counts):
+            if value:
+                self.counts[index] += value
+
+    def scale(self, factor: float) -> None:
+        if factor >= 1:
+            return
+        for index, value in enumerate(self.counts):
+            if value:
+                self.counts[index] = round(value * factor)
+
+
+class AccessTracker:
+
+    def __init__(self, state: SharedState = shared_state) -> None:
+        self.state = state
+        self._lock = threading.Lock()
+        self._delta: Optional[CountMinSketch] = None   # دسترسی‌های ثبت نشده در وضعیت مشترک
+        self._merged: Optional[CountMinSketch] = None  # آخرین Sketch ادغام شده
+        self._top: dict[str, int] = {}
+        self._flush_thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _empty(self) -> CountMinSketch:
+        return CountMinSketch(settings.ACCESS_SKETCH_WIDTH, settings.ACCESS_SKETCH_DEPTH)
+
+    def _ensure(self) -> None:
+        if self._delta is None:
+            self._delta, self._merged = self._empty(), self._empty()
+
+    def _offer(self, key: str, estimate: int) -> None:
+        """نگهداری K کلید پرتکرار (کلید با کمترین تخمین کنار می رود)."""
+        if key in self._top or len(self._top) < settings.ACCESS_SKETCH_TOP_K:
+            self._top[key] = estimate
+            return
+        coldest = min(self._top, key=self._top.__getitem__)
+        if estimate > self._top[coldest]:
+            del self._top[coldest]
+            self._top[key] = estimate
+
+    def record(self, key: str, source: str) -> None:
+        """ثبت یک دسترسی (کلید = نام فایل تصویر لباس در STORAGE_PATH)."""
+        if not settings.ACCESS_SKETCH_ENABLED:
+            return
+        with self._lock:
+            self._ensure()
+            estimate = self._delta.add(key) + self._merged.estimate(key)
+            self._offer(key, estimate)
+        ACCESS_RECORDS.inc(source=source)
+
+    def hottest(self, n: int) -> list[tuple[str, int]]:
+        with self._lock:
+            return sorted(self._top.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+    # ------------------- ذخیره و بارگذاری -------------------
+
+    def _decode(self, data: Optional[bytes]) -> tuple[CountMinSketch, dict[str, int], float]:
+        sketch = self._empty()
+        if data:
+            header_size = int.from_bytes(data[:4], "little")
+            header = orjson.loads(data[4:4 + header_size])
+            if (header["width"], header["depth"]) == (sketch.width, sketch.depth):
+                sketch.counts = array("Q", data[4 + header_size:])
+                return sketch, header["top"], header["updated_at"]
+        # ابعاد Sketch تغییر کرده یا داده‌ای وجود ندارد: شروع از صفر
+        return sketch, {}, time.time()
+
+    def _encode(self, sketch: CountMinSketch, top: dict[str, int], updated_at: float) -> bytes:
+        """قالب ذخیره: طول سرآیند (۴ بایت)، سرآیند JSON و سپس شمارنده‌ها به صورت خام."""
+        header = orjson.dumps({"width": sketch.width, "depth": sketch.depth, "updated_at": updated_at, "top": top})
+        return len(header).to_bytes(4, "little") + header + sketch.counts.tobytes()
+
+    def load(self) -> None:
+        """بارگذاری Sketch ذخیره شده (هنگام راه‌اندازی) تا فهرست پرتکرارها از قبل موجود باشد."""
+        sketch, top, _ = self._decode(self.state.get_blob(SKETCH_BLOB_NAME))
+        with self._lock:
+            self._ensure()
+            self._merged = sketch
+            for key, _ in sorted(top.items(), key=lambda item: -item[1]):
+                self._offer(key, sketch.estimate(key) + self._delta.estimate(key))
+
+    def flush(self) -> None:
+        """ادغام دسترسی‌های این worker با Sketch مشترک (همراه با کاهش نیمه‌عمر) و بروزرسانی فهرست پرتکرارها."""
+        with self._lock:
+            if self._delta is None:
+                return
+            delta, local_keys = self._delta, list(self._top)
+            self._delta = self._empty()
+
+        def merge(data: Optional[bytes]) -> bytes:
+            sketch, top, updated_at = self._decode(data)
+            now = time.time()
+            half_life = settings.ACCESS_SKETCH_HALF_LIFE_HOURS * 3600
+            if half_life > 0:
+                sketch.scale(0.5 ** ((now - updated_at) / half_life))
+            sketch.merge(delta)
+            candidates = {key: sketch.estimate(key) for key in {*top, *local_keys}}
+            hottest = sorted(candidates.items(), key=lambda item: -item[1])[:settings.ACCESS_SKETCH_TOP_K]
+            return self._encode(sketch, {key: count for key, count in hottest if count > 0}, now)
+
+        try:
+            data = self.state.update_blob(SKETCH_BLOB_NAME, merge)
+        except Exception:
+            # دسترسی‌ها از دست نروند؛ در flush بعدی دوباره تلاش می شود
+            with self._lock:
+                self._delta.merge(delta)
+            raise
+
+        sketch, top, _ = self._decode(data)
+        with self._lock:
+            # کلیدهایی که در حین flush ثبت شده‌اند هم در فهرست می مانند
+            keys = {*top, *self._top}
+            self._merged, self._top = sketch, {}
+            for key in keys:
+                self._offer(key, sketch.estimate(key) + self._delta.estimate(key))
+
+    def start(self) -> None:
+        """بارگذاری Sketch و شروع ذخیره دوره‌ای در پس‌زمینه (در lifespan)."""
+        if not settings.ACCESS_SKETCH_ENABLED or self._flush_thread is not None:
+            return
+        self.load()
+        self._stop.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, name="access-sketch-flush", daemon=True)
+        self._flush_thread.start()
+
+    def stop(self) -> None:
+        """توقف ذخیره دوره‌ای و ذخیره دسترسی‌های باقی‌مانده."""
+        if self._flush_thread is None:
+            return
+        self._stop.set()
+        self._flush_thread.join(5)
+        self._flush_thread = None
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"❌ Could not persist the access sketch: {e}")
+
+    def _flush_loop(self) -> None:
+        while not self._stop.wait(settings.ACCESS_SKETCH_FLUSH_SECONDS):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Could not persist the access sketch: {e}")
+
+
+access_tracker = AccessTracker()
@@ -0,0 +1,190 @@
+import mimetypes
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import AsyncIterator, Callable, Optional
+
+import anyio
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.schemas.dress import ARArtifact
+
+# ------------------- خروجی جلسات AR -------------------
+# موتور AR خروجی هر جلسه (فریم‌ها، تصویر نهایی، ویدیو) را در {AR_OUTPUT_PATH}/{session_id} می نویسد.
+# فایل‌هایی که نامشان با "." شروع یا به ".tmp" ختم می شود (مثل لاگ موتور و فایل‌های نیمه‌کاره) منتشر نمی شوند.
+
+AR_ARTIFACT_RESPONSES = registry.counter(
+    "ar_artifact_responses_total",
+    "AR artifact responses by delivery mode (full, range, follow).",
+    ("mode",),
+)
+AR_OUTPUT_REMOVED = registry.counter(
+    "ar_output_removed_total",
+    "AR session output directories removed by the retention policy.",
+    ("reason",),
+)
+
+# نوع‌هایی که mimetypes به صورت پیش‌فرض نمی شناسد
+_EXTRA_MEDIA_TYPES = {
+    ".mjpg": "video/x-motion-jpeg",
+    ".mjpeg": "video/x-motion-jpeg",
+    ".webm": "video/webm",
+    ".avif": "image/avif",
+    ".webp": "image/webp",
+}
+
+
+def _is_hidden(name: str) -> bool:
+    return name.startswith(".") or name.endswith(".tmp")
+
+
+class ArtifactStore:
+
+    def __init__(self) -> None:
+        self._retention_lock = threading.Lock()
+        self._last_retention = float("-inf")
+
+    def session_dir(self, session_id: str) -> str:
+        return os.path.abspath(os.path.join(settings.AR_OUTPUT_PATH, session_id))
+
+    def prepare(self, session_id: str) -> str:
+        """ساخت پوشه خروجی جلسه قبل از اجرای موتور."""
+        path = self.session_dir(session_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def media_type(self, name: str) -> str:
+        extension = os.path.splitext(name)[1].lower()
+        return _EXTRA_MEDIA_TYPES.get(extension) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+    def list_artifacts(self, session_id: str) -> list[ARArtifact]:
+        """فایل‌های منتشر شده جلسه (با مسیر نسبی، مثلاً frames/0001.jpg) به ترتیب نام."""
+        root = self.session_dir(session_id)
+        artifacts = []
+        for directory, subdirectories, files in os.walk(root):
+            subdirectories[:] = [name for name in subdirectories if not _is_hidden(name)]
+            for name in files:
+                if _is_hidden(name):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat_result = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                relative = os.path.relpath(path, root).replace(os.sep, "/")
+                artifacts.append(ARArtifact(
+                    name=relative,
+                    size=stat_result.st_size,
+                    media_type=self.media_type(name),
+                    modified_at=datetime.utcfromtimestamp(stat_result.st_mtime),
+                ))
+        return sorted(artifacts, key=lambda artifact: artifact.name)
+
+    def resolve(self, session_id: str, name: str) -> Optional[tuple[str, os.stat_result]]:
+        """مسیر و stat یک فایل خروجی؛ None برای نام نامعتبر (خارج از پوشه جلسه یا مخفی) یا فایل ناموجود."""
+        root = os.path.realpath(self.session_dir(session_id))
+        path = os.path.realpath(os.path.join(root, name))
+        if not path.startswith(root + os.sep) or any(_is_hidden(part) for part in name.split("/")):
+            return None
+        try:
+            stat_result = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        if not os.path.isfile(path):
+            return None
+        return path, stat_result
+
+    async def follow(self, path: str, is_running: Callable[[], bool], chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """
+        Stream فایلی که موتور هنوز در حال نوشتن آن است: داده موجود فوراً ارسال می شود و بعد از رسیدن
+        به انتهای فایل، تا وقتی جلسه در حال اجراست داده‌های جدید دنبال می شوند؛ حداکثر به مدت
+        AR_ARTIFACT_MAX_FOLLOW_SECONDS، تا موتوری که گیر کرده اتصال را برای همیشه باز نگه ندارد.
+        """
+        deadline = time.monotonic() + settings.AR_ARTIFACT_MAX_FOLLOW_SECONDS
+        async with await anyio.open_file(path, mode="rb") as file:
+            while True:
+                chunk = await file.read(chunk_size)
+                if chunk:
+                    yield chunk
+                    continue
+                if time.monotonic() >= deadline or not await anyio.to_thread.run_sync(is_running):
+                    # داده‌هایی که بین آخرین خواندن و پایان فرآیند نوشته شده‌اند
+                    while chunk := await file.read(chunk_size):
+                        yield chunk
+                    return
+                await anyio.sleep(settings.AR_ARTIFACT_POLL_INTERVAL)
+
+    # ------------------- سیاست نگهداری (Retention) -------------------
+
+    def _directory_usage(self, path: str) -> tuple[int, float]:
+        """حجم کل و زمان آخرین تغییر پوشه یک جلسه."""
+        size, last_modified = 0, os.stat(path).st_mtime
+        for directory, _, files in os.walk(path):
+            for name in files:
+                try:
+                    stat_result = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                size += stat_result.st_size
+                last_modified = max(last_modified, stat_result.st_mtime)
+        return size, last_modified
+
+    def apply_retention(self, running: set[str], now: Optional[float] = None) -> list[str]:
+        """
+        حذف خروجی جلسات تمام شده: ابتدا جلساتی که از آخرین تغییرشان بیش از AR_OUTPUT_MAX_AGE_HOURS گذشته،
+        سپس قدیمی‌ترین‌ها تا وقتی حجم کل بیشتر از AR_OUTPUT_MAX_TOTAL_MB است. جلسات در حال اجرا حذف نمی شوند.
+        شناسه جلسات حذف شده را برمی گرداند.
+        """
+        base = os.path.abspath(settings.AR_OUTPUT_PATH)
+        if not os.path.isdir(base):
+            return []
+        now = time.time() if now is None else now
+        max_age = settings.AR_OUTPUT_MAX_AGE_HOURS * 3600
+        max_bytes = settings.AR_OUTPUT_MAX_TOTAL_MB * 1024 * 1024
+
+        sessions = []
+        for session_id in os.listdir(base):
+            path = os.path.join(base, session_id)
+            if not os.path.isdir(path):
+                continue
+            try:
+                size, last_modified = self._directory_usage(path)
+            except FileNotFoundError:
+                continue
+            sessions.append((last_modified, session_id, path, size))
+        sessions.sort()
+
+        removed = []
+        total = sum(size for *_, size in sessions)
+        for last_modified, session_id, path, size in sessions:
+            if session_id in running:
+                continue
+            if now - last_modified > max_age:
+                reason = "age"
+            elif total > max_bytes:
+                reason = "size"
+            else:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed.append(session_id)
+            AR_OUTPUT_REMOVED.inc(reason=reason)
+        return removed
+
+    def maybe_apply_retention(self, running_provider: Callable[[], list[str]]) -> list[str]:
+        """اجرای سیاست نگهداری حداکثر یک بار در هر AR_OUTPUT_RETENTION_INTERVAL ثانیه."""
+        with self._retention_lock:
+            if time.monotonic() - self._last_retention < settings.AR_OUTPUT_RETENTION_INTERVAL:
+                return []
+            self._last_retention = time.monotonic()
+        try:
+            return self.apply_retention(set(running_provider()))
+        except OSError as e:
+            print(f"❌ AR output retention failed: {e}")
+            return []
+
+
+artifact_store = ArtifactStore()
@@ -1,20 +1,89 @@
+import logging
 import subprocess
 import os
 import uuid
 import sys
+import threading
+import time
 from typing import Optional
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
 from app.core.config import settings
+from app.core.metrics import timed, AR_PROCESSES_STARTED, AR_PROCESSES_RUNNING
+from app.core.shared_state import shared_state
 from app.models.dress import Dress
 from app.schemas.dress import ARSessionStatus
+from app.services.access_tracker import access_tracker
+from app.services.ar_artifacts import artifact_store
+from app.services.stats_service import stats_service
+
+logger = logging.getLogger("app.ar")
 
 class AROrchestrator:
     """
     مسئول هماهنگی و اجرای موتور پرو مجازی (AR Engine) به عنوان یک فرآیند جداگانه.
     """
+
+    def __init__(self) -> None:
+        # فرآیندهای اجرا شده توسط همین worker به تفکیک session_id (برای شمارش فرآیندهای فعال)
+        # مالکیت و وضعیت جلسات برای همه worker ها در shared_state ثبت می شود.
+        self._processes: dict[str, subprocess.Popen] = {}
+        self._lock = threading.Lock()
+
+    def active_session_count(self) -> int:
+        """تعداد فرآیندهای AR در حال اجرای این worker؛ فرآیندهای تمام شده حذف و در وضعیت مشترک بسته می شوند."""
+        with self._lock:
+            finished = [session_id for session_id, process in self._processes.items() if process.poll() is not None]
+            for session_id in finished:
+                del self._processes[session_id]
+                shared_state.end_ar_session(session_id)
+            return len(self._processes)
+
+    def _reap(self, session_id: str, process: subprocess.Popen) -> None:
+        """
+        منتظر پایان فرآیند موتور می ماند (تا Zombie باقی نماند) و بلافاصله جلسه را در وضعیت مشترک می بندد؛
+        بدون این Thread، جلسه تا درخواست بعدی همین worker در حال اجرا دیده می شد.
+        """
+        process.wait()
+        with self._lock:
+            if self._processes.get(session_id) is process:
+                del self._processes[session_id]
+        shared_state.end_ar_session(session_id)
+
+    def get_session(self, session_id: uuid.UUID) -> Optional[dict]:
+        """اطلاعات جلسه (مالک، لباس، PID و زمان پایان) مستقل از اینکه کدام worker آن را اجرا کرده است."""
+        self.active_session_count()
+        return shared_state.get_ar_session(str(session_id))
+
+    def is_session_running(self, session_id: uuid.UUID) -> bool:
+        """آیا موتور AR این جلسه (در هر worker) هنوز در حال اجرا و نوشتن خروجی است."""
+        self.active_session_count()
+        return shared_state.is_ar_session_running(str(session_id))
+
+    def apply_output_retention(self) -> None:
+        """حذف خروجی جلسات قدیمی طبق سیاست نگهداری و پاک کردن سوابق آنها از وضعیت مشترک."""
+        removed = artifact_store.maybe_apply_retention(shared_state.running_ar_session_ids)
+        if removed:
+            shared_state.prune_ar_sessions(ended_before=time.time() - settings.AR_OUTPUT_MAX_AGE_HOURS * 3600)
     
+    def _record_session_stats(self, db: Session, dress: Dress) -> None:
+        """
+        ثبت جلسه در Sketch دسترسی‌ها و آمار ساعتی؛ فرآیند موتور اجرا شده است، پس خطاها فقط
+        گزارش می شوند و پاسخ موفق (و رزرو جلسه) را از بین نمی برند.
+        """
+        try:
+            access_tracker.record(os.path.basename(dress.file_path), "ar_start")
+        except Exception as e:
+            logger.warning("Could not record AR access: %s", e)
+        try:
+            stats_service.ar_session_started(db)
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            logger.warning("Could not record AR session stats: %s", e)
+
     def start_ar_session(self, db: Session, dress: Dress) -> ARSessionStatus:
         """
         اجرای اسکریپت پایتون AR Engine و ارسال پارامترهای لازم.
@@ -24,7 +93,10 @@ class AROrchestrator:
         # اگر در .env فقط اسم فایل (mock_ar.py) را دادید، این کد آن را پیدا می‌کند
         script_path = os.path.abspath(settings.AR_ENGINE_SCRIPT_PATH)
         
-        if not os.path.exists(script_path):
+        with timed("ar.script_check"):
+            script_exists = os.path.exists(script_path)
+
+        if not script_exists:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"فایل موتور AR در مسیر زیر یافت نشد: {script_path}. لطفا تنظیمات .env را چک کنید."
@@ -33,46 +105,84 @@ class AROrchestrator:
         # ۲. تعریف آرگومان‌ها برای ارسال به اسکریپت AR
         # ما مسیر فایل لباس، جنسیت و یک ID یکتا برای این جلسه (Session) ارسال می‌کنیم
         current_session_id = str(uuid.uuid4())
-        
-        command = [
-            sys.executable,          # استفاده از مفسر پایتون فعلی (بسیار مهم برای venv)
-            script_path,             # مسیر اسکریپت (مثلاً mock_ar.py)
-            "--dress_path", dress.file_path, 
-            "--gender", dress.gender,
-            "--session_id", current_session_id
-        ]
 
+        # رزرو جلسه در وضعیت مشترک؛ سقف AR_MAX_CONCURRENT_SESSIONS برای کل سرور (همه worker ها) اعمال می شود
+        self.active_session_count()
+        reserved = shared_state.reserve_ar_session(
+            current_session_id, str(dress.user_id), str(dress.id), limit=settings.AR_MAX_CONCURRENT_SESSIONS
+        )
+        if not reserved:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="ظرفیت موتور پرو مجازی تکمیل است. لطفاً چند لحظه دیگر دوباره تلاش کنید.",
+                headers={"Retry-After": "5"},
+            )
+        
         try:
+            # پوشه خروجی جلسه؛ موتور فایل‌ها را اینجا می نویسد و API آنها را Stream می کند
+            self.apply_output_retention()
+            output_dir = artifact_store.prepare(current_session_id)
+
+            command = [
+                sys.executable,          # استفاده از مفسر پایتون فعلی (بسیار مهم برای venv)
+                script_path,             # مسیر اسکریپت (مثلاً mock_ar.py)
+                "--dress_path", dress.file_path, 
+                "--gender", dress.gender,
+                "--session_id", current_session_id,
+                "--output_dir", output_dir
+            ]
+
             # ۳. اجرای اسکریپت به صورت Non-blocking (در پس‌زمینه)
-            # این کار باعث می‌شود API منتظر تمام شدن کار AR نماند و سریع پاسخ دهد
-            process = subprocess.Popen(
-                command, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8'
-            )
-            
-            # چاپ لاگ در ترمینال سرور برای مانیتورینگ
-            print(f"🚀 AR Engine started | Dress ID: {dress.id} | PID: {process.pid}")
-
-            return ARSessionStatus(
-                session_id=uuid.UUID(current_session_id),
-                status="started",
-                message=f"موتور پرو مجازی با موفقیت اجرا شد (PID: {process.pid}). خروجی را در ترمینال چک کنید."
-            )
-            
+            # این کار باعث می‌شود API منتظر تمام شدن کار AR نماند و سریع پاسخ دهد.
+            # خروجی متنی موتور در فایل مخفی .engine.log پوشه جلسه ذخیره می شود (PIPE خوانده نشده پر می شد و موتور را متوقف می کرد)
+            with timed("ar.popen"), open(os.path.join(output_dir, ".engine.log"), "wb") as engine_log:
+                process = subprocess.Popen(
+                    command, 
+                    stdout=engine_log, 
+                    stderr=subprocess.STDOUT
+                )
+
         except FileNotFoundError:
+            shared_state.discard_ar_session(current_session_id)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="مفسر پایتون یافت نشد. مطمئن شوید Python در PATH سیستم قرار دارد."
             )
         except Exception as e:
-            print(f"❌ Error starting AR Engine: {e}")
+            shared_state.discard_ar_session(current_session_id)
+            logger.exception("Error starting AR Engine: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"خطا در اجرای موتور پرو مجازی: {str(e)}"
             )
 
+        # از اینجا فرآیند موتور در حال اجراست و رزرو جلسه آزاد نمی شود؛ Thread مراقب بعد از پایان فرآیند جلسه را می بندد
+        with self._lock:
+            self._processes[current_session_id] = process
+        threading.Thread(
+            target=self._reap, args=(current_session_id, process), name=f"ar-reaper-{process.pid}", daemon=True
+        ).start()
+        try:
+            shared_state.attach_ar_process(current_session_id, process.pid)
+        except Exception as e:
+            # رزرو بدون PID بعد از چند ثانیه منقضی می شود؛ موتوری که در سقف جلسات حساب نشود متوقف می شود
+            process.terminate()
+            logger.exception("Could not register AR Engine PID %s; engine stopped: %s", process.pid, e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"خطا در اجرای موتور پرو مجازی: {str(e)}"
+            )
+        AR_PROCESSES_STARTED.inc()
+        self._record_session_stats(db, dress)
+
+        logger.info("AR Engine started | Dress ID: %s | PID: %s", dress.id, process.pid)
+
+        return ARSessionStatus(
+            session_id=uuid.UUID(current_session_id),
+            status="started",
+            message=f"موتور پرو مجازی با موفقیت اجرا شد (PID: {process.pid}). خروجی از مسیر /ar-session/{current_session_id}/artifacts قابل دریافت است."
+        )
+
 # ایجاد یک نمونه واحد از سرویس برای استفاده در کل پروژه
-ar_orchestrator = AROrchestrator()
\ No newline at end of file
+ar_orchestrator = AROrchestrator()
+AR_PROCESSES_RUNNING.set_callback(ar_orchestrator.active_session_count)
\ No newline at end of file
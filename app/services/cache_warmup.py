@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.shared_state import shared_state
+from app.services import image_variants
+from app.services.access_tracker import AccessTracker, access_tracker
+
+# ------------------- گرم کردن کش هنگام راه‌اندازی -------------------
+# بعد از deploy یا ری‌استارت، تصاویر پرتکرارترین لباس‌ها (بر اساس Sketch دفعات دسترسی) در پس‌زمینه
+# یک بار خوانده می شوند تا در Page Cache سیستم‌عامل قرار گیرند، و نسخه‌های WebP/AVIF ناموجود ساخته می شوند.
+# کار در یک Thread و با بودجه زمانی WARMUP_BUDGET_SECONDS انجام می شود و آماده شدن سرور را عقب نمی اندازد.
+
+CACHE_WARMUP_ITEMS = registry.counter(
+    "cache_warmup_items_total",
+    "Hot garment images handled by the startup warm-up (warmed, missing).",
+    ("result",),
+)
+
+_WARMUP_LOCK_KEY = "cache-warmup"
+_READ_CHUNK = 1024 * 1024
+
+
+def _read_through(path: str) -> int:
+    """خواندن کامل فایل تا در Page Cache قرار گیرد؛ تعداد بایت‌ها را برمی گرداند."""
+    size = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(_READ_CHUNK):
+            size += len(chunk)
+    return size
+
+
+def warm_up(
+    tracker: AccessTracker = access_tracker,
+    top_n: Optional[int] = None,
+    budget_seconds: Optional[float] = None
+) -> list[str]:
+    """پرتکرارترین تصاویر را تا پایان بودجه زمانی گرم می کند؛ کلیدهای گرم شده را برمی گرداند."""
+    top_n = settings.WARMUP_TOP_N if top_n is None else top_n
+    budget_seconds = settings.WARMUP_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    deadline = time.monotonic() + budget_seconds
+    storage = os.path.abspath(settings.STORAGE_PATH)
+
+    warmed = []
+    for key, _ in tracker.hottest(top_n):
+        if time.monotonic() >= deadline:
+            break
+        path = os.path.join(storage, key)
+        if os.path.basename(key) != key or not os.path.isfile(path):
+            CACHE_WARMUP_ITEMS.inc(result="missing")
+            continue
+        _read_through(path)
+        for variant in image_variants.enabled_formats():
+            if time.monotonic() >= deadline:
+                break
+            variant_path = image_variants.ensure_variant(path, variant)
+            if variant_path:
+                _read_through(variant_path)
+        warmed.append(key)
+        CACHE_WARMUP_ITEMS.inc(result="warmed")
+    return warmed
+
+
+def start_warmup() -> Optional[threading.Thread]:
+    """
+    اجرای warm_up در پس‌زمینه. Page Cache بین همه worker ها مشترک است، پس فقط یک worker این کار را
+    انجام می دهد: قفل وضعیت مشترک (Lease) بعد از گرم کردن آزاد نمی شود و تا WARMUP_INTERVAL_SECONDS
+    (تا وقتی worker گرم کننده زنده است) worker های بعدی، مثلاً worker ری‌استارت شده، دوباره گرم نمی کنند.
+    اگر worker وسط کار کرش کند یا گرم کردن خطا دهد، worker بعدی دوباره تلاش می کند.
+    """
+    if not settings.ACCESS_SKETCH_ENABLED or settings.WARMUP_TOP_N <= 0 or settings.WARMUP_BUDGET_SECONDS <= 0:
+        return None
+
+    def run() -> None:
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        if not shared_state.try_acquire_lease(_WARMUP_LOCK_KEY, owner, settings.WARMUP_INTERVAL_SECONDS):
+            return
+        started = time.perf_counter()
+        try:
+            warmed = warm_up()
+            if warmed:
+                print(f"🔥 Warmed {len(warmed)} hot garment image(s) in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            shared_state.release_lease(_WARMUP_LOCK_KEY, owner)
+            print(f"❌ Cache warm-up failed: {e}")
+
+    thread = threading.Thread(target=run, name="cache-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -1,33 +1,55 @@
 import os
+import shutil
+import threading
+import time
 import uuid
+from datetime import datetime
 from typing import Optional
+from sqlalchemy import select, func, RowMapping
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi import UploadFile, HTTPException, status
-from PIL import Image
 
 from app.core.config import settings
+from app.core.metrics import timed
 from app.models.dress import Dress
 from app.models.user import User
-from app.schemas.dress import DressCreate
+from app.schemas.dress import DressCreate, DressUpdate, DRESS_LIST_COLUMNS
+from app.services import image_variants
+from app.services.image_ingest import IngestProfile, get_ingest_profile
+from app.services.job_queue import PermanentJobError, job_queue
+from app.services.stats_service import stats_service
+from app.services.version_stamps import version_stamps
 
 TARGET_SIZE = (512, 512) 
 MAX_FILE_SIZE_MB = 5 
 
+# نوع کار صف برای نرمال‌سازی تصویر آپلود شده
+NORMALIZE_JOB = "dress.normalize"
+
 class DressService:
-    
+
+    def __init__(self) -> None:
+        self._sweep_lock = threading.Lock()
+        self._last_sweep = float("-inf")
+
     def _validate_file(self, file: UploadFile):
         """اعتبارسنجی فرمت و حجم فایل"""
+        self.validate_upload_metadata(file.content_type, file.size)
+
+    def validate_upload_metadata(self, content_type: Optional[str], size: Optional[int]) -> None:
+        """اعتبارسنجی فرمت و حجم اعلام شده (مشترک بین آپلود یکجا و آپلود تکه‌ای)"""
         allowed_formats = ["image/png", "image/jpeg", "image/jpg"]
-        if file.content_type not in allowed_formats:
+        if content_type not in allowed_formats:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="فرمت فایل نامعتبر است. فقط PNG و JPG مجاز هستند."
             )
         
         # بررسی حجم فایل بدون خواندن کل آن در حافظه (اگر سرور ساپورت کند)
-        if file.size and file.size > MAX_FILE_SIZE_MB * 1024 * 1024:
+        if size and size > MAX_FILE_SIZE_MB * 1024 * 1024:
              raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                status_code=status.HTTP_413_CONTENT_TOO_LARGE,
                 detail=f"حجم فایل نباید بیشتر از {MAX_FILE_SIZE_MB} مگابایت باشد."
             )
 
@@ -36,69 +58,311 @@ class DressService:
         db: Session, 
         user: User, 
         file: UploadFile, 
-        dress_in: DressCreate
+        dress_in: DressCreate,
+        idempotency_key: Optional[str] = None
     ) -> Dress:
         self._validate_file(file)
+
+        # تکرار درخواست با همان Idempotency-Key همان لباس قبلی را برمی گرداند (بدون ذخیره دوباره فایل)
+        if idempotency_key:
+            existing = self.get_dress_by_idempotency_key(db, user, idempotency_key)
+            if existing:
+                return existing
         
-        # ۱. ساخت نام منحصر به فرد (فقط UUID + پسوند اصلی)
+        # ۱. ساخت نام منحصر به فرد (شناسه لباس + پسوند اصلی)
         extension = os.path.splitext(file.filename)[1].lower()
         if not extension: extension = ".png" # پیش‌فرض
         
-        unique_filename = f"{uuid.uuid4()}{extension}"
-        # استفاده از مسیر نسبی برای ذخیره در دیتابیس (بهتر برای جابجایی پروژه)
-        relative_path = os.path.join(settings.STORAGE_PATH, unique_filename)
-        absolute_path = os.path.abspath(relative_path)
+        # فایل خام مستقیماً با نام نهایی {dress_id}{ext} نوشته می شود و تا پایان پردازش در صف کارها
+        # در RAW_UPLOAD_PATH می ماند؛ فایلی که لباسش هرگز ثبت نشود با remove_orphaned_raw_files پاک می شود
+        dress_id = uuid.uuid4()
+        absolute_path = self._raw_path(dress_id, extension)
         
-        os.makedirs(settings.STORAGE_PATH, exist_ok=True)
+        os.makedirs(settings.RAW_UPLOAD_PATH, exist_ok=True)
         
         # ۲. ذخیره فایل به صورت Chunk (بهینه برای حافظه RAM)
         try:
-            with open(absolute_path, "wb") as f:
+            with timed("upload.disk_write"), open(absolute_path, "wb") as f:
                 # خواندن فایل در قطعات ۱۰۲۴ بایتی
                 while content := file.file.read(1024 * 1024):
                     f.write(content)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"خطا در ذخیره فایل: {e}")
 
-        # ۳. پردازش تصویر (Resize و تبدیل به PNG برای حفظ Alpha)
+        return self.create_dress_from_file(db, user, absolute_path, dress_in, file.filename, idempotency_key, dress_id)
+
+    def _raw_path(self, dress_id: uuid.UUID, extension: str) -> str:
+        return os.path.abspath(os.path.join(settings.RAW_UPLOAD_PATH, f"{dress_id}{extension}"))
+
+    def create_dress_from_file(
+        self,
+        db: Session,
+        user: User,
+        source_path: str,
+        dress_in: DressCreate,
+        filename: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        dress_id: Optional[uuid.UUID] = None
+    ) -> Dress:
+        """
+        فایل ذخیره شده روی دیسک (آپلود یکجا یا آپلود تکه‌ای نهایی شده) را ثبت می کند:
+        رکورد لباس با وضعیت processing و کار نرمال‌سازی در یک تراکنش ساخته می شوند
+        و ریسایز و تبدیل به PNG در worker های صف کارها انجام می شود.
+        فایل ورودی به RAW_UPLOAD_PATH منتقل می شود (مگر اینکه از قبل همان فایل خام {dress_id}{ext} باشد)؛
+        اگر تصویر نامعتبر یا درخواست تکراری باشد حذف، و اگر ثبت در دیتابیس با خطای دیگری شکست بخورد
+        به مسیر اولیه برگردانده (یا در آپلود یکجا حذف) می شود.
+        """
+        self._probe_image(source_path)
+
+        dress_id = dress_id or uuid.uuid4()
+        extension = os.path.splitext(filename or source_path)[1].lower() or ".png"
+        raw_path = self._raw_path(dress_id, extension)
+        moved = os.path.abspath(source_path) != raw_path
+        if moved:
+            os.makedirs(settings.RAW_UPLOAD_PATH, exist_ok=True)
+            shutil.move(source_path, raw_path)
+
         try:
-            with Image.open(absolute_path) as img:
-                # ایجاد کانال آلفا اگر وجود ندارد
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                
-                # ریسایز با کیفیت بالا
-                img = img.resize(TARGET_SIZE, Image.Resampling.LANCZOS)
-                
-                # ذخیره نهایی (جایگزین کردن فایل اصلی با نسخه بهینه شده PNG)
-                final_filename = unique_filename.replace(extension, ".png")
-                final_relative_path = os.path.join(settings.STORAGE_PATH, final_filename)
-                final_absolute_path = os.path.abspath(final_relative_path)
-                
-                img.save(final_absolute_path, "PNG")
-                
-                # اگر پسوند عوض شده، فایل موقت قبلی حذف شود
-                if absolute_path != final_absolute_path:
-                    os.remove(absolute_path)
-        except Exception as e:
-            if os.path.exists(absolute_path): os.remove(absolute_path)
-            raise HTTPException(status_code=500, detail="خطا در پردازش تصویر.")
-
-        # ۴. ذخیره در دیتابیس
-        db_dress = Dress(
-            user_id=user.id,
-            file_path=final_relative_path, # مسیر نسبی ذخیره می‌شود
-            gender=dress_in.gender,
-            title=dress_in.title or file.filename,
-            width=TARGET_SIZE[0],
-            height=TARGET_SIZE[1]
-        )
-        
-        db.add(db_dress)
-        db.commit()
+            # ۳. ذخیره در دیتابیس؛ مسیر نهایی PNG از قبل مشخص است و worker همان را می سازد
+            db_dress = Dress(
+                id=dress_id,
+                user_id=user.id,
+                file_path=os.path.join(settings.STORAGE_PATH, f"{dress_id}.png"), # مسیر نسبی ذخیره می‌شود
+                gender=dress_in.gender,
+                title=dress_in.title or filename,
+                width=TARGET_SIZE[0],
+                height=TARGET_SIZE[1],
+                status="processing",
+                created_at=datetime.utcnow() # قبل از flush لازم است تا سطل روزانه آمار مشخص باشد
+            )
+            db.add(db_dress)
+            stats_service.dress_added(db, db_dress)
+            job_queue.enqueue(
+                db,
+                NORMALIZE_JOB,
+                {"dress_id": str(dress_id), "raw_path": raw_path},
+                idempotency_key=self._scoped_idempotency_key(user, idempotency_key),
+                user_id=user.id,
+            )
+
+            with timed("upload.db_commit"):
+                db.commit()
+        except IntegrityError:
+            # درخواست همزمان دیگری با همان Idempotency-Key زودتر ثبت شده است
+            db.rollback()
+            self._remove_raw_file(raw_path)
+            if not idempotency_key:
+                raise
+            existing = self.get_dress_by_idempotency_key(db, user, idempotency_key)
+            if existing is None:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="این Idempotency-Key قبلاً برای لباسی استفاده شده که دیگر وجود ندارد."
+                )
+            return existing
+        except Exception:
+            # خطای گذرا (مثلاً قفل دیتابیس): فایل ورودی سر جای خود برمی گردد تا درخواست قابل تکرار باشد
+            db.rollback()
+            if moved:
+                shutil.move(raw_path, source_path)
+            else:
+                self._remove_raw_file(raw_path)
+            raise
         db.refresh(db_dress)
+        version_stamps.bump(user.id)
+        job_queue.notify()
         return db_dress
 
+    def _probe_image(self, path: str) -> None:
+        """خواندن سرآیند فایل (بدون دیکد) تا فایل غیر تصویری همان لحظه با 400 رد شود."""
+        from PIL import Image
+
+        try:
+            with Image.open(path):
+                pass
+        except Exception:
+            self._remove_raw_file(path)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="فایل ارسال شده یک تصویر معتبر نیست."
+            )
+
+    def _scoped_idempotency_key(self, user: User, idempotency_key: Optional[str]) -> Optional[str]:
+        # کلید هر کاربر جداست تا کلید یکسان دو کاربر با هم تداخل نداشته باشد
+        return f"{NORMALIZE_JOB}:{user.id}:{idempotency_key}" if idempotency_key else None
+
+    def get_dress_by_idempotency_key(self, db: Session, user: User, idempotency_key: str) -> Optional[Dress]:
+        """لباس ساخته شده با یک Idempotency-Key (اگر هنوز وجود داشته باشد)."""
+        job = job_queue.get_by_idempotency_key(db, self._scoped_idempotency_key(user, idempotency_key))
+        if job is None:
+            return None
+        return self.get_dress_by_id(db, uuid.UUID(job.payload["dress_id"]))
+
+    # ------------------- کارهای صف -------------------
+
+    def process_uploaded_image(self, db: Session, payload: dict) -> dict:
+        """
+        کار صف: نرمال‌سازی فایل خام به PNG نهایی، ساخت نسخه‌های WebP/AVIF و تغییر وضعیت به ready.
+        تکرارپذیر است: اگر لباس حذف یا قبلاً آماده شده باشد فقط فایل خام پاک می شود.
+        """
+        from PIL import Image, UnidentifiedImageError
+
+        raw_path = payload["raw_path"]
+        dress = self.get_dress_by_id(db, uuid.UUID(payload["dress_id"]))
+        if dress is None or dress.status != "processing":
+            self._remove_raw_file(raw_path)
+            return {"dress_id": payload["dress_id"], "skipped": True}
+
+        # ۳. پردازش تصویر (Resize و تبدیل به PNG برای حفظ Alpha)
+        final_absolute_path = os.path.abspath(dress.file_path)
+        os.makedirs(os.path.dirname(final_absolute_path), exist_ok=True)
+        # نوشتن در فایل موقت و جایگزینی اتمیک تا نسخه نیمه‌کاره سرو نشود
+        temp_path = f"{final_absolute_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            self.normalize_image(raw_path, temp_path)
+            os.replace(temp_path, final_absolute_path)
+        except (FileNotFoundError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+            raise PermanentJobError(f"خطا در پردازش تصویر: {e}") from e
+        finally:
+            if os.path.exists(temp_path): os.remove(temp_path)
+
+        # نسخه‌های WebP/AVIF برای سرو بر اساس Accept (PNG نسخه اصلی باقی می ماند)
+        with timed("upload.variants"):
+            image_variants.precompute_variants(final_absolute_path)
+
+        dress.status = "ready"
+        with timed("upload.db_commit"):
+            db.commit()
+        version_stamps.bump(dress.user_id)
+        # فایل خام بعد از پردازش دیگر لازم نیست
+        self._remove_raw_file(raw_path)
+        self.maybe_remove_orphaned_raw_files(db)
+        return {"dress_id": payload["dress_id"]}
+
+    def mark_processing_failed(self, db: Session, payload: dict, error: str) -> None:
+        """بعد از شکست نهایی کار نرمال‌سازی: وضعیت لباس failed و فایل خام حذف می شود."""
+        dress = self.get_dress_by_id(db, uuid.UUID(payload["dress_id"]))
+        if dress is not None and dress.status == "processing":
+            dress.status = "failed"
+            db.commit()
+            version_stamps.bump(dress.user_id)
+        self._remove_raw_file(payload["raw_path"])
+
+    def remove_orphaned_raw_files(self, db: Session, min_age_seconds: Optional[float] = None) -> list[str]:
+        """
+        حذف فایل‌های خامی که لباس در حال پردازشی ندارند (مثلاً فرآیند بین نوشتن فایل و commit از کار افتاده).
+        فایل‌های جوان‌تر از min_age_seconds دست نمی خورند تا آپلودهای در حال ثبت حذف نشوند.
+        """
+        min_age_seconds = settings.RAW_ORPHAN_MIN_AGE_SECONDS if min_age_seconds is None else min_age_seconds
+        directory = os.path.abspath(settings.RAW_UPLOAD_PATH)
+        if not os.path.isdir(directory):
+            return []
+        cutoff = time.time() - min_age_seconds
+        candidates: dict[uuid.UUID, str] = {}
+        removed = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.stat(path).st_mtime > cutoff:
+                    continue
+                candidates[uuid.UUID(os.path.splitext(name)[0])] = path
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                # نام غیر UUID (مثلاً فایل‌های موقت قدیمی) به هیچ لباسی تعلق ندارد
+                self._remove_raw_file(path)
+                removed.append(name)
+        if candidates:
+            processing = set(db.execute(
+                select(Dress.id).where(Dress.id.in_(list(candidates)), Dress.status == "processing")
+            ).scalars())
+            for dress_id, path in candidates.items():
+                if dress_id not in processing:
+                    self._remove_raw_file(path)
+                    removed.append(os.path.basename(path))
+        return removed
+
+    def maybe_remove_orphaned_raw_files(self, db: Session) -> list[str]:
+        """اجرای remove_orphaned_raw_files حداکثر یک بار در هر RAW_ORPHAN_SWEEP_INTERVAL ثانیه (از کار نرمال‌سازی)."""
+        with self._sweep_lock:
+            if time.monotonic() - self._last_sweep < settings.RAW_ORPHAN_SWEEP_INTERVAL:
+                return []
+            self._last_sweep = time.monotonic()
+        try:
+            return self.remove_orphaned_raw_files(db)
+        except OSError as e:
+            print(f"❌ Raw upload cleanup failed: {e}")
+            return []
+
+    def _remove_raw_file(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def normalize_image(self, source_path: str, target_path: str, profile: Optional[IngestProfile] = None) -> None:
+        """
+        تصویر ورودی را به PNG با ابعاد TARGET_SIZE و کانال آلفا تبدیل می کند
+        (تنظیمات ریسایز و فشرده‌سازی از پروفایل Ingest خوانده می شود).
+        """
+        from PIL import Image  # import در اولین آپلود، نه هنگام راه‌اندازی
+
+        profile = profile or get_ingest_profile()
+
+        with Image.open(source_path) as img:
+            if profile.jpeg_draft and img.format == "JPEG":
+                img.draft("RGB", TARGET_SIZE)
+
+            # دیکد صریح تا زمان آن جدا از تبدیل و ریسایز اندازه‌گیری شود
+            with timed("upload.decode"):
+                img.load()
+
+            # برای RGB و L تبدیل بعد از ریسایز نتیجه یکسانی دارد و روی پیکسل‌های کمتری انجام می شود؛
+            # مگر اینکه رنگ شفاف (tRNS) داشته باشند: آلفا باید قبل از ریسایز ساخته شود تا لبه‌ها درست درون‌یابی شوند
+            if img.mode not in ("RGB", "L", "RGBA") or "transparency" in img.info:
+                with timed("upload.convert"):
+                    img = img.convert("RGBA")
+
+            # ریسایز با کیفیت بالا
+            with timed("upload.resize"):
+                img = img.resize(
+                    TARGET_SIZE,
+                    getattr(Image.Resampling, profile.resample),
+                    reducing_gap=profile.reducing_gap,
+                )
+
+            # ایجاد کانال آلفا اگر وجود ندارد
+            if img.mode != "RGBA":
+                with timed("upload.convert"):
+                    img = img.convert("RGBA")
+
+            # ذخیره نهایی (جایگزین کردن فایل اصلی با نسخه بهینه شده PNG)
+            with timed("upload.encode"):
+                img.save(target_path, "PNG", compress_level=profile.png_compress_level, optimize=profile.png_optimize)
+
+    def update_dress(self, db: Session, dress: Dress, dress_in: DressUpdate) -> Dress:
+        """ویرایش نام لباس و دسته بندی جنسیت."""
+        update_data = dress_in.model_dump(exclude_unset=True)
+        old_gender = dress.gender
+        for key, value in update_data.items():
+            setattr(dress, key, value)
+
+        db.add(dress)
+        stats_service.dress_gender_changed(db, dress, old_gender)
+        db.commit()
+        db.refresh(dress)
+        version_stamps.bump(dress.user_id)
+        return dress
+
+    def delete_dress(self, db: Session, dress: Dress) -> None:
+        """حذف رکورد لباس از دیتابیس و فایل فیزیکی آن از حافظه."""
+        user_id, file_path = dress.user_id, dress.file_path
+        stats_service.dresses_removed(db, user_id, [dress])
+        db.delete(dress)
+        db.commit()
+        version_stamps.bump(user_id)
+        self.remove_stored_files([file_path])
+
     # بقیه متدها (get, delete, ...) به قوت خود باقی هستند
     def get_user_dresses(self, db: Session, user_id: uuid.UUID, gender: Optional[str] = None) -> list[Dress]:
         query = db.query(Dress).filter(Dress.user_id == user_id)
@@ -106,7 +370,48 @@ class DressService:
             query = query.filter(Dress.gender == gender)
         return query.order_by(Dress.created_at.desc()).all()
 
+    def get_user_dress_rows(self, db: Session, user_id: uuid.UUID, gender: Optional[str] = None) -> list[RowMapping]:
+        """
+        نسخه سبک get_user_dresses: فقط ستون‌های مورد نیاز خروجی را انتخاب می کند
+        و به جای اشیاء ORM، ردیف‌های خام (Mapping) برمی گرداند.
+        """
+        query = select(*(getattr(Dress, column) for column in DRESS_LIST_COLUMNS)).where(Dress.user_id == user_id)
+        if gender:
+            query = query.where(Dress.gender == gender)
+        return db.execute(query.order_by(Dress.created_at.desc())).mappings().all()
+
+    def get_wardrobe_etag(self, db: Session, user_id: uuid.UUID, gender: Optional[str] = None) -> str:
+        """
+        ETag لیست لباس‌های کاربر را فقط با یک کوئری تجمیعی (تعداد و آخرین created_at)
+        و نسخه نوشتن‌های کاربر می سازد؛ بدون خواندن ردیف‌ها یا سریال‌سازی.
+        """
+        query = select(func.count(Dress.id), func.max(Dress.created_at)).where(Dress.user_id == user_id)
+        if gender:
+            query = query.where(Dress.gender == gender)
+        count, last_created_at = db.execute(query).one()
+        return version_stamps.make_etag(user_id, "dresses", gender, count, last_created_at)
+
     def get_dress_by_id(self, db: Session, dress_id: uuid.UUID) -> Optional[Dress]:
         return db.query(Dress).filter(Dress.id == dress_id).first()
 
-dress_service = DressService()
\ No newline at end of file
+    def remove_stored_files(self, file_paths: list[str]) -> int:
+        """فایل‌های فیزیکی لباس‌ها (و نسخه‌های WebP/AVIF آنها) را حذف می کند (مناسب برای اجرا در Background Task)."""
+        removed = 0
+        for file_path in file_paths:
+            absolute_path = os.path.abspath(file_path)
+            try:
+                os.remove(absolute_path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"❌ Could not remove dress file {file_path}: {e}")
+            for variant_path in image_variants.variant_paths(absolute_path):
+                try:
+                    os.remove(variant_path)
+                except OSError:
+                    pass
+        return removed
+
+dress_service = DressService()
+job_queue.register(NORMALIZE_JOB, dress_service.process_uploaded_image, dress_service.mark_processing_failed)
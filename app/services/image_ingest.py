@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+
+# ------------------- پروفایل‌های پردازش تصویر هنگام آپلود (Ingest Profiles) -------------------
+# اعداد مربوط به هر پروفایل با benchmarks/bench_image_ingest.py اندازه‌گیری شده‌اند؛
+# اپراتور با IMAGE_INGEST_PROFILE بین مصرف CPU و حجم ذخیره‌سازی انتخاب می کند.
+# خروجی همه پروفایل‌ها PNG با کانال آلفا است (نسخه اصلی برای موتور AR).
+
+
+@dataclass(frozen=True)
+class IngestProfile:
+    name: str
+    # نام عضو Image.Resampling (به صورت رشته تا PIL هنگام import بارگذاری نشود)
+    resample: str
+    png_compress_level: int
+    png_optimize: bool = False
+    # برای JPEG، دیکد مستقیم در مقیاس کوچکتر (DCT scaling) به جای دیکد کامل و سپس ریسایز
+    jpeg_draft: bool = False
+    # کوچک‌سازی دو مرحله‌ای Pillow برای تصاویر بزرگ (None = غیرفعال)
+    reducing_gap: Optional[float] = None
+
+
+INGEST_PROFILES: dict[str, IngestProfile] = {
+    # کمترین مصرف CPU؛ فایل کمی بزرگ‌تر و لبه‌های کمی نرم‌تر
+    "fast": IngestProfile("fast", resample="BILINEAR", png_compress_level=1, jpeg_draft=True, reducing_gap=3.0),
+    # رفتار قبلی سرویس: LANCZOS و تنظیمات پیش‌فرض PNG
+    "balanced": IngestProfile("balanced", resample="LANCZOS", png_compress_level=6),
+    # کمترین حجم ذخیره‌سازی؛ encode چند برابر کندتر
+    "compact": IngestProfile("compact", resample="LANCZOS", png_compress_level=9, png_optimize=True),
+}
+
+
+def get_ingest_profile(name: Optional[str] = None) -> IngestProfile:
+    """پروفایل انتخاب شده در تنظیمات (یا پروفایل با نام داده شده) را برمی گرداند."""
+    return INGEST_PROFILES[name or settings.IMAGE_INGEST_PROFILE]
@@ -0,0 +1,136 @@
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import timed
+
+# ------------------- نسخه‌های WebP / AVIF تصاویر لباس -------------------
+# PNG نسخه اصلی (Canonical) و ورودی موتور AR باقی می ماند؛ نسخه‌های کم‌حجم‌تر کنار همان فایل
+# ({نام}.webp و {نام}.avif) ساخته می شوند و هنگام سرو تصویر بر اساس هدر Accept انتخاب می شوند.
+# اعداد حجم و زمان با benchmarks/bench_image_ingest.py اندازه‌گیری شده‌اند.
+
+
+@dataclass(frozen=True)
+class VariantFormat:
+    name: str
+    media_type: str
+    extension: str
+    pil_format: str
+
+    def save_options(self) -> dict:
+        """تنظیمات encoder (از Settings در لحظه خوانده می شوند)."""
+        if self.name == "webp":
+            # near_lossless=100 یعنی کاملاً بدون اتلاف
+            return {"lossless": True, "near_lossless": settings.IMAGE_WEBP_NEAR_LOSSLESS, "method": 4, "exact": True}
+        if self.name == "avif":
+            return {"quality": settings.IMAGE_AVIF_QUALITY, "subsampling": "4:4:4", "speed": 8}
+        return {}
+
+
+VARIANT_FORMATS: dict[str, VariantFormat] = {
+    "avif": VariantFormat("avif", "image/avif", ".avif", "AVIF"),
+    "webp": VariantFormat("webp", "image/webp", ".webp", "WEBP"),
+}
+
+_support_lock = threading.Lock()
+_supported: Optional[dict[str, bool]] = None
+
+
+def is_supported(variant: VariantFormat) -> bool:
+    """آیا Pillow نصب شده encoder این فرمت را دارد (AVIF به نسخه و build بستگی دارد)."""
+    global _supported
+    with _support_lock:
+        if _supported is None:
+            from PIL import features
+            _supported = {name: bool(features.check(name)) for name in VARIANT_FORMATS}
+    return _supported[variant.name]
+
+
+def enabled_formats() -> list[VariantFormat]:
+    """فرمت‌های فعال به ترتیب ترجیح سرور (settings.IMAGE_VARIANT_FORMATS) که Pillow پشتیبانی می کند."""
+    return [
+        VARIANT_FORMATS[name] for name in settings.IMAGE_VARIANT_FORMATS
+        if name in VARIANT_FORMATS and is_supported(VARIANT_FORMATS[name])
+    ]
+
+
+def _parse_accept(accept: str) -> dict[str, float]:
+    """نوع‌های صریح هدر Accept همراه با q آنها (wildcard ها نادیده گرفته می شوند)."""
+    weights: dict[str, float] = {}
+    for part in accept.split(","):
+        media_type, *params = (piece.strip() for piece in part.split(";"))
+        if not media_type or "*" in media_type:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[media_type.lower()] = max(quality, weights.get(media_type.lower(), 0.0))
+    return weights
+
+
+def negotiate(accept: Optional[str]) -> Optional[VariantFormat]:
+    """
+    بهترین نسخه برای هدر Accept؛ فقط اگر کلاینت فرمت را صریحاً اعلام کرده باشد
+    (image/* و */* به معنی پشتیبانی از WebP/AVIF نیست). None یعنی همان PNG.
+    """
+    if not accept:
+        return None
+    weights = _parse_accept(accept)
+    best, best_quality = None, 0.0
+    for variant in enabled_formats():
+        quality = weights.get(variant.media_type, 0.0)
+        if quality > best_quality:
+            best, best_quality = variant, quality
+    return best
+
+
+def variant_path(png_path: str, variant: VariantFormat) -> str:
+    return os.path.splitext(png_path)[0] + variant.extension
+
+
+def ensure_variant(png_path: str, variant: VariantFormat) -> Optional[str]:
+    """
+    مسیر نسخه variant از تصویر PNG؛ اگر وجود نداشته باشد یا قدیمی‌تر از PNG باشد ساخته می شود.
+    در صورت خطا None برمی گرداند تا همان PNG سرو شود.
+    """
+    target = variant_path(png_path, variant)
+    try:
+        if os.stat(target).st_mtime >= os.stat(png_path).st_mtime:
+            return target
+    except FileNotFoundError:
+        pass
+
+    from PIL import Image  # import در اولین استفاده، نه هنگام راه‌اندازی
+
+    # نوشتن در فایل موقت و جایگزینی اتمیک تا worker های دیگر فایل نیمه‌کاره سرو نکنند
+    temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with timed(f"variant.encode_{variant.name}"), Image.open(png_path) as img:
+            img.save(temp_path, variant.pil_format, **variant.save_options())
+        os.replace(temp_path, target)
+    except Exception as e:
+        print(f"❌ Could not create {variant.name} variant of {png_path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+    return target
+
+
+def precompute_variants(png_path: str) -> list[str]:
+    """ساخت همه نسخه‌های فعال بلافاصله بعد از Ingest (در صورت فعال بودن IMAGE_VARIANT_PRECOMPUTE)."""
+    if not settings.IMAGE_VARIANT_PRECOMPUTE:
+        return []
+    created = (ensure_variant(png_path, variant) for variant in enabled_formats())
+    return [path for path in created if path]
+
+
+def variant_paths(png_path: str) -> list[str]:
+    """مسیر همه نسخه‌های ممکن یک تصویر (برای حذف همراه با PNG)."""
+    return [variant_path(png_path, variant) for variant in VARIANT_FORMATS.values()]
@@ -0,0 +1,305 @@
+"""
+صف کارهای پس‌زمینه (Durable Job Queue) روی جدول jobs دیتابیس اصلی.
+
+کارها در همان تراکنشی ثبت می شوند که رکورد مربوط به آنها ساخته می شود، پس با ری‌استارت سرور از بین نمی روند.
+worker ها (Thread های هر فرآیند وب یا یک فرآیند جداگانه) کار آماده را با یک UPDATE شرطی برمی دارند؛
+worker در حین اجرا هر JOB_LEASE_SECONDS/3 ثانیه locked_at را تمدید می کند (Heartbeat)، پس کار طولانی
+دوباره برداشته نمی شود؛ اگر worker وسط کار از کار بیفتد، بعد از JOB_LEASE_SECONDS کار دوباره برداشته می شود.
+کار ناموفق با Backoff نمایی (همراه با Jitter) تا JOB_MAX_ATTEMPTS بار دوباره اجرا می شود.
+
+اجرای worker در یک فرآیند جداگانه (مثلاً وقتی JOB_WORKERS=0 است):
+
+    python -m app.services.job_queue                # اجرای دائمی با JOB_WORKERS (حداقل ۱) Thread
+    python -m app.services.job_queue --once         # اجرای کارهای آماده و خروج
+
+Handler ها باید تکرارپذیر (Idempotent) باشند: کار ممکن است بعد از crash دوباره اجرا شود.
+"""
+import argparse
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterator, Optional
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import registry, timed
+from app.models.job import Job
+
+JOB_RUNS = registry.counter(
+    "job_runs_total",
+    "Background job executions by kind and outcome (succeeded, retry, failed).",
+    ("kind", "outcome"),
+)
+
+
+class PermanentJobError(Exception):
+    """خطایی که با تلاش مجدد برطرف نمی شود (مثلاً فایل تصویر خراب)؛ کار بلافاصله failed می شود."""
+
+
+@dataclass(frozen=True)
+class JobHandler:
+    run: Callable[[Session, dict], Optional[dict]]
+    # بعد از شکست نهایی (اتمام تلاش‌ها یا PermanentJobError) با payload و متن خطا صدا زده می شود
+    on_failure: Optional[Callable[[Session, dict, str], None]] = None
+
+
+class JobQueue:
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        self._handlers: dict[str, JobHandler] = {}
+        self._session_factory = session_factory
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    # ------------------- ثبت و افزودن کار -------------------
+
+    def register(
+        self,
+        kind: str,
+        run: Callable[[Session, dict], Optional[dict]],
+        on_failure: Optional[Callable[[Session, dict, str], None]] = None
+    ) -> None:
+        self._handlers[kind] = JobHandler(run, on_failure)
+
+    def enqueue(
+        self,
+        db: Session,
+        kind: str,
+        payload: dict,
+        idempotency_key: Optional[str] = None,
+        user_id: Optional[uuid.UUID] = None,
+        max_attempts: Optional[int] = None
+    ) -> Job:
+        """
+        کار را به Session اضافه می کند بدون commit؛ فراخواننده آن را همراه با تغییرات خودش
+        در یک تراکنش commit می کند. تکرار idempotency_key هنگام commit خطای IntegrityError می دهد.
+        """
+        job = Job(
+            kind=kind,
+            payload=payload,
+            idempotency_key=idempotency_key,
+            user_id=user_id,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+            run_at=datetime.utcnow(),
+        )
+        db.add(job)
+        return job
+
+    def get_by_idempotency_key(self, db: Session, idempotency_key: str) -> Optional[Job]:
+        return db.execute(select(Job).where(Job.idempotency_key == idempotency_key)).scalar_one_or_none()
+
+    def retry_failed(self, db: Session, job: Job) -> bool:
+        """
+        کار failed را با تلاش‌های تازه دوباره در صف قرار می دهد (بدون commit). UPDATE شرطی است، پس
+        از بین درخواست‌های همزمان فقط یکی کار را برمی گرداند. خروجی: آیا کار دوباره در صف قرار گرفت.
+        """
+        requeued = db.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.status == "failed")
+            .values(status="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        return requeued.rowcount == 1
+
+    def notify(self) -> None:
+        """بیدار کردن worker های همین فرآیند بعد از commit کار جدید (worker های دیگر با Polling می بینند)."""
+        self._wakeup.set()
+
+    # ------------------- برداشتن و اجرای کار -------------------
+
+    def retry_delay(self, attempts: int) -> float:
+        """فاصله تا تلاش بعدی: نمایی نسبت به تعداد تلاش‌ها، محدود به JOB_RETRY_MAX_SECONDS، با ±۲۰٪ Jitter."""
+        delay = min(settings.JOB_RETRY_MAX_SECONDS, settings.JOB_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _claimable(self, now: datetime):
+        lease_expired_before = now - timedelta(seconds=settings.JOB_LEASE_SECONDS)
+        return and_(
+            Job.kind.in_(list(self._handlers)),
+            or_(
+                and_(Job.status == "queued", Job.run_at <= now),
+                and_(Job.status == "running", Job.locked_at < lease_expired_before),
+            ),
+        )
+
+    def claim(self, db: Session) -> Optional[Job]:
+        """
+        برداشتن یک کار آماده. UPDATE شرطی تضمین می کند که بین چند worker (و چند فرآیند)
+        فقط یکی کار را بردارد؛ اگر دیگری زودتر برداشته باشد سراغ نامزد بعدی می رود.
+        """
+        now = datetime.utcnow()
+        candidates = db.execute(
+            select(Job.id).where(self._claimable(now)).order_by(Job.run_at).limit(5)
+        ).scalars().all()
+        worker = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        for job_id in candidates:
+            claimed = db.execute(
+                update(Job)
+                .where(Job.id == job_id, self._claimable(now))
+                .values(status="running", locked_by=worker, locked_at=now, attempts=Job.attempts + 1)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            if claimed.rowcount == 1:
+                return db.get(Job, job_id, populate_existing=True)
+        return None
+
+    @contextmanager
+    def _heartbeat(self, db: Session, job: Job) -> Iterator[None]:
+        """
+        تمدید locked_at کار در حال اجرا در یک Thread جداگانه (با اتصال خودش، نه Session handler)
+        تا کاری که بیش از JOB_LEASE_SECONDS طول می کشد توسط worker دیگری دوباره برداشته نشود.
+        """
+        engine = db.get_bind().engine
+        job_id, worker = job.id, job.locked_by
+        stop = threading.Event()
+
+        def beat() -> None:
+            while not stop.wait(settings.JOB_LEASE_SECONDS / 3):
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(
+                            update(Job)
+                            .where(Job.id == job_id, Job.status == "running", Job.locked_by == worker)
+                            .values(locked_at=datetime.utcnow())
+                        )
+                except Exception as e:
+                    print(f"❌ Heartbeat of job {job_id} failed: {e}")
+
+        thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def run_job(self, db: Session, job: Job) -> str:
+        """اجرای یک کار برداشته شده و ثبت نتیجه (succeeded، queued برای تلاش مجدد یا failed)."""
+        handler = self._handlers[job.kind]
+        kind, payload = job.kind, dict(job.payload or {})
+        try:
+            with timed(f"job.{kind}"), self._heartbeat(db, job):
+                result = handler.run(db, payload)
+        except Exception as e:
+            db.rollback()
+            error = f"{type(e).__name__}: {e}"
+            job.last_error = error
+            job.locked_by = job.locked_at = None
+            if not isinstance(e, PermanentJobError) and job.attempts < job.max_attempts:
+                job.status = "queued"
+                job.run_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(job.attempts))
+                outcome = "retry"
+            else:
+                job.status = "failed"
+                job.finished_at = datetime.utcnow()
+                outcome = "failed"
+            db.commit()
+            print(f"❌ Job {job.id} ({kind}) attempt {job.attempts} failed: {error}")
+            if outcome == "failed" and handler.on_failure:
+                try:
+                    handler.on_failure(db, payload, error)
+                except Exception as hook_error:
+                    db.rollback()
+                    print(f"❌ Failure hook of job {job.id} ({kind}) failed: {hook_error}")
+        else:
+            job.status = "succeeded"
+            job.result = result
+            job.last_error = None
+            job.locked_by = job.locked_at = None
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            outcome = "succeeded"
+        JOB_RUNS.inc(kind=kind, outcome=outcome)
+        return job.status
+
+    def run_pending(self, db: Session, max_jobs: Optional[int] = None) -> int:
+        """اجرای کارهای آماده تا خالی شدن صف (یا max_jobs کار)؛ تعداد کارهای اجرا شده را برمی گرداند."""
+        ran = 0
+        while max_jobs is None or ran < max_jobs:
+            job = self.claim(db)
+            if job is None:
+                break
+            self.run_job(db, job)
+            ran += 1
+        return ran
+
+    # ------------------- Thread های worker -------------------
+
+    def start_workers(self, count: Optional[int] = None, session_factory: Optional[Callable[[], Session]] = None) -> None:
+        """راه‌اندازی worker ها در فرآیند فعلی (در lifespan هر worker وب)."""
+        count = settings.JOB_WORKERS if count is None else count
+        if count <= 0 or self._threads:
+            return
+        if session_factory is not None:
+            self._session_factory = session_factory
+        self._stop.clear()
+        for index in range(count):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop_workers(self, timeout: float = 10.0) -> None:
+        """توقف worker ها بعد از اتمام کار در حال اجرا (کارهای باقی‌مانده در صف می مانند)."""
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _worker_loop(self) -> None:
+        if self._session_factory is None:
+            from app.db.session import SessionLocal
+            self._session_factory = SessionLocal
+
+        while not self._stop.is_set():
+            try:
+                with self._session_factory() as db:
+                    ran = self.run_pending(db, max_jobs=1)
+            except Exception as e:
+                print(f"❌ Job worker error: {e}")
+                ran = 0
+            if not ran:
+                self._wakeup.wait(settings.JOB_POLL_INTERVAL)
+                self._wakeup.clear()
+
+
+job_queue = JobQueue()
+
+
+def main(argv: Optional[list[Any]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Background job worker")
+    parser.add_argument("--threads", type=int, default=max(settings.JOB_WORKERS, 1), help="worker threads")
+    parser.add_argument("--once", action="store_true", help="run the jobs that are due and exit")
+    args = parser.parse_args(argv)
+
+    # ثبت handler ها
+    import app.services.dress_service  # noqa: F401
+    import app.services.user_service  # noqa: F401
+
+    if args.once:
+        from app.db.session import SessionLocal
+        with SessionLocal() as db:
+            print(f"Ran {job_queue.run_pending(db)} job(s).")
+        return
+
+    job_queue.start_workers(args.threads)
+    print(f"Job worker running with {args.threads} thread(s). Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        job_queue.stop_workers()
+
+
+if __name__ == "__main__":
+    main()
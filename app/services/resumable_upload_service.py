@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.core.shared_state import shared_state
+from app.models.dress import Dress
+from app.models.user import User
+from app.schemas.dress import DressCreate, ResumableUploadCreate, ResumableUploadStatus
+from app.services.dress_service import dress_service
+
+
+class ResumableUploadService:
+    """
+    آپلود تکه‌ای و قابل ادامه تصاویر لباس.
+
+    برای هر آپلود دو فایل در UPLOAD_STAGING_PATH نگهداری می شود: {id}.part (داده‌های دریافت شده)
+    و {id}.json (مالک، متادیتای لباس و زمان انقضا). offset فعلی همان حجم فایل .part است، پس
+    بعد از قطع اتصال، داده‌های رسیده حفظ می شوند و هر worker می تواند ادامه آپلود را بپذیرد.
+    """
+
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._cleanup_thread: Optional[threading.Thread] = None
+
+    @property
+    def directory(self) -> str:
+        return os.path.abspath(settings.UPLOAD_STAGING_PATH)
+
+    def _data_path(self, upload_id: uuid.UUID) -> str:
+        return os.path.join(self.directory, f"{upload_id}.part")
+
+    def _meta_path(self, upload_id: uuid.UUID) -> str:
+        return os.path.join(self.directory, f"{upload_id}.json")
+
+    def _write_meta(self, upload_id: uuid.UUID, meta: dict) -> None:
+        # نوشتن اتمیک تا خواندن همزمان از worker دیگر فایل نیمه‌کاره نبیند
+        temp_path = f"{self._meta_path(upload_id)}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self._meta_path(upload_id))
+
+    def _expires_at(self) -> float:
+        return time.time() + settings.UPLOAD_EXPIRY_MINUTES * 60
+
+    def _status(self, upload_id: uuid.UUID, meta: dict) -> ResumableUploadStatus:
+        return ResumableUploadStatus(
+            upload_id=upload_id,
+            offset=self.get_offset(upload_id),
+            length=meta["length"],
+            expires_at=datetime.fromtimestamp(meta["expires_at"], tz=timezone.utc),
+        )
+
+    def create_upload(self, user: User, upload_in: ResumableUploadCreate) -> ResumableUploadStatus:
+        """شروع یک آپلود جدید؛ فرمت و حجم اعلام شده همانند آپلود یکجا اعتبارسنجی می شوند."""
+        dress_service.validate_upload_metadata(upload_in.content_type, upload_in.length)
+        self.cleanup_expired()
+
+        upload_id = uuid.uuid4()
+        os.makedirs(self.directory, exist_ok=True)
+        open(self._data_path(upload_id), "wb").close()
+        meta = {
+            "user_id": str(user.id),
+            "filename": upload_in.filename,
+            "content_type": upload_in.content_type,
+            "length": upload_in.length,
+            "gender": upload_in.gender,
+            "title": upload_in.title,
+            "expires_at": self._expires_at(),
+        }
+        self._write_meta(upload_id, meta)
+        return self._status(upload_id, meta)
+
+    def get_upload(self, upload_id: uuid.UUID, user: User) -> dict:
+        """متادیتای آپلود؛ آپلودهای منقضی شده، ناموجود یا متعلق به کاربر دیگر 404 برمی گردانند."""
+        try:
+            with open(self._meta_path(upload_id), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+        if meta is None or meta["user_id"] != str(user.id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+        if meta["expires_at"] < time.time():
+            self.discard(upload_id)
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload not found.")
+        return meta
+
+    def get_offset(self, upload_id: uuid.UUID) -> int:
+        try:
+            return os.path.getsize(self._data_path(upload_id))
+        except FileNotFoundError:
+            return 0
+
+    def get_status(self, upload_id: uuid.UUID, user: User) -> ResumableUploadStatus:
+        return self._status(upload_id, self.get_upload(upload_id, user))
+
+    def _lock_key(self, upload_id: uuid.UUID) -> str:
+        return f"upload-lock:{upload_id}"
+
+    def _lock(self, upload_id: uuid.UUID, owner: Optional[str] = None) -> str:
+        """
+        قفل سراسری (بین همه worker ها) تا هر آپلود در هر لحظه فقط یک نویسنده داشته باشد. قفل مالک
+        (PID و یک توکن) و زمان انقضا دارد و با هر نوشتن تمدید می شود؛ قفل درخواستی که worker آن کرش
+        کرده یا UPLOAD_LOCK_TTL_SECONDS چیزی ننوشته به درخواست بعدی می رسد. خروجی: توکن مالک قفل.
+        """
+        owner = owner or f"{os.getpid()}:{uuid.uuid4().hex}"
+        if not shared_state.try_acquire_lease(self._lock_key(upload_id), owner, settings.UPLOAD_LOCK_TTL_SECONDS):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Another request is already writing to this upload.",
+            )
+        return owner
+
+    def _unlock(self, upload_id: uuid.UUID, lock: str) -> None:
+        shared_state.release_lease(self._lock_key(upload_id), lock)
+
+    def begin_chunk(self, upload_id: uuid.UUID, user: User, offset: int) -> tuple[dict, str]:
+        """
+        قبل از دریافت یک تکه: offset اعلام شده باید برابر offset فعلی سرور باشد (در غیر این صورت 409).
+        متادیتا و توکن قفل برگردانده می شوند؛ بعد از append ها باید end_chunk صدا زده شود.
+        """
+        meta = self.get_upload(upload_id, user)
+        lock = self._lock(upload_id)
+        current = self.get_offset(upload_id)
+        if offset != current:
+            self._unlock(upload_id, lock)
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Upload offset mismatch; the server has {current} bytes.",
+                headers={"Upload-Offset": str(current)},
+            )
+        return meta, lock
+
+    def append(self, upload_id: uuid.UUID, meta: dict, data: bytes, lock: str) -> int:
+        """
+        داده را به انتهای فایل .part اضافه می کند؛ داده‌ای بیش از حجم اعلام شده پذیرفته نمی شود.
+        قبل از نوشتن قفل تمدید می شود؛ اگر قفل منقضی شده و به درخواست دیگری رسیده باشد 409 برمی گردد.
+        """
+        self._lock(upload_id, lock)
+        with timed("upload.chunk_write"), open(self._data_path(upload_id), "ab") as f:
+            if f.tell() + len(data) > meta["length"]:
+                raise HTTPException(
+                    status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                    detail="Chunk exceeds the declared upload length.",
+                )
+            f.write(data)
+            return f.tell()
+
+    def end_chunk(self, upload_id: uuid.UUID, meta: dict, lock: str) -> None:
+        """آزاد کردن قفل و تمدید زمان انقضا (آپلودهای فعال منقضی نمی شوند)."""
+        try:
+            if os.path.exists(self._meta_path(upload_id)):
+                self._write_meta(upload_id, {**meta, "expires_at": self._expires_at()})
+        finally:
+            self._unlock(upload_id, lock)
+
+    def finalize(self, db: Session, upload_id: uuid.UUID, user: User) -> Dress:
+        """
+        آپلود کامل شده را به صف نرمال‌سازی DressService می سپارد و رکورد لباس را می سازد.
+        تکرار finalize (مثلاً بعد از قطع اتصال یا خطای گذرای دیتابیس) همان لباس قبلی را برمی گرداند
+        یا آن را از همان داده‌های آپلود شده می سازد.
+        """
+        idempotency_key = f"upload:{upload_id}"
+        existing = dress_service.get_dress_by_idempotency_key(db, user, idempotency_key)
+        if existing:
+            return existing
+        meta = self.get_upload(upload_id, user)
+        lock = self._lock(upload_id)
+        try:
+            offset = self.get_offset(upload_id)
+            if offset != meta["length"]:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Upload is incomplete ({offset} of {meta['length']} bytes).",
+                    headers={"Upload-Offset": str(offset)},
+                )
+            dress_in = DressCreate(title=meta["title"], gender=meta["gender"])
+            try:
+                dress = dress_service.create_dress_from_file(
+                    db, user, self._data_path(upload_id), dress_in, meta["filename"], idempotency_key
+                )
+            except HTTPException as e:
+                # خطای دائمی (مثلاً تصویر نامعتبر): داده‌های آپلود دیگر قابل استفاده نیستند
+                if e.status_code < 500:
+                    self.discard(upload_id)
+                raise
+            # خطاهای دیگر (مثلاً قفل دیتابیس) فایل‌های آپلود را نگه می دارند تا finalize قابل تکرار باشد
+            self.discard(upload_id)
+            return dress
+        finally:
+            self._unlock(upload_id, lock)
+
+    def discard(self, upload_id: uuid.UUID) -> None:
+        for path in (self._data_path(upload_id), self._meta_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        shared_state.clear_lease(self._lock_key(upload_id))
+
+    def start_cleanup(self) -> None:
+        """حذف دوره‌ای آپلودهای منقضی در پس‌زمینه (در lifespan)، مستقل از ایجاد آپلود جدید."""
+        if settings.UPLOAD_CLEANUP_INTERVAL_SECONDS <= 0 or self._cleanup_thread is not None:
+            return
+        self._stop.clear()
+        self._cleanup_thread = threading.Thread(target=self._cleanup_loop, name="upload-cleanup", daemon=True)
+        self._cleanup_thread.start()
+
+    def stop_cleanup(self) -> None:
+        if self._cleanup_thread is None:
+            return
+        self._stop.set()
+        self._cleanup_thread.join(5)
+        self._cleanup_thread = None
+
+    def _cleanup_loop(self) -> None:
+        while True:
+            try:
+                self.cleanup_expired()
+            except Exception as e:
+                print(f"❌ Could not clean up expired uploads: {e}")
+            if self._stop.wait(settings.UPLOAD_CLEANUP_INTERVAL_SECONDS):
+                return
+
+    def cleanup_expired(self) -> int:
+        """حذف آپلودهای رها شده‌ای که زمان انقضای آنها گذشته است."""
+        if not os.path.isdir(self.directory):
+            return 0
+        now, removed = time.time(), 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            upload_id = name.removesuffix(".json")
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    expires_at = json.load(f)["expires_at"]
+            except (OSError, ValueError, KeyError):
+                continue
+            if expires_at < now:
+                self.discard(upload_id)
+                removed += 1
+        return removed
+
+
+resumable_upload_service = ResumableUploadService()
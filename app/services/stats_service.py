@@ -0,0 +1,155 @@
+"""
+آمار تجمیعی (Rollup) برای داشبوردهای مدیریتی.
+
+جداول dress_daily_stats و user_dress_stats در همان تراکنشی که لباس ثبت، ویرایش یا حذف می شود،
+و ar_session_hourly_stats بعد از شروع هر جلسه AR، به صورت افزایشی بروز می شوند؛ endpoint های
+آمار فقط همین سطل‌ها (Bucket) را می خوانند و هزینه آنها به تعداد سطل‌ها بستگی دارد نه به حجم dresses و users.
+
+آمار جلسات AR در تراکنش جداگانه‌ای بعد از اجرای موتور ثبت می شود و جدول خامی در دیتابیس ندارد؛
+اگر ثبت آن شکست بخورد، قابل بازسازی نیست (بهترین تلاش).
+
+اگر آمار لباس‌ها با جداول خام ناهمخوان شد (مثلاً بعد از ویرایش دستی دیتابیس)، بازسازی کنید:
+
+    python -m app.services.stats_service rebuild
+"""
+import argparse
+from collections import Counter
+from datetime import date, datetime
+from typing import Iterable, Optional, Union
+import uuid
+
+from sqlalchemy import Date, Row, RowMapping, Table, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.dress import Dress
+from app.models.stats import ARSessionHourlyStat, DressDailyStat, UserDressStat
+from app.schemas.stats import StatsRebuildResult
+
+
+class StatsService:
+
+    # ------------------- بروزرسانی افزایشی (بدون commit؛ بخشی از تراکنش فراخوان) -------------------
+
+    def _increment(self, db: Session, table: Table, key: dict, column: str, delta: int) -> None:
+        """افزایش (یا کاهش) شمارنده یک سطل با یک دستور INSERT ... ON CONFLICT DO UPDATE؛ سطل‌های خالی حذف می شوند."""
+        if delta == 0:
+            return
+        dialect_insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        counter = table.c[column]
+        db.execute(
+            dialect_insert(table)
+            .values(**key, **{column: delta})
+            .on_conflict_do_update(index_elements=list(key), set_={column: counter + delta})
+        )
+        if delta < 0:
+            db.execute(delete(table).where(*(table.c[name] == value for name, value in key.items()), counter <= 0))
+
+    def _bump_day(self, db: Session, created_at: datetime, gender: str, delta: int) -> None:
+        self._increment(db, DressDailyStat.__table__, {"day": created_at.date(), "gender": gender}, "dress_count", delta)
+
+    def _bump_user(self, db: Session, user_id: uuid.UUID, delta: int) -> None:
+        self._increment(db, UserDressStat.__table__, {"user_id": user_id}, "dress_count", delta)
+
+    def dress_added(self, db: Session, dress: Dress) -> None:
+        self._bump_day(db, dress.created_at, dress.gender, 1)
+        self._bump_user(db, dress.user_id, 1)
+
+    def dress_gender_changed(self, db: Session, dress: Dress, old_gender: str) -> None:
+        if old_gender != dress.gender:
+            self._bump_day(db, dress.created_at, old_gender, -1)
+            self._bump_day(db, dress.created_at, dress.gender, 1)
+
+    def dresses_removed(self, db: Session, user_id: uuid.UUID, dresses: Iterable[Union[Dress, Row]]) -> None:
+        """کاهش آمار برای لباس‌های حذف شده یک کاربر (هر عضو gender و created_at دارد)."""
+        per_day = Counter((dress.created_at.date(), dress.gender) for dress in dresses)
+        for (day, gender), count in per_day.items():
+            self._increment(db, DressDailyStat.__table__, {"day": day, "gender": gender}, "dress_count", -count)
+        self._bump_user(db, user_id, -sum(per_day.values()))
+
+    def user_removed(self, db: Session, user_id: uuid.UUID) -> None:
+        db.execute(delete(UserDressStat).where(UserDressStat.user_id == user_id))
+
+    def ar_session_started(self, db: Session, started_at: Optional[datetime] = None) -> None:
+        hour = (started_at or datetime.utcnow()).replace(minute=0, second=0, microsecond=0)
+        self._increment(db, ARSessionHourlyStat.__table__, {"hour": hour}, "session_count", 1)
+
+    # ------------------- خواندن (O(تعداد سطل‌ها)) -------------------
+
+    def dresses_per_day(
+        self, db: Session, start: Optional[date] = None, end: Optional[date] = None, gender: Optional[str] = None
+    ) -> list[RowMapping]:
+        """تعداد لباس‌ها به تفکیک روز و جنسیت در بازه [start, end)."""
+        query = select(DressDailyStat.day, DressDailyStat.gender, DressDailyStat.dress_count)
+        if start:
+            query = query.where(DressDailyStat.day >= start)
+        if end:
+            query = query.where(DressDailyStat.day < end)
+        if gender:
+            query = query.where(DressDailyStat.gender == gender)
+        return db.execute(query.order_by(DressDailyStat.day, DressDailyStat.gender)).mappings().all()
+
+    def dresses_per_user(self, db: Session, limit: int) -> list[RowMapping]:
+        """کاربران با بیشترین تعداد لباس."""
+        query = (
+            select(UserDressStat.user_id, UserDressStat.dress_count)
+            .order_by(UserDressStat.dress_count.desc(), UserDressStat.user_id)
+            .limit(limit)
+        )
+        return db.execute(query).mappings().all()
+
+    def ar_sessions_per_hour(
+        self, db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None
+    ) -> list[RowMapping]:
+        """تعداد جلسات AR شروع شده به تفکیک ساعت در بازه [start, end)."""
+        query = select(ARSessionHourlyStat.hour, ARSessionHourlyStat.session_count)
+        if start:
+            query = query.where(ARSessionHourlyStat.hour >= start)
+        if end:
+            query = query.where(ARSessionHourlyStat.hour < end)
+        return db.execute(query.order_by(ARSessionHourlyStat.hour)).mappings().all()
+
+    # ------------------- بازسازی از جداول خام -------------------
+
+    def rebuild(self, db: Union[Session, Connection]) -> StatsRebuildResult:
+        """
+        آمار لباس‌ها را با INSERT ... SELECT از جدول dresses از نو می سازد (بدون commit).
+        آمار جلسات AR منبع خامی در دیتابیس ندارد و دست نخورده می ماند.
+        """
+        day = func.date(Dress.created_at, type_=Date)
+        db.execute(delete(DressDailyStat))
+        db.execute(insert(DressDailyStat).from_select(
+            ["day", "gender", "dress_count"],
+            select(day, Dress.gender, func.count()).where(Dress.created_at.is_not(None)).group_by(day, Dress.gender),
+        ))
+        db.execute(delete(UserDressStat))
+        db.execute(insert(UserDressStat).from_select(
+            ["user_id", "dress_count"],
+            select(Dress.user_id, func.count()).group_by(Dress.user_id),
+        ))
+        return StatsRebuildResult(
+            dress_daily_buckets=db.execute(select(func.count()).select_from(DressDailyStat)).scalar_one(),
+            user_buckets=db.execute(select(func.count()).select_from(UserDressStat)).scalar_one(),
+        )
+
+
+stats_service = StatsService()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Admin statistics rollups")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("rebuild", help="recompute dress rollups from the raw tables")
+    parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        result = stats_service.rebuild(db)
+        db.commit()
+    print(f"Rebuilt {result.dress_daily_buckets} daily bucket(s) and {result.user_buckets} user bucket(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
-from typing import Optional
+from typing import Callable, Optional
+from sqlalchemy import select, delete
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import uuid
 # اگرچه در سرویس‌های دیگر تعریف شده‌اند، اما برای استفاده از Dress و uuid باید اینجا ایمپورت شوند
 from app.models.user import User
 from app.models.dress import Dress
+from app.models.job import Job
 from app.schemas.user import UserCreate, UserLogin, UserUpdate
+from app.core.config import settings
 from app.core.security import get_password_hash, verify_password, create_access_token
+from app.services.dress_service import dress_service
+from app.services.job_queue import job_queue
+from app.services.stats_service import stats_service
+from app.services.version_stamps import version_stamps
+
+# نوع کار صف برای حذف حساب کاربری و لباس‌هایش
+ACCOUNT_DELETE_JOB = "user.delete"
 
 class UserService:
     
@@ -58,11 +69,103 @@ class UserService:
         db.add(user)
         db.commit()
         db.refresh(user)
+        version_stamps.bump(user.id)
         return user
     
     def get_user_dresses_count(self, db: Session, user_id: uuid.UUID) -> int:
         """تعداد لباس های آپلود شده توسط کاربر را برمی گرداند.""" # اصلاح شده
         return db.query(Dress).filter(Dress.user_id == user_id).count()
 
+    def get_profile_etag(self, user: User, uploaded_dress_count: int) -> str:
+        """ETag پروفایل را از نسخه نوشتن‌های کاربر و تعداد لباس‌هایش می سازد."""
+        return version_stamps.make_etag(user.id, "profile", uploaded_dress_count)
+
+    def delete_user(
+        self,
+        db: Session,
+        user_id: uuid.UUID,
+        batch_size: Optional[int] = None,
+        on_batch: Optional[Callable[[list[str]], object]] = None
+    ) -> list[str]:
+        """
+        حساب کاربر و تمام لباس‌هایش را حذف می کند و مسیر فایل‌های لباس‌ها را برمی گرداند.
+
+        ردیف‌های dresses با DELETE مجموعه‌ای و در دسته‌های batch_size تایی حذف می شوند و
+        بعد از هر دسته commit انجام می شود تا جدول برای مدت طولانی قفل نماند.
+        هیچ شیء ORM از Dress بارگذاری نمی شود؛ on_batch (مثلاً حذف فایل‌ها) بعد از commit هر دسته
+        با مسیر فایل‌های همان دسته صدا زده می شود.
+        """
+        batch_size = batch_size or settings.ACCOUNT_DELETE_BATCH_SIZE
+        file_paths: list[str] = []
+
+        while True:
+            rows = db.execute(
+                select(Dress.id, Dress.file_path, Dress.gender, Dress.created_at)
+                .where(Dress.user_id == user_id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            db.execute(
+                delete(Dress).where(Dress.id.in_([row.id for row in rows])),
+                execution_options={"synchronize_session": False},
+            )
+            # آمار تجمیعی در همان تراکنش هر دسته کاهش می یابد
+            stats_service.dresses_removed(db, user_id, rows)
+            db.commit()
+            batch_paths = [row.file_path for row in rows]
+            file_paths.extend(batch_paths)
+            if on_batch:
+                on_batch(batch_paths)
+
+        db.execute(
+            delete(User).where(User.id == user_id),
+            execution_options={"synchronize_session": False},
+        )
+        stats_service.user_removed(db, user_id)
+        db.commit()
+        version_stamps.bump(user_id)
+        return file_paths
+
+    # ------------------- حذف حساب در صف کارهای پس‌زمینه -------------------
+
+    def request_account_deletion(self, db: Session, user: User) -> Job:
+        """
+        ثبت کار حذف حساب در صف (یک کار برای هر کاربر)؛ حذف دسته‌ای ردیف‌ها و فایل‌ها در worker
+        انجام می شود تا حساب‌های بزرگ به Timeout درخواست نخورند. اگر کار قبلی بعد از اتمام تلاش‌ها
+        failed شده باشد، همان کار با تلاش‌های تازه دوباره در صف قرار می گیرد.
+        """
+        idempotency_key = f"{ACCOUNT_DELETE_JOB}:{user.id}"
+        existing = job_queue.get_by_idempotency_key(db, idempotency_key)
+        if existing and existing.status == "failed" and job_queue.retry_failed(db, existing):
+            db.commit()
+            db.refresh(existing)
+            job_queue.notify()
+        if existing:
+            return existing
+        job = job_queue.enqueue(
+            db, ACCOUNT_DELETE_JOB, {"user_id": str(user.id)}, idempotency_key=idempotency_key, user_id=user.id
+        )
+        try:
+            db.commit()
+        except IntegrityError:
+            # درخواست همزمان دیگری زودتر کار را ثبت کرده است
+            db.rollback()
+            return job_queue.get_by_idempotency_key(db, idempotency_key)
+        db.refresh(job)
+        job_queue.notify()
+        return job
+
+    def get_account_deletion(self, db: Session, job_id: uuid.UUID) -> Optional[Job]:
+        job = db.get(Job, job_id)
+        return job if job is not None and job.kind == ACCOUNT_DELETE_JOB else None
+
+    def run_account_deletion(self, db: Session, payload: dict) -> dict:
+        """Handler کار حذف حساب؛ تکرارپذیر است (اجرای دوباره فقط ردیف‌های باقی‌مانده را حذف می کند)."""
+        file_paths = self.delete_user(db, uuid.UUID(payload["user_id"]), on_batch=dress_service.remove_stored_files)
+        return {"deleted_dress_count": len(file_paths)}
+
 # ایجاد یک نمونه از سرویس برای استفاده در روترها
-user_service = UserService()
\ No newline at end of file
+user_service = UserService()
+job_queue.register(ACCOUNT_DELETE_JOB, user_service.run_account_deletion)
\ No newline at end of file
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from typing import Any, Callable, Optional
+
+import anyio
+
+from app.core.shared_state import SharedState, shared_state
+
+# کانال Broadcast تغییر داده‌های کاربر؛ payload شامل user_id است
+USER_DATA_CHANNEL = "user-data"
+
+
+class VersionStamps:
+    """
+    شمارنده نسخه به ازای هر کاربر برای ساخت ETag های ارزان.
+
+    هر نوشتن در DressService و UserService شمارنده کاربر را افزایش می دهد. شمارنده‌ها در
+    وضعیت مشترک (SharedState) نگهداری می شوند تا همه worker ها ETag یکسانی بسازند و هر تغییر
+    به صورت یک پیام ابطال کش روی کانال USER_DATA_CHANNEL منتشر می شود.
+    شناسه instance وضعیت مشترک نقش epoch را دارد: با پاک شدن فایل، ETag های قبلی معتبر نمی مانند.
+    درخواست‌های Long Polling با wait_for_change تا رسیدن همین پیام (از هر worker) منتظر می مانند.
+    """
+
+    def __init__(self, state: SharedState = shared_state) -> None:
+        self._state = state
+        self._waiters: dict[str, list[Callable[[], None]]] = {}
+        self._waiters_lock = threading.Lock()
+        self._subscribed_pid: Optional[int] = None
+
+    @staticmethod
+    def _key(user_id: uuid.UUID) -> str:
+        return f"version:{user_id}"
+
+    def bump(self, user_id: uuid.UUID) -> int:
+        """نسخه داده‌های کاربر را یک واحد افزایش می دهد."""
+        version = self._state.incr(self._key(user_id))
+        self._state.publish(USER_DATA_CHANNEL, {"user_id": str(user_id), "version": version})
+        # منتظرهای همین فرآیند بدون صبر برای Thread خواندن پیام‌ها بیدار می شوند
+        self._wake({"user_id": str(user_id)})
+        return version
+
+    def get(self, user_id: uuid.UUID) -> int:
+        return self._state.get(self._key(user_id))
+
+    # ------------------- انتظار برای تغییر داده‌های کاربر -------------------
+
+    def _ensure_subscribed(self) -> None:
+        # subscribe در هر فرآیند (از جمله worker های fork شده) یک بار انجام می شود
+        pid = os.getpid()
+        with self._waiters_lock:
+            if self._subscribed_pid == pid:
+                return
+            self._waiters = {}
+            self._subscribed_pid = pid
+        self._state.subscribe(USER_DATA_CHANNEL, self._wake)
+
+    def _wake(self, payload: dict) -> None:
+        with self._waiters_lock:
+            callbacks = self._waiters.pop(payload.get("user_id"), [])
+        for callback in callbacks:
+            callback()
+
+    async def wait_for_change(self, user_id: uuid.UUID, version: int, timeout: float) -> bool:
+        """
+        تا وقتی نسخه کاربر برابر version است (حداکثر timeout ثانیه) منتظر می ماند، بدون اشغال Thread
+        یا اتصال دیتابیس. True یعنی نسخه تغییر کرده است.
+        """
+        self._ensure_subscribed()
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+
+        def wake() -> None:
+            try:
+                loop.call_soon_threadsafe(changed.set)
+            except RuntimeError:
+                pass  # event loop بسته شده است
+
+        key = str(user_id)
+        with self._waiters_lock:
+            self._waiters.setdefault(key, []).append(wake)
+        try:
+            # بررسی بعد از ثبت منتظر، تا bump بین خواندن version و ثبت از دست نرود
+            if await anyio.to_thread.run_sync(self.get, user_id) != version:
+                return True
+            with anyio.move_on_after(timeout):
+                await changed.wait()
+            return await anyio.to_thread.run_sync(self.get, user_id) != version
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(key, [])
+                if wake in waiters:
+                    waiters.remove(wake)
+                if not waiters:
+                    self._waiters.pop(key, None)
+
+    def make_etag(self, user_id: uuid.UUID, *parts: Any) -> str:
+        """یک Weak ETag از نسخه کاربر و مقادیر دلخواه (مثل تعداد و آخرین زمان ایجاد) می سازد."""
+        raw = "|".join(str(part) for part in (self._state.instance_id, user_id, self.get(user_id), *parts))
+        return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """مقایسه ضعیف (Weak Comparison) هدر If-None-Match با ETag فعلی."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+version_stamps = VersionStamps()
@@ -0,0 +1,204 @@
+"""
+میکروبنچمارک پردازش تصویر لباس هنگام آپلود.
+
+روی مجموعه‌ای از تصاویر ساختگی لباس (ابعاد، mode و فرمت‌های مختلف) زمان مراحل
+decode / convert / resize / encode را برای هر فیلتر ریسایز و هر تنظیم encoder
+(سطوح فشرده‌سازی PNG، WebP بدون اتلاف و AVIF) اندازه می گیرد و حجم خروجی را گزارش می دهد.
+در پایان پروفایل‌های Ingest تعریف شده در app/services/image_ingest.py به صورت کامل
+(همان مسیر DressService.normalize_image) مقایسه می شوند.
+
+اجرا:
+    python -m benchmarks.bench_image_ingest --repeat 3 --out results/ingest.json
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image, ImageDraw, ImageFilter, features
+
+from app.services.dress_service import dress_service, TARGET_SIZE
+from app.services.image_ingest import INGEST_PROFILES
+
+SIZES = [(640, 800), (1080, 1350), (2048, 2048), (4000, 3000)]
+# (mode, format) های رایج در آپلودهای کاربران
+VARIANTS = [("RGB", "JPEG"), ("RGB", "PNG"), ("RGBA", "PNG"), ("P", "PNG")]
+
+RESAMPLERS = ["NEAREST", "BILINEAR", "BICUBIC", "LANCZOS"]
+ENCODERS = {
+    "png-l1": ("PNG", {"compress_level": 1}),
+    "png-l6": ("PNG", {"compress_level": 6}),
+    "png-l9": ("PNG", {"compress_level": 9}),
+    "png-opt": ("PNG", {"optimize": True}),
+    "webp-lossless-m0": ("WEBP", {"lossless": True, "method": 0}),
+    "webp-lossless-m4": ("WEBP", {"lossless": True, "method": 4}),
+    "webp-lossless-m6": ("WEBP", {"lossless": True, "method": 6}),
+    "webp-near-lossless-60": ("WEBP", {"lossless": True, "near_lossless": 60}),
+}
+# AVIF فقط اگر Pillow با encoder آن build شده باشد (همان تنظیمات نسخه‌های app/services/image_variants.py)
+if features.check("avif"):
+    ENCODERS["avif-q90-444"] = ("AVIF", {"quality": 90, "subsampling": "4:4:4", "speed": 8})
+    ENCODERS["avif-q100-444"] = ("AVIF", {"quality": 100, "subsampling": "4:4:4", "speed": 8})
+
+
+def make_garment(size: tuple[int, int], mode: str) -> Image.Image:
+    """یک تصویر ساختگی شبیه لباس: پس‌زمینه شفاف، بدنه با گرادیان، بافت نویزی و لبه‌های نرم."""
+    width, height = size
+    texture = Image.effect_noise(size, 40).convert("RGB")
+    gradient = Image.linear_gradient("L").resize(size).convert("RGB")
+    body = Image.blend(texture, gradient, 0.6)
+
+    mask = Image.new("L", size, 0)
+    draw = ImageDraw.Draw(mask)
+    draw.polygon([
+        (width * 0.30, height * 0.05), (width * 0.70, height * 0.05),
+        (width * 0.95, height * 0.30), (width * 0.80, height * 0.40),
+        (width * 0.75, height * 0.95), (width * 0.25, height * 0.95),
+        (width * 0.20, height * 0.40), (width * 0.05, height * 0.30),
+    ], fill=255)
+    mask = mask.filter(ImageFilter.GaussianBlur(max(1, width // 300)))
+
+    garment = Image.new("RGBA", size, (0, 0, 0, 0))
+    garment.paste(body, mask=mask)
+    if mode == "RGB":
+        background = Image.new("RGB", size, (255, 255, 255))
+        background.paste(garment, mask=garment.getchannel("A"))
+        return background
+    if mode == "P":
+        return garment.convert("P", palette=Image.Palette.ADAPTIVE)
+    return garment
+
+
+def build_corpus() -> list[dict]:
+    corpus = []
+    for size in SIZES:
+        for mode, fmt in VARIANTS:
+            buffer = io.BytesIO()
+            make_garment(size, mode).save(buffer, fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+            corpus.append({"name": f"{size[0]}x{size[1]}-{mode}-{fmt}", "data": buffer.getvalue()})
+    return corpus
+
+
+def best_of(func, repeat: int) -> tuple[float, object]:
+    """کمترین زمان (میلی‌ثانیه) از repeat اجرا و نتیجه آخرین اجرا."""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+
+def bench_stages(item: dict, repeat: int) -> dict:
+    """زمان هر مرحله به صورت جداگانه برای یک تصویر."""
+    def decode():
+        img = Image.open(io.BytesIO(item["data"]))
+        img.load()
+        return img
+
+    decode_ms, decoded = best_of(decode, repeat)
+    convert_ms, rgba = best_of(lambda: decoded.convert("RGBA"), repeat)
+
+    resize = {}
+    for name in RESAMPLERS:
+        ms, resized = best_of(lambda: rgba.resize(TARGET_SIZE, getattr(Image.Resampling, name)), repeat)
+        resize[name] = round(ms, 3)
+
+    target = rgba.resize(TARGET_SIZE, Image.Resampling.LANCZOS)
+    encode = {}
+    for name, (fmt, options) in ENCODERS.items():
+        def run_encoder():
+            buffer = io.BytesIO()
+            target.save(buffer, fmt, **options)
+            return buffer.tell()
+        ms, size = best_of(run_encoder, repeat)
+        encode[name] = {"ms": round(ms, 3), "bytes": size}
+
+    result = {
+        "input_bytes": len(item["data"]),
+        "decode_ms": round(decode_ms, 3),
+        "convert_ms": round(convert_ms, 3),
+        "resize_ms": resize,
+        "encode": encode,
+    }
+    if item["name"].endswith("JPEG"):
+        def draft_decode():
+            img = Image.open(io.BytesIO(item["data"]))
+            img.draft("RGB", TARGET_SIZE)
+            img.load()
+            return img
+        result["decode_draft_ms"] = round(best_of(draft_decode, repeat)[0], 3)
+    return result
+
+
+def bench_profiles(corpus: list[dict], repeat: int) -> dict:
+    """زمان کل و حجم خروجی هر پروفایل Ingest روی کل مجموعه (مسیر واقعی سرویس)."""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        sources = []
+        for item in corpus:
+            path = os.path.join(workdir, item["name"])
+            with open(path, "wb") as f:
+                f.write(item["data"])
+            sources.append(path)
+
+        for name, profile in INGEST_PROFILES.items():
+            total_ms, total_bytes = 0.0, 0
+            for source in sources:
+                target = source + f".{name}.png"
+                ms, _ = best_of(lambda: dress_service.normalize_image(source, target, profile), repeat)
+                total_ms += ms
+                total_bytes += os.path.getsize(target)
+            results[name] = {
+                "total_ms": round(total_ms, 3),
+                "mean_ms_per_image": round(total_ms / len(sources), 3),
+                "total_output_bytes": total_bytes,
+            }
+    return results
+
+
+def print_summary(stages: dict, profiles: dict) -> None:
+    print(f"{'image':<26}{'decode':>9}{'convert':>9}" + "".join(f"{name[:8]:>10}" for name in RESAMPLERS))
+    for name, row in stages.items():
+        print(
+            f"{name:<26}{row['decode_ms']:>9.2f}{row['convert_ms']:>9.2f}"
+            + "".join(f"{row['resize_ms'][r]:>10.2f}" for r in RESAMPLERS)
+        )
+
+    print(f"\n{'encoder (512x512 RGBA)':<26}{'median ms':>12}{'median KB':>12}")
+    for encoder in ENCODERS:
+        ms = statistics.median(row["encode"][encoder]["ms"] for row in stages.values())
+        kb = statistics.median(row["encode"][encoder]["bytes"] for row in stages.values()) / 1024
+        print(f"{encoder:<26}{ms:>12.2f}{kb:>12.1f}")
+
+    print(f"\n{'ingest profile':<26}{'ms/image':>12}{'total KB':>12}")
+    for name, row in profiles.items():
+        print(f"{name:<26}{row['mean_ms_per_image']:>12.2f}{row['total_output_bytes'] / 1024:>12.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is reported)")
+    parser.add_argument("--out", help="write the full results as JSON")
+    args = parser.parse_args()
+
+    corpus = build_corpus()
+    stages = {item["name"]: bench_stages(item, args.repeat) for item in corpus}
+    profiles = bench_profiles(corpus, args.repeat)
+    print_summary(stages, profiles)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"stages": stages, "profiles": profiles}, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
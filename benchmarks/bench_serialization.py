@@ -0,0 +1,96 @@
+"""
+بنچمارک سریال‌سازی لیست لباس‌ها: مسیر قبلی (اشیاء ORM + اعتبارسنجی تک به تک + json استاندارد)
+در مقابل مسیر سریع (انتخاب ستون‌ها + TypeAdapter + orjson).
+
+اجرا:
+    python -m benchmarks.bench_serialization --dresses 5000 --repeat 20
+"""
+import argparse
+import json
+import statistics
+import sys
+import os
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models.user import User
+from app.models.dress import Dress
+from app.schemas.dress import DressInDB, DressListAdapter
+from app.services.dress_service import dress_service
+
+
+def build_database(dress_count: int):
+    """ساخت یک دیتابیس SQLite در حافظه با یک کاربر و dress_count لباس."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    user = User(id=uuid.uuid4(), email="bench@example.com", password_hash="x", role="user")
+    session.add(user)
+    session.add_all(
+        Dress(
+            user_id=user.id,
+            file_path=f"storage/dresses/{uuid.uuid4()}.png",
+            gender="female" if i % 2 else "male",
+            title=f"Dress {i}",
+        )
+        for i in range(dress_count)
+    )
+    session.commit()
+    return session, user.id
+
+
+def legacy_path(session, user_id) -> bytes:
+    """مسیر قبلی: اشیاء ORM کامل، اعتبارسنجی تک به تک و انکودر استاندارد json."""
+    dresses = dress_service.get_user_dresses(session, user_id)
+    content = jsonable_encoder([DressInDB.model_validate(dress) for dress in dresses])
+    return JSONResponse(content=content).body
+
+
+def fast_path(session, user_id) -> bytes:
+    """مسیر جدید: فقط ستون‌های لازم، اعتبارسنجی یکجا و orjson."""
+    rows = dress_service.get_user_dress_rows(session, user_id)
+    dresses = DressListAdapter.validate_python(rows)
+    return ORJSONResponse(content=DressListAdapter.dump_python(dresses)).body
+
+
+def measure(func, session, user_id, repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        session.expunge_all()  # شبیه‌سازی یک Session تازه در هر درخواست
+        start = time.perf_counter()
+        func(session, user_id)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dresses", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    session, user_id = build_database(args.dresses)
+
+    # هر دو مسیر باید خروجی معادل تولید کنند
+    assert json.loads(legacy_path(session, user_id)) == json.loads(fast_path(session, user_id))
+
+    print(f"Serializing {args.dresses} dresses, {args.repeat} runs each")
+    results = {}
+    for name, func in (("legacy", legacy_path), ("fast", fast_path)):
+        timings = measure(func, session, user_id, args.repeat)
+        results[name] = statistics.median(timings)
+        print(f"  {name:<8} median {results[name]:8.2f} ms | min {min(timings):8.2f} ms | max {max(timings):8.2f} ms")
+    print(f"  speedup  x{results['legacy'] / results['fast']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+ابزار بازپخش بار (Load Replay) برای اندازه‌گیری توان عملیاتی و تأخیر API.
+
+یک ترکیب درخواست (ضبط شده در فایل JSONL یا ساختگی) را روی اپلیکیشن main.app
+به صورت in-process یا روی یک سرور uvicorn محلی اجرا می کند و برای هر مسیر
+p50/p95/p99، تعداد درخواست در ثانیه و خطاها را گزارش می دهد.
+
+در حالت --url محدودیت نرخ (RATE_LIMITS) سرور اعمال می شود و همه کاربران مجازی از یک IP می آیند؛
+برای سنجش خود مسیرها سرور را با RATE_LIMIT_ENABLED=false اجرا کنید (حالت in-process آن را خاموش می کند).
+
+نمونه‌ها:
+    # ترکیب ساختگی با ۵۰۰ درخواست و ۸ کاربر همزمان روی اپ in-process
+    python -m benchmarks.load_replay --synthetic 500 --concurrency 8 --out results/base.json
+
+    # بازپخش یک ترکیب ضبط شده روی سرور محلی و مقایسه با اجرای قبلی
+    python -m benchmarks.load_replay --replay mix.jsonl --url http://127.0.0.1:8080 \\
+        --out results/new.json --compare results/base.json
+
+هر خط فایل ترکیب یک درخواست است: {"op": "list"} یا {"op": "upload", "gender": "female"}.
+عملیات‌های پشتیبانی شده: signup, login, profile, upload, list, ar_start
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+
+API = "/api/v1"
+
+# وزن پیش‌فرض هر عملیات در ترکیب ساختگی (نزدیک به رفتار کلاینت موبایل)
+DEFAULT_WEIGHTS = {
+    "signup": 1,
+    "login": 2,
+    "profile": 20,
+    "list": 40,
+    "upload": 5,
+    "ar_start": 2,
+}
+
+
+@dataclass
+class RouteStats:
+    """آمار یک مسیر: زمان هر درخواست (میلی‌ثانیه) و تعداد خطاها به تفکیک کد وضعیت."""
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def record(self, elapsed_ms: float, error: Optional[str]) -> None:
+        self.latencies_ms.append(elapsed_ms)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, wall_seconds: float) -> dict:
+        latencies = sorted(self.latencies_ms)
+        return {
+            "count": len(latencies),
+            "errors": sum(self.errors.values()),
+            "error_breakdown": self.errors,
+            "rps": round(len(latencies) / wall_seconds, 2) if wall_seconds else 0.0,
+            "mean_ms": round(statistics.fmean(latencies), 3) if latencies else None,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": round(latencies[-1], 3) if latencies else None,
+        }
+
+
+def percentile(sorted_values: list[float], pct: float) -> Optional[float]:
+    """صدک به روش nearest-rank روی لیست مرتب شده."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return round(sorted_values[min(rank, len(sorted_values)) - 1], 3)
+
+
+# ------------------- ساخت ترکیب درخواست‌ها -------------------
+
+def synthetic_mix(total: int, weights: dict[str, int], seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    ops, op_weights = zip(*weights.items())
+    return [{"op": op} for op in rng.choices(ops, weights=op_weights, k=total)]
+
+
+def load_mix(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def make_test_image(size: tuple[int, int] = (800, 1000)) -> bytes:
+    """یک تصویر PNG ساختگی برای درخواست‌های آپلود."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, (180, 40, 90, 255)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# ------------------- کاربر مجازی -------------------
+
+class VirtualUser:
+    """یک کاربر مجازی با حساب، توکن و لیست لباس‌های خودش."""
+
+    def __init__(self, client: httpx.AsyncClient, image: bytes) -> None:
+        self.client = client
+        self.image = image
+        self.email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        self.password = "loadtest-password"
+        self.headers: dict[str, str] = {}
+        self.dress_ids: list[str] = []
+        # لباس‌هایی که پردازش تصویرشان تمام شده و برای شروع AR آماده‌اند
+        self.ready_ids: list[str] = []
+
+    async def setup(self) -> None:
+        await self.client.post(f"{API}/users/signup", json={"email": self.email, "password": self.password})
+        await self.login()
+        await self.upload({})
+        # آماده شدن اولین لباس جزو زمان‌سنجی نیست؛ ar_start فقط لباس آماده را شروع می کند
+        if self.dress_ids:
+            await self.wait_until_ready(self.dress_ids[0])
+
+    async def login(self) -> httpx.Response:
+        response = await self.client.post(
+            f"{API}/users/login", data={"username": self.email, "password": self.password}
+        )
+        if response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        return response
+
+    async def signup(self, request: dict) -> httpx.Response:
+        email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        return await self.client.post(f"{API}/users/signup", json={"email": email, "password": self.password})
+
+    async def profile(self, request: dict) -> httpx.Response:
+        return await self.client.get(f"{API}/users/profile", headers=self.headers)
+
+    async def list(self, request: dict) -> httpx.Response:
+        params = {"gender": request["gender"]} if request.get("gender") else None
+        return await self.client.get(f"{API}/dresses/", params=params, headers=self.headers)
+
+    async def upload(self, request: dict) -> httpx.Response:
+        response = await self.client.post(
+            f"{API}/dresses/",
+            headers=self.headers,
+            files={"file": ("bench.png", self.image, "image/png")},
+            data={"gender": request.get("gender", "female"), "title": "bench"},
+        )
+        if response.status_code in (200, 201, 202):
+            self.dress_ids.append(response.json()["id"])
+        return response
+
+    async def wait_until_ready(self, dress_id: str) -> None:
+        """انتظار (Long Polling) تا پایان پردازش تصویر لباس در صف کارها."""
+        response = await self.client.get(f"{API}/dresses/{dress_id}", params={"wait": 30}, headers=self.headers)
+        if response.status_code == 200 and response.json()["status"] == "ready":
+            self.ready_ids.append(dress_id)
+
+    async def ar_start(self, request: dict) -> httpx.Response:
+        if not self.ready_ids:
+            if not self.dress_ids:
+                await self.upload({})
+            if self.dress_ids:
+                await self.wait_until_ready(self.dress_ids[0])
+        # اگر هیچ لباسی آماده نشد، درخواست همان طور ارسال و خطای آن گزارش می شود
+        dress_id = (self.ready_ids or self.dress_ids or [str(uuid.uuid4())])[0]
+        return await self.client.post(f"{API}/ar-session/start", json={"dress_id": dress_id}, headers=self.headers)
+
+    async def run(self, request: dict) -> httpx.Response:
+        if request["op"] == "login":
+            return await self.login()
+        return await getattr(self, request["op"])(request)
+
+
+# ------------------- اجرای بار -------------------
+
+async def replay(client: httpx.AsyncClient, mix: list[dict], concurrency: int) -> tuple[dict[str, RouteStats], float]:
+    image = make_test_image()
+    users = [VirtualUser(client, image) for _ in range(concurrency)]
+    await asyncio.gather(*(user.setup() for user in users))
+
+    stats: dict[str, RouteStats] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for request in mix:
+        queue.put_nowait(request)
+
+    async def worker(user: VirtualUser) -> None:
+        while not queue.empty():
+            request = queue.get_nowait()
+            start = time.perf_counter()
+            error = None
+            try:
+                response = await user.run(request)
+                if response.status_code >= 400:
+                    error = str(response.status_code)
+            except Exception as e:  # خطای شبکه یا استثنای داخل اپ
+                error = type(e).__name__
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            stats.setdefault(request["op"], RouteStats()).record(elapsed_ms, error)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(user) for user in users))
+    return stats, time.perf_counter() - started
+
+
+def in_process_client():
+    """
+    اپ main.app را با یک دیتابیس SQLite و پوشه‌های موقت (تصاویر، آپلودها، وضعیت مشترک و خروجی AR)
+    آماده می کند تا اجرای بنچمارک روی sql_app.db و پوشه storage اثری نگذارد.
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from app.core.config import settings
+
+    workdir = tempfile.mkdtemp(prefix="load-replay-")
+    settings.STORAGE_PATH = os.path.join(workdir, "dresses")
+    os.makedirs(settings.STORAGE_PATH, exist_ok=True)
+    settings.SHARED_STATE_PATH = os.path.join(workdir, "shared_state.db")
+    settings.RAW_UPLOAD_PATH = os.path.join(workdir, "raw")
+    settings.UPLOAD_STAGING_PATH = os.path.join(workdir, "uploads")
+    settings.AR_OUTPUT_PATH = os.path.join(workdir, "ar_sessions")
+    # همه کاربران مجازی از یک IP می آیند؛ بنچمارک هزینه خود مسیرها را می سنجد نه پاسخ‌های 429
+    settings.RATE_LIMIT_ENABLED = False
+
+    from main import app
+    from app.api.deps import get_db
+    from app.db.base import Base
+    from app.models import user, dress, job  # noqa: F401 - ثبت مدل‌ها در metadata
+    from app.services.job_queue import job_queue
+
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    BenchSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = BenchSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    # ASGITransport رویداد lifespan را اجرا نمی کند؛ worker های صف کارها روی همین دیتابیس اجرا می شوند
+    job_queue.start_workers(session_factory=BenchSession)
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://bench.local", timeout=60)
+
+
+# ------------------- گزارش و مقایسه -------------------
+
+def build_report(stats: dict[str, RouteStats], wall_seconds: float, meta: dict) -> dict:
+    all_stats = RouteStats()
+    for route_stats in stats.values():
+        all_stats.latencies_ms.extend(route_stats.latencies_ms)
+        for code, count in route_stats.errors.items():
+            all_stats.errors[code] = all_stats.errors.get(code, 0) + count
+    return {
+        "meta": {**meta, "wall_seconds": round(wall_seconds, 3)},
+        "total": all_stats.summary(wall_seconds),
+        "routes": {op: route_stats.summary(wall_seconds) for op, route_stats in sorted(stats.items())},
+    }
+
+
+def print_report(report: dict) -> None:
+    header = f"{'route':<10}{'count':>7}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, row in itertools.chain(report["routes"].items(), [("TOTAL", report["total"])]):
+        print(
+            f"{name:<10}{row['count']:>7}{row['errors']:>8}{row['rps']:>9}"
+            f"{row['p50_ms'] or 0:>10.2f}{row['p95_ms'] or 0:>10.2f}{row['p99_ms'] or 0:>10.2f}"
+        )
+
+
+def compare_reports(current: dict, baseline: dict, threshold_pct: float) -> bool:
+    """مقایسه p95 هر مسیر با اجرای پایه؛ در صورت پسرفت بیش از آستانه False برمی گرداند."""
+    ok = True
+    print(f"\nComparison against baseline (p95, regression threshold {threshold_pct}%):")
+    for name, row in current["routes"].items():
+        base = baseline.get("routes", {}).get(name)
+        if not base or not base.get("p95_ms") or row["p95_ms"] is None:
+            print(f"  {name:<10} (no baseline)")
+            continue
+        delta = (row["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+        flag = "REGRESSION" if delta > threshold_pct else "ok"
+        ok = ok and flag == "ok"
+        print(f"  {name:<10} {base['p95_ms']:>9.2f} -> {row['p95_ms']:>9.2f} ms ({delta:+6.1f}%) {flag}")
+    return ok
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    if args.replay:
+        mix = load_mix(args.replay)
+        source = args.replay
+    else:
+        weights = dict(DEFAULT_WEIGHTS)
+        if args.weights:
+            weights.update(json.loads(args.weights))
+        mix = synthetic_mix(args.synthetic, weights, args.seed)
+        source = f"synthetic(seed={args.seed})"
+
+    if args.record:
+        with open(args.record, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(request) + "\n" for request in mix)
+
+    client = httpx.AsyncClient(base_url=args.url, timeout=60) if args.url else in_process_client()
+    async with client:
+        stats, wall_seconds = await replay(client, mix, args.concurrency)
+
+    report = build_report(stats, wall_seconds, {
+        "target": args.url or "in-process",
+        "mix": source,
+        "requests": len(mix),
+        "concurrency": args.concurrency,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    print_report(report)
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare_reports(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", help="JSONL file of recorded requests to replay in order")
+    source.add_argument("--synthetic", type=int, default=300, help="number of synthetic requests to generate")
+    parser.add_argument("--weights", help='JSON object overriding synthetic weights, e.g. \'{"ar_start": 0}\'')
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", help="write the generated mix to this JSONL file")
+    parser.add_argument("--url", help="base URL of a running server; default runs main.app in-process")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--out", help="write the JSON report to this path")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p95 regression in percent")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,73 @@
-from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
-from app.core.config import settings
+from contextlib import asynccontextmanager
+
+from app.core.startup import startup_report
+
+with startup_report.phase("import framework"):
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+
+with startup_report.phase("import core"):
+    from app.core.config import settings
+    from app.core.metrics import registry, MetricsMiddleware
+    from app.core.profiling import ProfilingMiddleware
+    from app.core.query_stats import QueryAccountingMiddleware
 
 # ------------------- Routers Import -------------------
-from app.api.v1.routers import users, dresses, ar_session 
+with startup_report.phase("import routers"):
+    from app.api.v1.routers import users, dresses, ar_session, admin
+    from app.api.static_files import NegotiatedImageFiles
 
-# ------------------- Database Models Import -------------------
-from app.db.base import Base 
-from app.db.session import engine
+# ------------------- Lifespan -------------------
 
-# ------------------- Initialization Functions -------------------
+def check_schema_version() -> None:
+    """
+    فقط بررسی می کند (بدون تغییر دیتابیس) که مهاجرت اعمال نشده‌ای باقی نمانده باشد.
+    ساخت جداول با دستور جداگانه انجام می شود: python -m app.db.migrations upgrade
+    """
+    from app.db.migrations import pending_migrations
+    from app.db.session import engine
 
-def create_tables():
-    """ایجاد جداول دیتابیس بر اساس مدل‌های SQLAlchemy"""
-    from app.models import user, dress
-    Base.metadata.create_all(bind=engine)
+    try:
+        pending = pending_migrations(engine)
+    except Exception as e:
+        print(f"Warning: Could not check database schema version. Error: {e}")
+        return
+    if pending:
+        print(
+            f"Warning: {len(pending)} pending database migration(s) "
+            f"(latest: {pending[-1].version}). Run: python -m app.db.migrations upgrade"
+        )
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    with startup_report.phase("schema check"):
+        check_schema_version()
+    print(startup_report.render())
+    # worker های صف کارهای پس‌زمینه (پردازش تصاویر آپلود شده) در هر فرآیند وب
+    from app.services.job_queue import job_queue
+    job_queue.start_workers()
+    # بارگذاری Sketch لباس‌های پرتکرار و گرم کردن تصاویر آنها در پس‌زمینه (آماده شدن سرور را عقب نمی اندازد)
+    from app.services.access_tracker import access_tracker
+    from app.services.cache_warmup import start_warmup
+    access_tracker.start()
+    start_warmup()
+    # آپلودهای تکه‌ای رها شده به صورت دوره‌ای حذف می شوند
+    from app.services.resumable_upload_service import resumable_upload_service
+    resumable_upload_service.start_cleanup()
+    yield
+    resumable_upload_service.stop_cleanup()
+    access_tracker.stop()
+    job_queue.stop_workers()
+
+# ------------------- Initialization Functions -------------------
 
 def get_application() -> FastAPI:
     """
     راه‌اندازی برنامه FastAPI همراه با مستندات حرفه‌ای و طبقه‌بندی شده
     """
     
-    # ۱. ایجاد جداول دیتابیس
-    try:
-        create_tables() 
-        print("Database tables created successfully (SQLite).")
-    except Exception as e:
-        print(f"Warning: Could not create database tables. Error: {e}")
+    # ۱. جداول دیتابیس دیگر هنگام import ساخته نمی شوند؛ مهاجرت‌ها با دستور جداگانه اجرا می شوند:
+    #    python -m app.db.migrations upgrade
     
     # ۲. تنظیمات OpenAPI و توضیحات جامع داکیومنت
     application = FastAPI(
@@ -43,12 +84,16 @@ This API serves as the backbone for a virtual fitting room application, managing
 
 #### 🛠 Standard HTTP Response Codes & Errors:
 * <b style="color: #2e7d32;">200 / 201 OK</b>: Request processed successfully.
+* <b style="color: #2e7d32;">202 Accepted</b>: Garment upload stored; image processing continues in the background.
 * <b style="color: #fb8c00;">400 Bad Request</b>: Email already registered / Invalid file format (Only PNG/JPG).
 * <b style="color: #fb8c00;">401 Unauthorized</b>: Invalid Bearer Token or incorrect credentials.
 * <b style="color: #fb8c00;">403 Forbidden</b>: Ownership violation (modifying resources belonging to others).
 * <b style="color: #fb8c00;">404 Not Found</b>: Resource (User/Dress) not found.
+* <b style="color: #fb8c00;">409 Conflict</b>: Resumable upload offset mismatch or incomplete upload / AR requested for a dress that is still processing.
 * <b style="color: #fb8c00;">413 Payload Too Large</b>: Image exceeds the **5MB** limit.
+* <b style="color: #fb8c00;">429 Too Many Requests</b>: Rate limit exceeded on an expensive route (login, signup, upload, AR start); retry after `Retry-After` seconds.
 * <b style="color: #c62828;">500 Internal Server Error</b>: Image processing failure or AR Engine script path error.
+* <b style="color: #c62828;">503 Service Unavailable</b>: AR Engine capacity reached (see `Retry-After`).
 
 ---
 
@@ -76,8 +121,14 @@ This API serves as the backbone for a virtual fitting room application, managing
 ### 2. Garment Management (Dresses)
 * **`POST` /dresses**: 
     - **Description**: Upload New Dress. The core image processing endpoint.
-    - **How it works**: Accepts an image and metadata. It validates size (<5MB), resizes to **512x512**, ensures **Alpha Channel (Transparency)**, and saves to storage.
-* **`GET` /dresses**: 
+    - **How it works**: Accepts an image and metadata, validates size (<5MB) and stores the raw file, then returns **202** with `status: processing`. A background job worker resizes it to **512x512**, ensures **Alpha Channel (Transparency)**, and sets `status` to `ready` (or `failed`). Failed jobs are retried with exponential backoff. Send an `Idempotency-Key` header so a retried request returns the same dress.
+* **`GET` /dresses/{dress_id}**:
+    - **Description**: Dress Details & Processing Status.
+    - **How it works**: Poll until `status` is `ready`, or pass `?wait=<seconds>` (max 30) to wait for processing to finish in a single request.
+* **`POST` /dresses/uploads → `PATCH` /dresses/uploads/{upload_id} → `POST` /dresses/uploads/{upload_id}/finalize**:
+    - **Description**: Resumable Upload. For flaky connections: create an upload (file name, type, size and dress metadata), send raw chunks with an `Upload-Offset` header, then finalize.
+    - **How it works**: Received bytes are staged on disk as they arrive, so an interrupted chunk keeps everything already received. `GET /dresses/uploads/{upload_id}` returns the current offset to resume from; a wrong offset gets **409**. Finalize queues the same resize/PNG job as the single-request upload and returns **202**; repeating it returns the same dress. Abandoned uploads expire after `UPLOAD_EXPIRY_MINUTES`; `DELETE` cancels one.
+* **`GET` /dresses**:
     - **Description**: List User Dresses. Displays the user's personal wardrobe collection.
 * **`DELETE` /dresses/{dress_id}**: 
     - **Description**: Delete Dress. Permanently removes a garment from database and local storage.
@@ -85,36 +136,70 @@ This API serves as the backbone for a virtual fitting room application, managing
 * **`PUT` /dresses/{dress_id}**: 
     - **Description**: Update Dress Metadata. Edits non-image fields like title or gender category.
 
+* **`GET` /storage/dresses/{file}.png**:
+    - **Description**: Garment Image. Serves the stored image in the best format the client accepts.
+    - **How it works**: If the `Accept` header lists `image/avif` or `image/webp`, the AVIF or WebP variant is served from the same URL. Variants are built at upload, or on first request for older images, and cached next to the PNG. Responses carry `Vary: Accept`. The PNG stays the canonical copy used by the AR engine.
+    - **Warm-up**: Image requests and AR session starts are counted in a fixed-size frequency sketch shared by all workers. At startup the images of the `WARMUP_TOP_N` most popular garments are read and their variants built in the background, within `WARMUP_BUDGET_SECONDS`.
+
 ### 3. AR Orchestration
 * **`POST` /ar-session/start**: 
     - **Description**: Start Virtual Try On. The bridge to the AI Engine.
     - **How it works**: Retrieves the dress file path, then triggers the **AI Engine (e.g., mock_ar.py)** as a background **Subprocess**, passing parameters for real-time display.
+    - **Capacity**: When `AR_MAX_CONCURRENT_SESSIONS` is set, the limit applies across all workers; extra requests get **503** with `Retry-After`.
+* **`GET` /ar-session/{session_id}**:
+    - **Description**: AR Session Status. Reports whether the engine process of one of your sessions is still running, regardless of which worker started it.
+* **`GET` /ar-session/{session_id}/artifacts** and **`GET` /ar-session/{session_id}/artifacts/{name}**:
+    - **Description**: Try-On Output. Lists and downloads the files the engine writes (frames, images, video) to the session's output directory.
+    - **How it works**: Files support HTTP `Range` (**206 Partial Content**). While the engine is still running, a request without `Range` streams what exists now and keeps following the file with chunked transfer until the engine exits (`X-Artifact-Complete: false`). Output of finished sessions is removed after `AR_OUTPUT_MAX_AGE_HOURS`, or oldest-first once the total exceeds `AR_OUTPUT_MAX_TOTAL_MB`.
+
+### 4. Administration (Admin role required)
+* **`GET` /admin/profiles**: 
+    - **Description**: List Request Profiles. Requests sent by an admin with a valid `X-Profile-Token` header (or sampled via `PROFILING_SAMPLE_RATE`) are profiled and kept in a bounded on-disk ring buffer.
+    - **How it works**: Each profile can be downloaded as collapsed stacks (`/flamegraph`) or as a cProfile `pstats` file (`/pstats`).
+* **`GET` /admin/export/{users|dresses}**:
+    - **Description**: Bulk Export. Streams the whole table as NDJSON or CSV for analytics; optional on-the-fly gzip.
+    - **How it works**: Rows are read in batches from a server-side cursor (`yield_per`), so memory stays constant. `created_from` (inclusive) and `created_to` (exclusive) select a window for incremental exports.
+* **`GET` /admin/stats/dresses-per-day**, **/admin/stats/uploads-per-user** and **/admin/stats/ar-sessions-per-hour**:
+    - **Description**: Dashboard Statistics. Dresses per gender per day, users with the most uploads, and AR sessions started per hour.
+    - **How it works**: Reads rollup tables that are updated in the same transaction as uploads, edits and deletes (AR session starts are counted right after the engine starts), so the cost depends on the number of buckets, not on table size. **`POST` /admin/stats/rebuild** (or `python -m app.services.stats_service rebuild`) recomputes the dress rollups from the raw tables; AR session counts have no raw table and cannot be rebuilt.
 
 ---
         """,
         version="1.0.0",
         openapi_url=f"{settings.API_V1_STR}/openapi.json",
         docs_url="/docs",
-        redoc_url="/redoc"
+        redoc_url="/redoc",
+        lifespan=lifespan
     )
 
     # ۳. متد Health Check
     @application.get("/", tags=["Health Check"], summary="Check System Status")
     def health_check():
         return {"status": "online", "message": "AR API is operational", "version": "1.0.0"}
+
+    # متریک ها با فرمت متنی Prometheus (زمان مراحل، تأخیر مسیرها، درخواست‌های فعال و فرآیندهای AR)
+    @application.get("/metrics", tags=["Health Check"], summary="Prometheus Metrics", response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    application.add_middleware(QueryAccountingMiddleware)
+    application.add_middleware(ProfilingMiddleware)
+    application.add_middleware(MetricsMiddleware)
     
     # ۴. اتصال روترها
     application.include_router(users.router, prefix=f"{settings.API_V1_STR}/users", tags=["Users"])
     application.include_router(dresses.router, prefix=f"{settings.API_V1_STR}/dresses", tags=["Dresses"])
     application.include_router(ar_session.router, prefix=f"{settings.API_V1_STR}/ar-session", tags=["AR Session"])
+    application.include_router(admin.router, prefix=f"{settings.API_V1_STR}/admin", tags=["Admin"])
 
-    # ۵. اتصال پوشه استاتیک برای نمایش عکس‌ها
+    # ۵. اتصال پوشه استاتیک برای نمایش عکس‌ها (PNG یا WebP/AVIF بر اساس هدر Accept)
     application.mount(
         "/storage/dresses", 
-        StaticFiles(directory=settings.STORAGE_PATH),
+        NegotiatedImageFiles(directory=settings.STORAGE_PATH),
         name="dresses-storage"
     )
     
     return application
 
-app = get_application()
\ No newline at end of file
+with startup_report.phase("build application"):
+    app = get_application()
\ No newline at end of file
@@ -1,7 +1,60 @@
+import argparse
+import io
+import os
 import time
 import sys
 
-print("Starting Virtual Try-On Simulation...")
-# شبیه‌سازی پردازش
-time.sleep(2) 
-print("Virtual Try-On Finished Successfully!")
\ No newline at end of file
+# موتور AR ساختگی: پارامترهای جلسه را می گیرد و در صورت داشتن --output_dir خروجی واقعی می نویسد:
+#   frame_0000.jpg, frame_0001.jpg, ...  فریم‌ها (هر کدام به صورت اتمیک نوشته می شود)
+#   tryon.mjpg                           همان فریم‌ها پشت سر هم (Motion JPEG) که در طول اجرا رشد می کند
+
+def render_frames(dress_path: str, output_dir: str, frames: int, interval: float) -> None:
+    from PIL import Image
+
+    try:
+        dress = Image.open(dress_path).convert("RGBA")
+        dress.thumbnail((256, 256))
+    except (OSError, ValueError):
+        dress = None  # تصویر لباس در دسترس نیست؛ فقط پس‌زمینه رندر می شود
+
+    with open(os.path.join(output_dir, "tryon.mjpg"), "ab") as stream:
+        for index in range(frames):
+            frame = Image.new("RGB", (512, 512), (40 + index * 20 % 200, 60, 90))
+            if dress is not None:
+                frame.paste(dress, (128 + index * 8, 128), dress)
+            buffer = io.BytesIO()
+            frame.save(buffer, "JPEG", quality=85)
+            data = buffer.getvalue()
+
+            # فایل موقت مخفی و سپس rename تا API فریم نیمه‌کاره منتشر نکند
+            name = f"frame_{index:04d}.jpg"
+            temp_path = os.path.join(output_dir, f".{name}.tmp")
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, os.path.join(output_dir, name))
+
+            stream.write(data)
+            stream.flush()
+            time.sleep(interval)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock AR engine")
+    parser.add_argument("--dress_path", default="")
+    parser.add_argument("--gender", default="")
+    parser.add_argument("--session_id", default="")
+    parser.add_argument("--output_dir")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--frame_interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print("Starting Virtual Try-On Simulation...")
+    sys.stdout.flush()
+    # شبیه‌سازی پردازش
+    if args.output_dir:
+        render_frames(args.dress_path, args.output_dir, args.frames, args.frame_interval)
+    else:
+        time.sleep(2)
+    print("Virtual Try-On Finished Successfully!")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+import re
 import pytest
 from typing import Generator
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
+import threading
 import uuid
 
 # --- رفع مشکل Python Path: تنظیم Path قبل از تمام import ها ---
@@ -19,6 +21,8 @@ from main import app
 from app.db.base import Base
 from app.models.user import User
 from app.models.dress import Dress 
+from app.models.job import Job
+from app.models.stats import DressDailyStat, UserDressStat, ARSessionHourlyStat
 from app.core.security import get_password_hash 
 from app.api.deps import get_db
 
@@ -30,6 +34,49 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+@pytest.fixture(scope="session", autouse=True)
+def isolated_shared_state(tmp_path_factory):
+    """وضعیت مشترک بین worker ها برای تست‌ها در یک فایل موقت نگهداری می شود."""
+    from app.core.config import settings
+    original = settings.SHARED_STATE_PATH
+    settings.SHARED_STATE_PATH = str(tmp_path_factory.mktemp("shared_state") / "shared_state.db")
+    yield
+    # Thread های پس‌زمینه (خواندن پیام‌ها و مراقب موتورهای AR باقی‌مانده) متوقف می شوند
+    # تا بعد از بازگرداندن مسیر در فایل واقعی storage/shared_state.db ننویسند
+    from app.core.shared_state import shared_state
+    from app.services.ar_orchestrator import ar_orchestrator
+    shared_state.stop_subscriber()
+    for process in list(ar_orchestrator._processes.values()):
+        process.terminate()
+    for thread in threading.enumerate():
+        if thread.name.startswith("ar-reaper-"):
+            thread.join(timeout=5)
+    settings.SHARED_STATE_PATH = original
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_ar_output(tmp_path_factory):
+    """خروجی جلسات AR در تست‌ها در یک پوشه موقت نوشته می شود."""
+    from app.core.config import settings
+    original = settings.AR_OUTPUT_PATH
+    settings.AR_OUTPUT_PATH = str(tmp_path_factory.mktemp("ar_sessions"))
+    yield
+    settings.AR_OUTPUT_PATH = original
+
+@pytest.fixture(scope="session", autouse=True)
+def inline_jobs():
+    """worker های صف کارها در تست‌ها راه‌اندازی نمی شوند؛ کارها با fixture run_jobs همان لحظه اجرا می شوند."""
+    from app.core.config import settings
+    original = settings.JOB_WORKERS
+    settings.JOB_WORKERS = 0
+    yield
+    settings.JOB_WORKERS = original
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """هر تست با Bucket های پر شروع می شود."""
+    from app.core.rate_limit import rate_limiter
+    rate_limiter.memory_storage.clear()
+
 @pytest.fixture(scope="session", autouse=True)
 def setup_db():
     """ایجاد و حذف جداول دیتابیس برای هر جلسه تست."""
@@ -60,6 +107,15 @@ def db_session() -> Generator[Session, None, None]:
     app.dependency_overrides = {}
 
 
+@pytest.fixture
+def run_jobs(db_session: Session):
+    """اجرای کارهای آماده صف با Session تست؛ تعداد کارهای اجرا شده را برمی گرداند."""
+    from app.services.job_queue import job_queue
+
+    def run() -> int:
+        return job_queue.run_pending(db_session)
+    return run
+
 @pytest.fixture(scope="function")
 def client(db_session: Session) -> TestClient:
     """ایجاد کلاینت تست FastAPI."""
@@ -87,4 +143,45 @@ def admin_auth_headers(test_admin_user: User) -> dict:
     """ایجاد هدرهای احراز هویت معتبر برای کاربر ادمین."""
     from app.core.security import create_access_token
     token = create_access_token(subject=str(test_admin_user.id))
-    return {"Authorization": f"Bearer {token}"}
\ No newline at end of file
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def test_user(db_session: Session) -> User:
+    """ساخت یک کاربر عادی برای تست."""
+    user = User(
+        id=uuid.uuid4(),
+        email="user@test.com",
+        password_hash=get_password_hash("userpass"),
+        role="user"
+    )
+    db_session.add(user)
+    db_session.commit()
+    db_session.refresh(user)
+    return user
+
+@pytest.fixture
+def user_auth_headers(test_user: User) -> dict:
+    """ایجاد هدرهای احراز هویت معتبر برای کاربر عادی."""
+    from app.core.security import create_access_token
+    token = create_access_token(subject=str(test_user.id))
+    return {"Authorization": f"Bearer {token}"}
+
+# ------------------- بودجه کوئری‌ها -------------------
+
+def _query_count(response) -> int:
+    """تعداد کوئری‌های SQL یک درخواست را از هدر Server-Timing می خواند."""
+    match = re.search(r'desc="(\d+) queries"', response.headers.get("server-timing", ""))
+    assert match, "Server-Timing header with a db entry is missing"
+    return int(match.group(1))
+
+@pytest.fixture
+def assert_query_budget():
+    """
+    بررسی بودجه کوئری یک پاسخ: اگر درخواست بیش از max_queries کوئری اجرا کرده باشد
+    تست شکست می خورد. تعداد کوئری‌های استفاده شده برگردانده می شود.
+    """
+    def check(response, max_queries: int) -> int:
+        used = _query_count(response)
+        assert used <= max_queries, f"{response.request.method} {response.request.url.path} issued {used} queries (budget {max_queries})"
+        return used
+    return check
@@ -0,0 +1,177 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+
+# تست های API مدیریت (ادمین)
+
+@pytest.fixture
+def profiling_enabled(tmp_path, monkeypatch):
+    """فعال سازی پروفایل با هدر و پوشه ذخیره‌سازی موقت."""
+    monkeypatch.setattr(settings, "PROFILING_HEADER_TOKEN", "profile-secret")
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(settings, "PROFILING_MAX_PROFILES", 2)
+
+def test_profiled_request_is_listed_for_admin(client: TestClient, admin_auth_headers: dict, profiling_enabled):
+    """تست پروفایل یک درخواست با هدر و دریافت آن از endpoint ادمین."""
+    response = client.get("/api/v1/users/profile", headers={**admin_auth_headers, "X-Profile-Token": "profile-secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+
+    profiles = client.get("/api/v1/admin/profiles", headers=admin_auth_headers).json()
+    assert [profile["id"] for profile in profiles] == [profile_id]
+    assert profiles[0]["path"] == "/api/v1/users/profile"
+
+    pstats_response = client.get(f"/api/v1/admin/profiles/{profile_id}/pstats", headers=admin_auth_headers)
+    assert pstats_response.status_code == 200
+    assert client.get(f"/api/v1/admin/profiles/{profile_id}/flamegraph", headers=admin_auth_headers).status_code == 200
+
+def test_profiles_ring_buffer_and_wrong_token(client: TestClient, admin_auth_headers: dict, profiling_enabled):
+    """تست محدودیت تعداد پروفایل‌ها و نادیده گرفتن توکن اشتباه."""
+    wrong = client.get("/api/v1/users/profile", headers={**admin_auth_headers, "X-Profile-Token": "nope"})
+    assert "X-Profile-Id" not in wrong.headers
+
+    for _ in range(3):
+        client.get("/api/v1/users/profile", headers={**admin_auth_headers, "X-Profile-Token": "profile-secret"})
+    assert len(client.get("/api/v1/admin/profiles", headers=admin_auth_headers).json()) == 2
+
+def test_header_profiling_requires_admin(client: TestClient, user_auth_headers: dict, admin_auth_headers: dict, profiling_enabled):
+    """داشتن راز X-Profile-Token بدون توکن ادمین درخواست را پروفایل نمی کند."""
+    response = client.get("/api/v1/users/profile", headers={**user_auth_headers, "X-Profile-Token": "profile-secret"})
+    assert response.status_code == 200
+    assert "X-Profile-Id" not in response.headers
+    assert client.get("/api/v1/admin/profiles", headers=admin_auth_headers).json() == []
+
+def test_concurrent_profile_falls_back_to_sampler(client: TestClient, admin_auth_headers: dict, profiling_enabled):
+    """وقتی cProfile در اختیار درخواست دیگری است، پروفایل فقط با نمونه‌بردار پشته گرفته می شود."""
+    from app.core import profiling
+
+    with profiling._cprofile_lock:
+        response = client.get("/api/v1/users/profile", headers={**admin_auth_headers, "X-Profile-Token": "profile-secret"})
+    assert response.status_code == 200
+    profile_id = response.headers["X-Profile-Id"]
+    assert client.get("/api/v1/admin/profiles", headers=admin_auth_headers).json()[0]["cprofile"] is False
+    assert client.get(f"/api/v1/admin/profiles/{profile_id}/flamegraph", headers=admin_auth_headers).status_code == 200
+    assert client.get(f"/api/v1/admin/profiles/{profile_id}/pstats", headers=admin_auth_headers).status_code == 404
+
+def test_profiles_require_admin(client: TestClient, user_auth_headers: dict):
+    """کاربر عادی به پروفایل‌ها دسترسی ندارد."""
+    assert client.get("/api/v1/admin/profiles", headers=user_auth_headers).status_code == 403
+
+# ------------------- خروجی حجیم -------------------
+
+@pytest.fixture
+def export_data(db_session, test_user, test_admin_user, monkeypatch):
+    """پنج لباس با زمان ایجاد مشخص؛ دسته‌های دو تایی تا خروجی از چند دسته ساخته شود."""
+    from datetime import datetime, timedelta
+    from app.models.dress import Dress
+
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    start = datetime(2024, 1, 1)
+    for i in range(5):
+        db_session.add(Dress(
+            user_id=test_user.id, file_path=f"storage/dresses/{i}.png", gender="female",
+            title=f"Dress {i}", created_at=start + timedelta(days=i),
+        ))
+    db_session.commit()
+    return start
+
+def test_export_dresses_ndjson_with_range(client: TestClient, admin_auth_headers: dict, export_data):
+    """تست خروجی NDJSON به ترتیب created_at و فیلتر بازه نیمه‌باز."""
+    import json
+
+    response = client.get("/api/v1/admin/export/dresses", headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"Dress {i}" for i in range(5)]
+
+    window = client.get(
+        "/api/v1/admin/export/dresses",
+        params={"created_from": "2024-01-02T00:00:00", "created_to": "2024-01-04T00:00:00"},
+        headers=admin_auth_headers,
+    )
+    assert [json.loads(line)["title"] for line in window.text.splitlines()] == ["Dress 1", "Dress 2"]
+
+def test_export_users_csv_gzip(client: TestClient, admin_auth_headers: dict, export_data):
+    """تست خروجی CSV فشرده بدون ستون password_hash."""
+    import csv
+    import gzip
+    import io
+
+    response = client.get("/api/v1/admin/export/users", params={"format": "csv", "gzip": True}, headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="users.csv.gz"' in response.headers["content-disposition"]
+
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.content).decode("utf-8"))))
+    assert {row["email"] for row in rows} == {"user@test.com", "admin@test.com"}
+    assert "password_hash" not in rows[0]
+
+def test_export_requires_admin(client: TestClient, user_auth_headers: dict):
+    assert client.get("/api/v1/admin/export/users", headers=user_auth_headers).status_code == 403
+
+# ------------------- آمار تجمیعی -------------------
+
+@pytest.fixture
+def stats_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "dresses"))
+    monkeypatch.setattr(settings, "RAW_UPLOAD_PATH", str(tmp_path / "raw"))
+
+def test_dress_stats_follow_uploads_edits_and_deletes(
+    client: TestClient, admin_auth_headers: dict, user_auth_headers: dict, test_user, stats_storage, run_jobs
+):
+    """آمار روزانه و کاربران با آپلود، تغییر جنسیت، حذف لباس و حذف حساب بروز می شود و با بازسازی یکسان است."""
+    import io
+    from datetime import datetime
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), "red").save(buffer, "PNG")
+    ids = []
+    for gender in ("female", "female", "male"):
+        response = client.post(
+            "/api/v1/dresses/", headers=user_auth_headers,
+            files={"file": ("dress.png", buffer.getvalue(), "image/png")}, data={"gender": gender},
+        )
+        ids.append(response.json()["id"])
+    client.put(f"/api/v1/dresses/{ids[0]}", headers=user_auth_headers, json={"gender": "male"})
+    client.delete(f"/api/v1/dresses/{ids[2]}", headers=user_auth_headers)
+
+    today = datetime.utcnow().date().isoformat()
+    expected_days = [
+        {"day": today, "gender": "female", "dress_count": 1},
+        {"day": today, "gender": "male", "dress_count": 1},
+    ]
+    per_day = client.get("/api/v1/admin/stats/dresses-per-day", headers=admin_auth_headers)
+    assert per_day.json() == expected_days
+    per_user = client.get("/api/v1/admin/stats/uploads-per-user", headers=admin_auth_headers)
+    assert per_user.json() == [{"user_id": str(test_user.id), "dress_count": 2}]
+
+    rebuilt = client.post("/api/v1/admin/stats/rebuild", headers=admin_auth_headers)
+    assert rebuilt.json() == {"dress_daily_buckets": 2, "user_buckets": 1}
+    assert client.get("/api/v1/admin/stats/dresses-per-day", headers=admin_auth_headers).json() == expected_days
+
+    client.delete("/api/v1/users/me", headers=user_auth_headers)
+    run_jobs()
+    assert client.get("/api/v1/admin/stats/dresses-per-day", headers=admin_auth_headers).json() == []
+    assert client.get("/api/v1/admin/stats/uploads-per-user", headers=admin_auth_headers).json() == []
+
+def test_ar_sessions_per_hour(client: TestClient, db_session, admin_auth_headers: dict):
+    from datetime import datetime
+    from app.services.stats_service import stats_service
+
+    for started_at in (datetime(2024, 1, 1, 10, 5), datetime(2024, 1, 1, 10, 55), datetime(2024, 1, 1, 11, 0)):
+        stats_service.ar_session_started(db_session, started_at)
+    db_session.commit()
+
+    response = client.get(
+        "/api/v1/admin/stats/ar-sessions-per-hour",
+        params={"start": "2024-01-01T10:00:00", "end": "2024-01-01T11:00:00"},
+        headers=admin_auth_headers,
+    )
+    assert response.json() == [{"hour": "2024-01-01T10:00:00", "session_count": 2}]
+
+def test_stats_require_admin(client: TestClient, user_auth_headers: dict):
+    assert client.get("/api/v1/admin/stats/dresses-per-day", headers=user_auth_headers).status_code == 403
+    assert client.post("/api/v1/admin/stats/rebuild", headers=user_auth_headers).status_code == 403
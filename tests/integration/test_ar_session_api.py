@@ -0,0 +1,124 @@
+import time
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.dress import Dress
+from app.models.user import User
+from app.services.ar_orchestrator import ar_orchestrator
+
+# تست های API جلسات پرو مجازی
+
+def _make_dress(db_session: Session, user: User) -> str:
+    dress = Dress(user_id=user.id, file_path="storage/dresses/a.png", gender="male", title="Shirt")
+    db_session.add(dress)
+    db_session.commit()
+    return str(dress.id)
+
+def _stop_local_processes() -> None:
+    for process in list(ar_orchestrator._processes.values()):
+        process.kill()
+        process.wait()
+    ar_orchestrator.active_session_count()
+
+def test_api_ar_session_status_is_tracked(client: TestClient, db_session: Session, test_user: User, user_auth_headers: dict):
+    """وضعیت جلسه از وضعیت مشترک خوانده می شود و فقط برای مالک آن قابل مشاهده است."""
+    dress_id = _make_dress(db_session, test_user)
+    response = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": dress_id})
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+
+    try:
+        response = client.get(f"/api/v1/ar-session/{session_id}", headers=user_auth_headers)
+        assert response.status_code == 200
+        assert response.json()["status"] == "running"
+    finally:
+        _stop_local_processes()
+
+    response = client.get(f"/api/v1/ar-session/{session_id}", headers=user_auth_headers)
+    assert response.json()["status"] == "finished"
+
+def test_api_ar_session_capacity_limit(client: TestClient, db_session: Session, test_user: User, user_auth_headers: dict, monkeypatch):
+    """با رسیدن به سقف AR_MAX_CONCURRENT_SESSIONS پاسخ 503 همراه با Retry-After برگردانده می شود."""
+    monkeypatch.setattr(settings, "AR_MAX_CONCURRENT_SESSIONS", 1)
+    dress_id = _make_dress(db_session, test_user)
+
+    try:
+        first = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": dress_id})
+        assert first.status_code == 200
+        second = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": dress_id})
+        assert second.status_code == 503
+        assert "retry-after" in second.headers
+    finally:
+        _stop_local_processes()
+
+    third = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": dress_id})
+    assert third.status_code == 200
+    _stop_local_processes()
+
+def test_api_ar_session_bookkeeping_failure_keeps_slot(client: TestClient, db_session: Session, test_user: User, user_auth_headers: dict, monkeypatch):
+    """خطای ثبت آمار بعد از اجرای موتور پاسخ را خراب نمی کند و جلسه همچنان در سقف جلسات حساب می شود."""
+    from app.services.access_tracker import access_tracker
+
+    def broken_record(*args, **kwargs):
+        raise RuntimeError("sketch unavailable")
+
+    monkeypatch.setattr(access_tracker, "record", broken_record)
+    monkeypatch.setattr(settings, "AR_MAX_CONCURRENT_SESSIONS", 1)
+    dress_id = _make_dress(db_session, test_user)
+
+    try:
+        first = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": dress_id})
+        assert first.status_code == 200
+        second = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": dress_id})
+        assert second.status_code == 503
+    finally:
+        _stop_local_processes()
+
+def test_api_ar_session_requires_processed_dress(client: TestClient, db_session: Session, test_user: User, user_auth_headers: dict):
+    """لباسی که تصویرش هنوز در صف پردازش است برای AR قابل استفاده نیست (409)."""
+    dress = Dress(user_id=test_user.id, file_path="storage/dresses/b.png", gender="male", status="processing")
+    db_session.add(dress)
+    db_session.commit()
+
+    response = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": str(dress.id)})
+    assert response.status_code == 409
+
+def test_api_ar_session_artifacts(client: TestClient, db_session: Session, test_user: User, user_auth_headers: dict):
+    """خروجی موتور در پوشه جلسه نوشته و با پشتیبانی از Range و Stream همزمان با نوشتن سرو می شود."""
+    dress_id = _make_dress(db_session, test_user)
+    session_id = client.post("/api/v1/ar-session/start", headers=user_auth_headers, json={"dress_id": dress_id}).json()["session_id"]
+    url = f"/api/v1/ar-session/{session_id}/artifacts"
+
+    try:
+        # کلاینت فهرست را تا ظاهر شدن اولین خروجی دنبال می کند
+        deadline = time.monotonic() + 15
+        while not client.get(url, headers=user_auth_headers).json()["artifacts"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        # درخواست بدون Range در حین اجرا، فایل در حال رشد را تا پایان کار موتور دنبال می کند
+        followed = client.get(f"{url}/tryon.mjpg", headers=user_auth_headers)
+        assert followed.status_code == 200
+        assert followed.headers["x-artifact-complete"] == "false"
+        assert "content-length" not in followed.headers
+    finally:
+        process = ar_orchestrator._processes.get(session_id)
+        if process:
+            process.wait(timeout=30)
+
+    listing = client.get(url, headers=user_auth_headers).json()
+    assert listing["complete"] is True
+    names = [artifact["name"] for artifact in listing["artifacts"]]
+    assert names == [f"frame_{i:04d}.jpg" for i in range(10)] + ["tryon.mjpg"]
+    assert listing["artifacts"][-1]["size"] == len(followed.content)
+    assert followed.content[:2] == b"\xff\xd8"  # شروع JPEG
+
+    partial = client.get(f"{url}/frame_0003.jpg", headers={**user_auth_headers, "Range": "bytes=0-99"})
+    assert partial.status_code == 206
+    assert partial.headers["content-range"].startswith("bytes 0-99/")
+    assert len(partial.content) == 100
+    assert partial.headers["content-type"] == "image/jpeg"
+
+    assert client.get(f"{url}/.engine.log", headers=user_auth_headers).status_code == 404
+    assert client.get(f"{url}/..%2F..%2Fshared_state.db", headers=user_auth_headers).status_code == 404
+    ar_orchestrator.active_session_count()
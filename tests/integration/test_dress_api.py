@@ -0,0 +1,265 @@
+import io
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy.orm import Session
+
+from app.models.dress import Dress
+from app.models.user import User
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+from app.services import image_variants
+
+# تست های API برای مدیریت لباس ها
+
+@pytest.fixture
+def storage_dir(tmp_path, monkeypatch):
+    """پوشه ذخیره‌سازی موقت برای فایل‌های آپلود شده."""
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(tmp_path / "dresses"))
+    monkeypatch.setattr(settings, "RAW_UPLOAD_PATH", str(tmp_path / "raw"))
+    return tmp_path / "dresses"
+
+@pytest.fixture
+def staging_dir(tmp_path, monkeypatch):
+    """پوشه موقت برای داده‌های آپلودهای تکه‌ای."""
+    monkeypatch.setattr(settings, "UPLOAD_STAGING_PATH", str(tmp_path / "uploads"))
+    return tmp_path / "uploads"
+
+def make_image_bytes(size=(800, 600), mode="RGB", fmt="JPEG") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 30, 60)).save(buffer, fmt)
+    return buffer.getvalue()
+
+def test_api_upload_dress(client: TestClient, user_auth_headers: dict, storage_dir, run_jobs):
+    """تست آپلود، ریسایز و تبدیل تصویر به PNG در صف کارها."""
+    before = STAGE_SECONDS.count(stage="upload.resize")
+    response = client.post(
+        "/api/v1/dresses/",
+        headers=user_auth_headers,
+        files={"file": ("shirt.jpg", make_image_bytes(), "image/jpeg")},
+        data={"gender": "male", "title": "Shirt"},
+    )
+    assert response.status_code == 202
+    data = response.json()
+    assert data["status"] == "processing"
+    assert data["file_path"].endswith(".png")
+    assert (data["width"], data["height"]) == (512, 512)
+    assert response.headers["Location"].endswith(f"/api/v1/dresses/{data['id']}")
+    assert not storage_dir.exists()
+
+    # تصویر فقط بعد از اجرای کار صف پردازش می شود
+    assert run_jobs() == 1
+    detail = client.get(f"/api/v1/dresses/{data['id']}", headers=user_auth_headers)
+    assert detail.json()["status"] == "ready"
+    assert list((storage_dir.parent / "raw").iterdir()) == []
+
+    stored = list(storage_dir.glob("*.png"))
+    assert len(stored) == 1
+    with Image.open(stored[0]) as img:
+        assert img.size == (512, 512)
+        assert img.mode == "RGBA"
+    # نسخه‌های WebP/AVIF هنگام آپلود کنار PNG ساخته می شوند
+    # AVIF فقط وقتی ساخته می شود که Pillow نصب شده encoder آن را داشته باشد
+    expected = {".png", *(variant.extension for variant in image_variants.enabled_formats())}
+    assert {path.suffix for path in storage_dir.iterdir()} == expected
+    assert STAGE_SECONDS.count(stage="upload.resize") == before + 1
+
+def test_read_dress_wait_returns_status_after_timeout(client: TestClient, user_auth_headers: dict, storage_dir, run_jobs):
+    """Long Polling روی لباس در حال پردازش بعد از مهلت همان وضعیت را برمی گرداند و بعد از پردازش بلافاصله ready."""
+    created = client.post(
+        "/api/v1/dresses/",
+        headers=user_auth_headers,
+        files={"file": ("shirt.jpg", make_image_bytes(), "image/jpeg")},
+        data={"gender": "male"},
+    ).json()
+    url = f"/api/v1/dresses/{created['id']}"
+    pending = client.get(url, headers=user_auth_headers, params={"wait": 0.2})
+    assert pending.status_code == 200
+    assert pending.json()["status"] == "processing"
+
+    run_jobs()
+    assert client.get(url, headers=user_auth_headers, params={"wait": 5}).json()["status"] == "ready"
+
+def test_api_upload_dress_idempotency_and_invalid_image(client: TestClient, user_auth_headers: dict, storage_dir, run_jobs):
+    """تکرار آپلود با همان Idempotency-Key لباس تازه نمی سازد؛ فایل غیر تصویری همان لحظه رد می شود."""
+    headers = {**user_auth_headers, "Idempotency-Key": "upload-1"}
+    files = {"file": ("shirt.jpg", make_image_bytes(), "image/jpeg")}
+    first = client.post("/api/v1/dresses/", headers=headers, files=files, data={"gender": "male"})
+    retry = client.post("/api/v1/dresses/", headers=headers, files=files, data={"gender": "male"})
+    assert retry.status_code == 202
+    assert retry.json()["id"] == first.json()["id"]
+    assert run_jobs() == 1
+    assert len(client.get("/api/v1/dresses/", headers=user_auth_headers).json()) == 1
+
+    invalid = client.post(
+        "/api/v1/dresses/",
+        headers=user_auth_headers,
+        files={"file": ("shirt.png", b"not an image", "image/png")},
+        data={"gender": "male"},
+    )
+    assert invalid.status_code == 400
+    assert list((storage_dir.parent / "raw").iterdir()) == []
+
+def test_api_resumable_upload(client: TestClient, user_auth_headers: dict, storage_dir, staging_dir, run_jobs):
+    """تست آپلود تکه‌ای: ساخت، ارسال تکه‌ها، offset نادرست، ادامه و نهایی کردن."""
+    image = make_image_bytes(size=(1200, 900))
+    created = client.post(
+        "/api/v1/dresses/uploads",
+        headers=user_auth_headers,
+        json={"filename": "coat.jpg", "content_type": "image/jpeg", "length": len(image), "gender": "female", "title": "Coat"},
+    )
+    assert created.status_code == 201
+    upload_id = created.json()["upload_id"]
+    assert created.headers["Location"].endswith(f"/api/v1/dresses/uploads/{upload_id}")
+    url = f"/api/v1/dresses/uploads/{upload_id}"
+
+    half = len(image) // 2
+    first = client.patch(url, headers={**user_auth_headers, "Upload-Offset": "0"}, content=image[:half])
+    assert first.status_code == 200
+    assert first.json()["offset"] == half
+
+    # ارسال دوباره از offset قدیمی (مثلاً بعد از قطع اتصال) با 409 و offset فعلی رد می شود
+    stale = client.patch(url, headers={**user_auth_headers, "Upload-Offset": "0"}, content=image[:half])
+    assert stale.status_code == 409
+    assert stale.headers["Upload-Offset"] == str(half)
+
+    # نهایی کردن آپلود ناقص مجاز نیست
+    assert client.post(f"{url}/finalize", headers=user_auth_headers).status_code == 409
+
+    status_response = client.get(url, headers=user_auth_headers)
+    assert status_response.json()["offset"] == half
+    rest = client.patch(url, headers={**user_auth_headers, "Upload-Offset": str(half)}, content=image[half:])
+    assert rest.json()["offset"] == len(image)
+
+    finalized = client.post(f"{url}/finalize", headers=user_auth_headers)
+    assert finalized.status_code == 202
+    assert finalized.json()["title"] == "Coat"
+    assert finalized.json()["status"] == "processing"
+    assert list(staging_dir.iterdir()) == []
+    assert client.get(url, headers=user_auth_headers).status_code == 404
+    # تکرار finalize (مثلاً بعد از قطع اتصال) همان لباس را برمی گرداند
+    assert client.post(f"{url}/finalize", headers=user_auth_headers).json()["id"] == finalized.json()["id"]
+
+    assert run_jobs() == 1
+    assert len(list(storage_dir.glob("*.png"))) == 1
+
+def test_api_resumable_upload_limits(client: TestClient, user_auth_headers: dict, staging_dir, monkeypatch):
+    """تست رد شدن حجم بیش از حد، داده اضافه بر حجم اعلام شده و پاک شدن آپلودهای منقضی."""
+    too_large = client.post(
+        "/api/v1/dresses/uploads",
+        headers=user_auth_headers,
+        json={"filename": "big.png", "content_type": "image/png", "length": 6 * 1024 * 1024, "gender": "male"},
+    )
+    assert too_large.status_code == 413
+
+    created = client.post(
+        "/api/v1/dresses/uploads",
+        headers=user_auth_headers,
+        json={"filename": "shirt.png", "content_type": "image/png", "length": 10, "gender": "male"},
+    )
+    url = f"/api/v1/dresses/uploads/{created.json()['upload_id']}"
+    overflow = client.patch(url, headers={**user_auth_headers, "Upload-Offset": "0"}, content=b"x" * 11)
+    assert overflow.status_code == 413
+
+    # آپلودی که منقضی شده با ایجاد آپلود بعدی از دیسک پاک می شود
+    body = {"filename": "shirt.png", "content_type": "image/png", "length": 10, "gender": "male"}
+    monkeypatch.setattr(settings, "UPLOAD_EXPIRY_MINUTES", -1)
+    expired_id = client.post("/api/v1/dresses/uploads", headers=user_auth_headers, json=body).json()["upload_id"]
+    monkeypatch.setattr(settings, "UPLOAD_EXPIRY_MINUTES", 60)
+    client.post("/api/v1/dresses/uploads", headers=user_auth_headers, json=body)
+    assert not any(path.name.startswith(expired_id) for path in staging_dir.iterdir())
+    assert client.get(f"/api/v1/dresses/uploads/{expired_id}", headers=user_auth_headers).status_code == 404
+
+@pytest.fixture
+def image_client(tmp_path, monkeypatch):
+    """کلاینت سرو تصاویر روی یک پوشه موقت (فقط WebP فعال، ساخت نسخه در اولین درخواست)."""
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from app.api.static_files import NegotiatedImageFiles
+
+    monkeypatch.setattr(settings, "IMAGE_VARIANT_FORMATS", ["webp"])
+    Image.new("RGBA", (64, 64), (10, 200, 30, 128)).save(tmp_path / "shirt.png")
+    app = Starlette(routes=[Mount("/storage/dresses", NegotiatedImageFiles(directory=str(tmp_path)))])
+    with TestClient(app) as c:
+        yield c, tmp_path
+
+def test_image_format_negotiation(image_client):
+    """تست انتخاب WebP بر اساس Accept، ساخت و کش نسخه کنار PNG و هدر Vary."""
+    client, directory = image_client
+    url = "/storage/dresses/shirt.png"
+
+    plain = client.get(url, headers={"Accept": "image/*,*/*;q=0.8"})
+    assert plain.headers["content-type"] == "image/png"
+    assert plain.headers["vary"] == "Accept"
+    assert not (directory / "shirt.webp").exists()
+
+    webp = client.get(url, headers={"Accept": "image/avif,image/webp,image/*,*/*;q=0.8"})
+    assert webp.status_code == 200
+    assert webp.headers["content-type"] == "image/webp"
+    assert webp.headers["vary"] == "Accept"
+    assert (directory / "shirt.webp").exists()
+    with Image.open(io.BytesIO(webp.content)) as img:
+        assert img.format == "WEBP"
+        assert img.getpixel((0, 0)) == (10, 200, 30, 128)  # بدون اتلاف، همراه با آلفا
+
+    # ETag هر نسخه جداست و درخواست شرطی همان نسخه 304 می گیرد
+    assert webp.headers["etag"] != plain.headers["etag"]
+    cached = client.get(url, headers={"Accept": "image/webp", "If-None-Match": webp.headers["etag"]})
+    assert cached.status_code == 304
+    assert cached.headers["vary"] == "Accept"
+
+    refused = client.get(url, headers={"Accept": "image/webp;q=0, image/png"})
+    assert refused.headers["content-type"] == "image/png"
+
+def test_api_list_dresses(client: TestClient, db_session: Session, test_user: User, user_auth_headers: dict):
+    """تست لیست لباس‌ها با فیلتر جنسیت."""
+    db_session.add_all([
+        Dress(user_id=test_user.id, file_path="storage/dresses/a.png", gender="male", title="Shirt"),
+        Dress(user_id=test_user.id, file_path="storage/dresses/b.png", gender="female", title="Skirt"),
+    ])
+    db_session.commit()
+
+    response = client.get("/api/v1/dresses/", headers=user_auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 2
+    assert {"id", "user_id", "file_path", "gender", "title", "width", "height", "created_at"} <= data[0].keys()
+    assert data[0]["user_id"] == str(test_user.id)
+
+    response = client.get("/api/v1/dresses/", params={"gender": "female"}, headers=user_auth_headers)
+    assert [dress["title"] for dress in response.json()] == ["Skirt"]
+
+def test_api_list_dresses_conditional_get(client: TestClient, db_session: Session, test_user: User, user_auth_headers: dict):
+    """تست ETag و پاسخ 304 برای لیست لباس‌ها."""
+    dress = Dress(user_id=test_user.id, file_path="storage/dresses/c.png", gender="male", title="Coat")
+    db_session.add(dress)
+    db_session.commit()
+    dress_id = dress.id
+
+    first = client.get("/api/v1/dresses/", headers=user_auth_headers)
+    etag = first.headers["ETag"]
+    assert etag.startswith('W/"')
+
+    cached = client.get("/api/v1/dresses/", headers={**user_auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    # هر نوشتن از طریق سرویس باید ETag را عوض کند
+    client.put(f"/api/v1/dresses/{dress_id}", json={"title": "Long Coat", "gender": "male"}, headers=user_auth_headers)
+    changed = client.get("/api/v1/dresses/", headers={**user_auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["title"] == "Long Coat"
+
+def test_metrics_endpoint_reports_stages_and_routes(client: TestClient, user_auth_headers: dict):
+    """تست خروجی Prometheus شامل زمان مراحل و تأخیر مسیرها."""
+    client.get("/api/v1/dresses/", headers=user_auth_headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'app_stage_duration_seconds_count{stage="security.jwt_decode"}' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/v1/dresses/",status="200"}' in body
+    assert "http_requests_in_flight" in body
+    assert "ar_engine_processes_running 0" in body
@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.models.dress import Dress
+from app.models.user import User
+
+# بودجه کوئری‌های هر endpoint؛ افزایش آن (مثلاً lazy-load ناخواسته User.dresses) باید آگاهانه باشد
+
+@pytest.fixture
+def wardrobe(db_session: Session, test_user: User) -> None:
+    db_session.add_all(
+        Dress(user_id=test_user.id, file_path=f"storage/dresses/{i}.png", gender="female", title=f"Dress {i}")
+        for i in range(20)
+    )
+    db_session.commit()
+
+def test_profile_query_budget(client: TestClient, user_auth_headers: dict, wardrobe, assert_query_budget):
+    response = client.get("/api/v1/users/profile", headers=user_auth_headers)
+    assert response.status_code == 200
+    assert_query_budget(response, 2)  # کاربر فعلی + شمارش لباس‌ها
+
+def test_list_dresses_query_budget_is_constant(client: TestClient, user_auth_headers: dict, wardrobe, assert_query_budget):
+    response = client.get("/api/v1/dresses/", headers=user_auth_headers)
+    assert len(response.json()) == 20
+    full = assert_query_budget(response, 3)  # کاربر فعلی + ETag + لیست
+
+    cached = client.get("/api/v1/dresses/", headers={**user_auth_headers, "If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert assert_query_budget(cached, 2) < full
+
+def test_server_timing_header(client: TestClient, assert_query_budget):
+    response = client.get("/")
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert_query_budget(response, 0)
+
+def test_streaming_response_has_no_server_timing(client: TestClient, admin_auth_headers: dict):
+    """کوئری‌های پاسخ Stream شده بعد از ارسال هدرها اجرا می شوند؛ عدد ناقص گزارش نمی شود."""
+    response = client.get("/api/v1/admin/export/users", headers=admin_auth_headers)
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
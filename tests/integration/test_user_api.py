@@ -1,3 +1,4 @@
+import uuid
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
@@ -16,6 +17,23 @@ def test_api_signup_success(client: TestClient):
     assert "password_hash" not in data
     assert data["role"] == "user"
 
+def test_api_login_rate_limited(client: TestClient, monkeypatch):
+    """بعد از اتمام بودجه login برای یک IP پاسخ 429 با Retry-After برگردانده می شود."""
+    from app.core.config import settings
+    from app.core.rate_limit import RATE_LIMIT_DECISIONS
+
+    monkeypatch.setitem(settings.RATE_LIMITS, "login", "2/minute")
+    before = RATE_LIMIT_DECISIONS.get(limit="login", decision="limited")
+    form = {"username": "nobody@test.com", "password": "wrongpass"}
+
+    assert client.post("/api/v1/users/login", data=form).status_code == 400
+    assert client.post("/api/v1/users/login", data=form).status_code == 400
+    limited = client.post("/api/v1/users/login", data=form)
+    assert limited.status_code == 429
+    assert 1 <= int(limited.headers["Retry-After"]) <= 30
+    assert RATE_LIMIT_DECISIONS.get(limit="login", decision="limited") == before + 1
+    assert 'rate_limit_decisions_total{limit="login",decision="limited"}' in client.get("/metrics").text
+
 def test_api_login_and_get_profile(client: TestClient):
     """تست ورود و مشاهده پروفایل."""
     # ۱. ثبت نام
@@ -36,4 +54,49 @@ def test_api_login_and_get_profile(client: TestClient):
     assert profile_response.status_code == 200
     profile_data = profile_response.json()
     assert profile_data["email"] == "login@test.com"
-    assert "uploaded_dress_count" in profile_data
\ No newline at end of file
+    assert "uploaded_dress_count" in profile_data
+
+def test_api_delete_account(client: TestClient, db_session: Session, tmp_path, run_jobs):
+    """تست حذف حساب کاربری و فایل‌های لباس‌ها در صف کارها و گزارش وضعیت آن."""
+    from app.models.dress import Dress
+    from app.models.user import User
+
+    client.post("/api/v1/users/signup", json={"email": "bye@test.com", "password": "byebyepass"})
+    token = client.post(
+        "/api/v1/users/login",
+        data={"username": "bye@test.com", "password": "byebyepass"}
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    user = db_session.query(User).filter(User.email == "bye@test.com").first()
+    image_path = tmp_path / "dress.png"
+    image_path.write_bytes(b"png")
+    db_session.add(Dress(user_id=user.id, file_path=str(image_path), gender="male"))
+    db_session.commit()
+
+    response = client.delete("/api/v1/users/me", headers=headers)
+    assert response.status_code == 202
+    assert response.json()["status"] == "queued"
+    status_url = response.headers["location"]
+    assert client.delete("/api/v1/users/me", headers=headers).json()["job_id"] == response.json()["job_id"]
+
+    assert run_jobs() == 1
+    data = client.get(status_url).json()
+    assert data["status"] == "succeeded"
+    assert data["deleted_dress_count"] == 1
+    assert not image_path.exists()
+    assert client.get("/api/v1/users/profile", headers=headers).status_code == 401
+    assert client.get(f"/api/v1/users/deletions/{uuid.uuid4()}").status_code == 404
+
+
+def test_api_profile_conditional_get(client: TestClient, user_auth_headers: dict):
+    """تست ETag پروفایل و تغییر آن بعد از ویرایش."""
+    etag = client.get("/api/v1/users/profile", headers=user_auth_headers).headers["ETag"]
+
+    cached = client.get("/api/v1/users/profile", headers={**user_auth_headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    client.put("/api/v1/users/profile", json={"name": "Renamed"}, headers=user_auth_headers)
+    changed = client.get("/api/v1/users/profile", headers={**user_auth_headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["name"] == "Renamed"
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.core.shared_state import SharedState
+from app.services import cache_warmup, image_variants
+from app.services.access_tracker import SKETCH_BLOB_NAME, AccessTracker, CountMinSketch
+
+@pytest.fixture
+def state(tmp_path) -> SharedState:
+    return SharedState(str(tmp_path / "state.db"))
+
+def record_many(tracker: AccessTracker, counts: dict[str, int]) -> None:
+    for key, count in counts.items():
+        for _ in range(count):
+            tracker.record(key, "image")
+
+def test_sketch_never_underestimates():
+    sketch = CountMinSketch(64, 4)
+    for index in range(500):
+        sketch.add(f"dress-{index % 50}.png")
+    assert all(sketch.estimate(f"dress-{index}.png") >= 10 for index in range(50))
+
+def test_hottest_keeps_top_k(state, monkeypatch):
+    monkeypatch.setattr(settings, "ACCESS_SKETCH_TOP_K", 2)
+    tracker = AccessTracker(state)
+    record_many(tracker, {"a.png": 1, "b.png": 5, "c.png": 3})
+    assert [key for key, _ in tracker.hottest(10)] == ["b.png", "c.png"]
+
+def test_flush_merges_workers_and_survives_restart(state):
+    """دسترسی‌های چند worker در Sketch مشترک جمع می شوند و بعد از ری‌استارت در دسترس هستند."""
+    first, second = AccessTracker(state), AccessTracker(state)
+    record_many(first, {"a.png": 3, "b.png": 1})
+    record_many(second, {"b.png": 4})
+    first.flush()
+    second.flush()
+
+    restarted = AccessTracker(state)
+    restarted.load()
+    assert restarted.hottest(2) == [("b.png", 5), ("a.png", 3)]
+
+def test_flush_decays_old_counts(state, monkeypatch):
+    monkeypatch.setattr(settings, "ACCESS_SKETCH_HALF_LIFE_HOURS", 1.0)
+    tracker = AccessTracker(state)
+    record_many(tracker, {"a.png": 8})
+    tracker.flush()
+
+    # Sketch ذخیره شده را دو ساعت قدیمی‌تر می کنیم: دو نیمه‌عمر گذشته است
+    sketch, top, updated_at = tracker._decode(state.get_blob(SKETCH_BLOB_NAME))
+    state.update_blob(SKETCH_BLOB_NAME, lambda _: tracker._encode(sketch, top, updated_at - 7200))
+    tracker.flush()
+    assert tracker.hottest(1) == [("a.png", 2)]
+
+def test_warm_up_builds_variants_within_budget(state, tmp_path, monkeypatch):
+    storage = tmp_path / "storage"
+    storage.mkdir()
+    monkeypatch.setattr(settings, "STORAGE_PATH", str(storage))
+    for name in ("hot.png", "cold.png"):
+        Image.new("RGBA", (8, 8), (255, 0, 0, 255)).save(storage / name)
+    tracker = AccessTracker(state)
+    record_many(tracker, {"hot.png": 3, "cold.png": 1, "deleted.png": 2})
+
+    assert cache_warmup.warm_up(tracker, top_n=10, budget_seconds=0) == []
+
+    started = time.monotonic()
+    assert cache_warmup.warm_up(tracker, top_n=10, budget_seconds=30) == ["hot.png", "cold.png"]
+    assert time.monotonic() - started < 30
+    for variant in image_variants.enabled_formats():
+        assert os.path.exists(image_variants.variant_path(str(storage / "hot.png"), variant))
+
+def test_warmup_runs_once_until_interval_or_failure(state, monkeypatch):
+    """worker های بعدی گرم کردن موفق را تکرار نمی کنند؛ بعد از خطا یا پایان WARMUP_INTERVAL_SECONDS دوباره اجرا می شود."""
+    monkeypatch.setattr(cache_warmup, "shared_state", state)
+    runs = []
+
+    def fake_warm_up():
+        runs.append(1)
+        if len(runs) == 2:
+            raise RuntimeError("disk error")
+        return []
+
+    monkeypatch.setattr(cache_warmup, "warm_up", fake_warm_up)
+    cache_warmup.start_warmup().join()
+    cache_warmup.start_warmup().join()
+    assert len(runs) == 1
+
+    state.clear_lease("cache-warmup")
+    cache_warmup.start_warmup().join()
+    cache_warmup.start_warmup().join()
+    assert len(runs) == 3
+
+    monkeypatch.setattr(settings, "WARMUP_INTERVAL_SECONDS", 0)
+    state.clear_lease("cache-warmup")
+    cache_warmup.start_warmup().join()
+    cache_warmup.start_warmup().join()
+    assert len(runs) == 5
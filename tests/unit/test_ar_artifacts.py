@@ -0,0 +1,61 @@
+import os
+import time
+
+import anyio
+import pytest
+
+from app.core.config import settings
+from app.services.ar_artifacts import artifact_store
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AR_OUTPUT_PATH", str(tmp_path))
+    monkeypatch.setattr(settings, "AR_OUTPUT_MAX_AGE_HOURS", 1.0)
+    monkeypatch.setattr(settings, "AR_OUTPUT_MAX_TOTAL_MB", 1)
+    return tmp_path
+
+def make_session(output_dir, session_id: str, size: int, age_seconds: float) -> None:
+    path = output_dir / session_id
+    path.mkdir()
+    (path / "tryon.mjpg").write_bytes(b"x" * size)
+    mtime = time.time() - age_seconds
+    os.utime(path / "tryon.mjpg", (mtime, mtime))
+    os.utime(path, (mtime, mtime))
+
+def test_retention_removes_old_then_oldest_over_size(output_dir):
+    """جلسات قدیمی‌تر از سقف سن، و سپس قدیمی‌ترین‌ها تا زیر سقف حجم، حذف می شوند؛ جلسه در حال اجرا نه."""
+    make_session(output_dir, "expired", 10, age_seconds=7200)
+    make_session(output_dir, "running-old", 10, age_seconds=7200)
+    make_session(output_dir, "older", 600 * 1024, age_seconds=600)
+    make_session(output_dir, "newer", 600 * 1024, age_seconds=60)
+
+    removed = artifact_store.apply_retention(running={"running-old"})
+
+    assert removed == ["expired", "older"]
+    assert sorted(os.listdir(output_dir)) == ["newer", "running-old"]
+
+def test_list_and_resolve_hide_temp_files(output_dir):
+    path = output_dir / "session"
+    path.mkdir()
+    (path / "frame_0000.jpg").write_bytes(b"jpeg")
+    (path / ".frame_0001.jpg.tmp").write_bytes(b"partial")
+    (path / ".engine.log").write_bytes(b"log")
+
+    assert [artifact.name for artifact in artifact_store.list_artifacts("session")] == ["frame_0000.jpg"]
+    assert artifact_store.resolve("session", "frame_0000.jpg") is not None
+    assert artifact_store.resolve("session", ".engine.log") is None
+    assert artifact_store.resolve("session", "../../etc/passwd") is None
+
+def test_follow_stops_after_max_follow_time(output_dir, monkeypatch):
+    """فایل جلسه‌ای که هرگز تمام نمی شود فقط تا AR_ARTIFACT_MAX_FOLLOW_SECONDS دنبال می شود."""
+    monkeypatch.setattr(settings, "AR_ARTIFACT_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "AR_ARTIFACT_MAX_FOLLOW_SECONDS", 0.2)
+    path = output_dir / "tryon.mjpg"
+    path.write_bytes(b"frame")
+
+    async def read_all() -> bytes:
+        return b"".join([chunk async for chunk in artifact_store.follow(str(path), lambda: True)])
+
+    started = time.monotonic()
+    assert anyio.run(read_all) == b"frame"
+    assert time.monotonic() - started < 5
@@ -0,0 +1,115 @@
+import pytest
+from PIL import Image
+
+from app.services.dress_service import dress_service, TARGET_SIZE
+from app.services.image_ingest import INGEST_PROFILES, get_ingest_profile
+
+@pytest.mark.parametrize("profile_name", sorted(INGEST_PROFILES))
+@pytest.mark.parametrize("mode, fmt", [("RGB", "JPEG"), ("RGBA", "PNG"), ("P", "PNG"), ("L", "PNG")])
+def test_normalize_image_profiles(tmp_path, profile_name, mode, fmt):
+    """همه پروفایل‌ها باید PNG با ابعاد ۵۱۲×۵۱۲ و کانال آلفا تولید کنند."""
+    source = tmp_path / f"source.{fmt.lower()}"
+    Image.new(mode, (1200, 900)).save(source, fmt)
+    target = tmp_path / "target.png"
+
+    dress_service.normalize_image(str(source), str(target), get_ingest_profile(profile_name))
+
+    with Image.open(target) as img:
+        assert img.format == "PNG"
+        assert img.size == TARGET_SIZE
+        assert img.mode == "RGBA"
+
+@pytest.mark.parametrize("mode, transparency", [("RGB", None), ("L", None), ("RGB", (255, 255, 255)), ("L", 255)])
+def test_normalize_image_matches_convert_then_resize(tmp_path, mode, transparency):
+    """خروجی با روش قبلی (تبدیل به RGBA و سپس ریسایز) پیکسل به پیکسل یکسان است، حتی با رنگ شفاف tRNS."""
+    source = tmp_path / "source.png"
+    image = Image.new(mode, (300, 200), "white")
+    image.paste(Image.new(mode, (120, 80), "black"), (90, 60))
+    image.save(source, "PNG", **({"transparency": transparency} if transparency is not None else {}))
+    target = tmp_path / "target.png"
+
+    dress_service.normalize_image(str(source), str(target), get_ingest_profile("balanced"))
+
+    with Image.open(source) as img:
+        expected = img.convert("RGBA").resize(TARGET_SIZE, Image.Resampling.LANCZOS)
+    with Image.open(target) as img:
+        assert img.tobytes() == expected.tobytes()
+
+def test_remove_stored_files_removes_variants(tmp_path):
+    """حذف تصویر لباس، نسخه‌های WebP/AVIF ساخته شده کنار آن را هم پاک می کند."""
+    png = tmp_path / "dress.png"
+    Image.new("RGBA", TARGET_SIZE).save(png)
+    (tmp_path / "dress.webp").write_bytes(b"webp")
+    (tmp_path / "dress.avif").write_bytes(b"avif")
+
+    assert dress_service.remove_stored_files([str(png), str(tmp_path / "missing.png")]) == 1
+    assert list(tmp_path.iterdir()) == []
+
+def test_remove_orphaned_raw_files(db_session, test_user, tmp_path, monkeypatch):
+    """فایل خام قدیمی بدون لباس در حال پردازش حذف می شود؛ فایل لباس در حال پردازش و فایل تازه می مانند."""
+    import os
+    import time
+    import uuid
+    from app.core.config import settings
+    from app.models.dress import Dress
+
+    monkeypatch.setattr(settings, "RAW_UPLOAD_PATH", str(tmp_path))
+    pending = Dress(user_id=test_user.id, file_path="storage/dresses/p.png", gender="male", status="processing")
+    db_session.add(pending)
+    db_session.commit()
+    old = time.time() - 7200
+    kept, orphan, young = f"{pending.id}.jpg", f"{uuid.uuid4()}.png", f"{uuid.uuid4()}.png"
+    for name in (kept, orphan, young):
+        (tmp_path / name).write_bytes(b"raw")
+    for name in (kept, orphan):
+        os.utime(tmp_path / name, (old, old))
+
+    assert dress_service.remove_orphaned_raw_files(db_session, min_age_seconds=3600) == [orphan]
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([kept, young])
+
+def test_finalize_keeps_staged_upload_after_transient_failure(tmp_path, monkeypatch):
+    """اگر ثبت لباس با خطای گذرا شکست بخورد، داده‌های آپلود تکه‌ای حفظ و finalize دوباره موفق می شود."""
+    import io
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.core.config import settings
+    from app.db.base import Base
+    from app.models.user import User
+    from app.schemas.dress import ResumableUploadCreate
+    from app.services import dress_service as dress_module
+    from app.services.resumable_upload_service import resumable_upload_service
+
+    monkeypatch.setattr(settings, "UPLOAD_STAGING_PATH", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "RAW_UPLOAD_PATH", str(tmp_path / "raw"))
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "red").save(buffer, "PNG")
+    data = buffer.getvalue()
+
+    # دیتابیس جداگانه؛ rollback بعد از خطا نباید تراکنش تست را از بین ببرد
+    engine = create_engine(f"sqlite:///{tmp_path / 'uploads.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = User(email="resume@example.com", password_hash="-", role="user")
+        db.add(user)
+        db.commit()
+        upload = resumable_upload_service.create_upload(
+            user, ResumableUploadCreate(filename="shirt.png", content_type="image/png", length=len(data), gender="male")
+        )
+        meta, lock = resumable_upload_service.begin_chunk(upload.upload_id, user, 0)
+        resumable_upload_service.append(upload.upload_id, meta, data, lock)
+        resumable_upload_service.end_chunk(upload.upload_id, meta, lock)
+
+        def locked_database(*args, **kwargs):
+            raise RuntimeError("database is locked")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(dress_module.stats_service, "dress_added", locked_database)
+            with pytest.raises(RuntimeError):
+                resumable_upload_service.finalize(db, upload.upload_id, user)
+        assert resumable_upload_service.get_status(upload.upload_id, user).offset == len(data)
+        assert list((tmp_path / "raw").iterdir()) == []
+
+        dress = resumable_upload_service.finalize(db, upload.upload_id, user)
+        assert dress.status == "processing"
+        assert list((tmp_path / "uploads").iterdir()) == []
+    engine.dispose()
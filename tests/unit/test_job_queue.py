@@ -0,0 +1,87 @@
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job
+from app.services.job_queue import PermanentJobError, job_queue
+
+@pytest.fixture
+def queue_db(tmp_path):
+    """Session روی یک دیتابیس جداگانه؛ rollback بعد از شکست کار نباید تراکنش تست را از بین ببرد."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Job.__table__.create(engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+@pytest.fixture
+def flaky_handler(monkeypatch):
+    """یک handler آزمایشی که تا چند بار اول شکست می خورد."""
+    monkeypatch.setattr(job_queue, "_handlers", dict(job_queue._handlers))
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 0.0)
+    calls, failures = [], []
+
+    def run(db: Session, payload: dict):
+        calls.append(payload)
+        if payload.get("permanent"):
+            raise PermanentJobError("broken input")
+        if len(calls) <= payload["fail_times"]:
+            raise RuntimeError("temporary")
+        return {"calls": len(calls)}
+
+    job_queue.register("test.flaky", run, lambda db, payload, error: failures.append(error))
+    return calls, failures
+
+def test_job_is_retried_until_it_succeeds(queue_db: Session, flaky_handler):
+    """کار ناموفق با Backoff دوباره در صف قرار می گیرد و در نهایت succeeded می شود."""
+    job = job_queue.enqueue(queue_db, "test.flaky", {"fail_times": 2}, max_attempts=3)
+    queue_db.commit()
+
+    assert job_queue.run_pending(queue_db) == 3
+    queue_db.refresh(job)
+    assert (job.status, job.attempts, job.result) == ("succeeded", 3, {"calls": 3})
+    assert job_queue.claim(queue_db) is None
+
+def test_job_fails_after_max_attempts_or_permanent_error(queue_db: Session, flaky_handler):
+    """اتمام تلاش‌ها یا PermanentJobError کار را failed و hook شکست را اجرا می کند."""
+    calls, failures = flaky_handler
+    exhausted = job_queue.enqueue(queue_db, "test.flaky", {"fail_times": 5}, max_attempts=2)
+    permanent = job_queue.enqueue(queue_db, "test.flaky", {"permanent": True}, max_attempts=5)
+    queue_db.commit()
+
+    job_queue.run_pending(queue_db)
+    queue_db.refresh(exhausted)
+    queue_db.refresh(permanent)
+    assert (exhausted.status, exhausted.attempts) == ("failed", 2)
+    assert (permanent.status, permanent.attempts) == ("failed", 1)
+    assert len(failures) == 2 and "PermanentJobError" in permanent.last_error
+
+def test_long_running_job_keeps_its_lease(queue_db: Session, monkeypatch):
+    """کاری که بیش از JOB_LEASE_SECONDS طول می کشد با Heartbeat در اختیار همان worker می ماند."""
+    monkeypatch.setattr(job_queue, "_handlers", dict(job_queue._handlers))
+    monkeypatch.setattr(settings, "JOB_LEASE_SECONDS", 0.3)
+    reclaimed = []
+
+    def run(db: Session, payload: dict):
+        time.sleep(0.6)
+        with Session(db.get_bind()) as other:
+            reclaimed.append(job_queue.claim(other))
+
+    job_queue.register("test.slow", run)
+    job = job_queue.enqueue(queue_db, "test.slow", {})
+    queue_db.commit()
+
+    assert job_queue.run_pending(queue_db) == 1
+    queue_db.refresh(job)
+    assert reclaimed == [None]
+    assert (job.status, job.attempts) == ("succeeded", 1)
+
+def test_retry_delay_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_RETRY_BASE_SECONDS", 2.0)
+    monkeypatch.setattr(settings, "JOB_RETRY_MAX_SECONDS", 60.0)
+    assert 1.6 <= job_queue.retry_delay(1) <= 2.4
+    assert 6.4 <= job_queue.retry_delay(3) <= 9.6
+    assert job_queue.retry_delay(20) <= 72.0
@@ -0,0 +1,94 @@
+import uuid
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from app.db.migrations import LATEST_VERSION, current_version, pending_migrations, upgrade
+from app.models.dress import Dress
+from app.models.stats import DressDailyStat
+
+def test_upgrade_creates_schema_and_is_idempotent(tmp_path):
+    """تست اعمال مهاجرت‌ها روی دیتابیس خالی و عدم اعمال دوباره."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+    applied = upgrade(engine)
+    assert [migration.version for migration in applied] == list(range(1, LATEST_VERSION + 1))
+    assert {"users", "dresses", "schema_migrations"} <= set(inspect(engine).get_table_names())
+    assert pending_migrations(engine) == []
+
+    assert upgrade(engine) == []
+    with engine.connect() as conn:
+        assert current_version(conn) == LATEST_VERSION
+
+# شِمای نسخه اولیه (قبل از صف کارها): بدون ستون dresses.status و بدون جدول jobs
+_LEGACY_DDL = [
+    """CREATE TABLE users (
+        id CHAR(32) NOT NULL,
+        name VARCHAR,
+        email VARCHAR NOT NULL,
+        password_hash VARCHAR NOT NULL,
+        gender VARCHAR(6),
+        role VARCHAR(5) NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id)
+    )""",
+    "CREATE UNIQUE INDEX ix_users_email ON users (email)",
+    "CREATE INDEX ix_users_name ON users (name)",
+    """CREATE TABLE dresses (
+        id CHAR(32) NOT NULL,
+        user_id CHAR(32) NOT NULL,
+        file_path VARCHAR NOT NULL,
+        gender VARCHAR(6) NOT NULL,
+        title VARCHAR,
+        width INTEGER NOT NULL,
+        height INTEGER NOT NULL,
+        created_at DATETIME,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id) REFERENCES users (id)
+    )""",
+    "CREATE INDEX ix_dresses_title ON dresses (title)",
+]
+
+def test_upgrade_adopts_legacy_database(tmp_path):
+    """دیتابیس ساخته شده با شِمای اولیه (create_all قدیمی) ستون status و جدول jobs را می گیرد و لباس‌ها ready می شوند."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    user_id, dress_id = uuid.uuid4(), uuid.uuid4()
+    with engine.begin() as conn:
+        for statement in _LEGACY_DDL:
+            conn.execute(text(statement))
+        conn.execute(
+            text("INSERT INTO users (id, email, password_hash, role) VALUES (:id, 'old@test.com', 'x', 'user')"),
+            {"id": user_id.hex},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO dresses (id, user_id, file_path, gender, width, height, created_at) "
+                "VALUES (:id, :user_id, 'storage/dresses/old.png', 'female', 512, 512, '2024-05-01 10:00:00.000000')"
+            ),
+            {"id": dress_id.hex, "user_id": user_id.hex},
+        )
+
+    assert pending_migrations(engine)[0].version == 1
+    upgrade(engine)
+    assert pending_migrations(engine) == []
+
+    inspector = inspect(engine)
+    assert "jobs" in inspector.get_table_names()
+    assert "status" in {column["name"] for column in inspector.get_columns("dresses")}
+    with Session(engine) as db:
+        dress = db.get(Dress, dress_id)
+        assert (dress.status, dress.user_id) == ("ready", user_id)
+        assert db.query(DressDailyStat).one().dress_count == 1
+
+def test_importing_app_does_not_touch_database():
+    """import کردن main نباید جدولی بسازد یا کتابخانه‌های سنگین را بارگذاری کند."""
+    import subprocess, sys, os
+
+    code = (
+        "import sys, main; "
+        "heavy = [m for m in ('PIL', 'passlib', 'jose') if m in sys.modules]; "
+        "print(','.join(heavy))"
+    )
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    result = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ""
@@ -0,0 +1,36 @@
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.query_stats import track_queries
+
+def test_track_queries_counts_statements(db_session: Session):
+    """تست شمارش کوئری‌ها در یک بلوک."""
+    with track_queries("unit") as stats:
+        db_session.execute(text("SELECT 1"))
+        db_session.execute(text("SELECT 2"))
+    assert stats.count == 2
+    assert stats.total_ms >= 0
+
+def test_repeated_statement_is_reported_as_n_plus_one(db_session: Session, caplog, monkeypatch):
+    """تکرار یک عبارت SQL بیش از آستانه باید به عنوان N+1 لاگ شود (فقط یک بار)."""
+    monkeypatch.setattr(settings, "SQL_N_PLUS_ONE_THRESHOLD", 3)
+    with caplog.at_level(logging.WARNING, logger="app.sql"), track_queries("/api/v1/dresses/"):
+        for _ in range(5):
+            db_session.execute(text("SELECT 1"))
+    messages = [record.getMessage() for record in caplog.records if "N+1" in record.getMessage()]
+    assert len(messages) == 1
+    assert "/api/v1/dresses/" in messages[0]
+
+def test_failed_statement_does_not_leak_start_time(db_session: Session):
+    """زمان شروع دستور ناموفق از اتصال برداشته می شود تا زمان‌سنجی دستورهای بعدی درست بماند."""
+    connection = db_session.connection()
+    with pytest.raises(OperationalError):
+        db_session.execute(text("SELECT * FROM missing_table"))
+    assert connection.info.get("query_started_at") == []
+    db_session.execute(text("SELECT 1"))
+    assert connection.info.get("query_started_at") == []
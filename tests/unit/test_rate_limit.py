@@ -0,0 +1,36 @@
+import pytest
+
+from app.core import rate_limit
+from app.core.rate_limit import MemoryStorage, RateLimitRule, SharedStorage
+
+
+def test_rule_parsing():
+    rule = RateLimitRule.parse("30/minute")
+    assert rule.capacity == 30
+    assert rule.refill_per_second == 0.5
+    assert RateLimitRule.parse("2/seconds").refill_per_second == 2
+    with pytest.raises(ValueError):
+        RateLimitRule.parse("10 per minute")
+
+def test_memory_bucket_burst_and_refill(monkeypatch):
+    """بعد از مصرف ظرفیت، درخواست رد می شود تا زمانی که توکن دوباره پر شود."""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    storage, rule = MemoryStorage(), RateLimitRule.parse("2/second")
+
+    assert storage.take("k", rule)[0]
+    assert storage.take("k", rule)[0]
+    allowed, tokens = storage.take("k", rule)
+    assert not allowed
+    assert rule.retry_after(tokens) == pytest.approx(0.5)
+
+    now[0] += 0.5
+    assert storage.take("k", rule)[0]
+    assert storage.take("other", rule)[0]
+
+def test_shared_bucket_is_common_to_storage_instances():
+    """دو ذخیره‌سازی مشترک (مثل دو worker) از یک Bucket برداشت می کنند."""
+    rule = RateLimitRule.parse("3/hour")
+    first, second = SharedStorage(), SharedStorage()
+    results = [storage.take("rate:test:shared", rule)[0] for storage in (first, second, first, second)]
+    assert results == [True, True, True, False]
@@ -0,0 +1,129 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import anyio
+import pytest
+
+from app.core.shared_state import SharedState, _pid_alive
+from app.services.version_stamps import VersionStamps
+
+
+def _increment_many(path: str, times: int) -> None:
+    state = SharedState(path)
+    for _ in range(times):
+        state.incr("hits")
+
+
+def test_counters_are_shared_between_processes(tmp_path):
+    """افزایش همزمان یک شمارنده از چند فرآیند نباید هیچ افزایشی را گم کند."""
+    path = str(tmp_path / "state.db")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_increment_many, args=(path, 50)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+    assert SharedState(path).get("hits") == 200
+
+def test_lease_is_exclusive_until_released_or_expired(tmp_path):
+    """قفلی که مالکش کرش کرده (و آزادش نکرده) بعد از انقضا به مالک جدید می رسد."""
+    state = SharedState(str(tmp_path / "state.db"))
+    assert state.try_acquire_lease("upload", "a", ttl_seconds=60)
+    assert state.try_acquire_lease("upload", "a", ttl_seconds=60)
+    assert not state.try_acquire_lease("upload", "b", ttl_seconds=60)
+    state.release_lease("upload", "b")
+    assert not state.try_acquire_lease("upload", "b", ttl_seconds=60)
+    state.release_lease("upload", "a")
+    assert state.try_acquire_lease("upload", "b", ttl_seconds=0)
+    assert state.try_acquire_lease("upload", "c", ttl_seconds=60)
+    state.clear_lease("upload")
+    assert state.try_acquire_lease("upload", "d", ttl_seconds=60)
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/stat"), reason="needs /proc")
+def test_zombie_process_is_not_alive():
+    """فرآیند تمام شده‌ای که هنوز wait نشده (Zombie) زنده حساب نمی شود."""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    try:
+        deadline = time.monotonic() + 10
+        while _pid_alive(process.pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not _pid_alive(process.pid)
+        assert _pid_alive(os.getpid())
+    finally:
+        process.wait()
+
+def test_ar_session_limit_and_dead_process_cleanup(tmp_path):
+    """جلسه‌ای که فرآیندش تمام شده دیگر در سقف جلسات همزمان حساب نمی شود."""
+    state = SharedState(str(tmp_path / "state.db"))
+    user_id, dress_id = str(uuid.uuid4()), str(uuid.uuid4())
+    assert state.reserve_ar_session("first", user_id, dress_id, limit=1)
+    state.attach_ar_process("first", os.getpid())
+    assert not state.reserve_ar_session("second", user_id, dress_id, limit=1)
+
+    # PID ای که وجود ندارد
+    state.attach_ar_process("first", 2 ** 22 + 12345)
+    assert state.reserve_ar_session("second", user_id, dress_id, limit=1)
+    assert state.get_ar_session("first")["ended_at"] is not None
+    assert state.get_ar_session("second")["user_id"] == user_id
+
+def test_published_events_are_dispatched_to_subscribers(tmp_path):
+    publisher = SharedState(str(tmp_path / "state.db"))
+    subscriber = SharedState(str(tmp_path / "state.db"))
+    received = []
+    subscriber._subscribers["user-data"] = [received.append]
+
+    cursor = subscriber.last_seq()
+    publisher.publish("user-data", {"user_id": "a"})
+    publisher.publish("other", {"ignored": True})
+    cursor = subscriber.dispatch_pending(cursor)
+
+    assert received == [{"user_id": "a"}]
+    assert subscriber.dispatch_pending(cursor) == cursor
+    assert received == [{"user_id": "a"}]
+
+def test_dispatch_returns_last_delivered_seq(tmp_path):
+    """پیامی که در حین dispatch (بعد از خواندن پیام‌ها) منتشر شود در دور بعد تحویل می شود."""
+    state = SharedState(str(tmp_path / "state.db"))
+    received = []
+
+    def publish_during_dispatch(payload):
+        received.append(payload)
+        if payload == {"n": 1}:
+            state.publish("user-data", {"n": 2})
+
+    state._subscribers["user-data"] = [publish_during_dispatch]
+    state.publish("user-data", {"n": 1})
+
+    cursor = state.dispatch_pending(0)
+    assert received == [{"n": 1}]
+    state.dispatch_pending(cursor)
+    assert received == [{"n": 1}, {"n": 2}]
+
+def test_wait_for_change_wakes_on_bump_from_any_worker(tmp_path):
+    """منتظر با bump همین فرآیند فوراً و با bump فرآیند دیگر از طریق پیام Broadcast بیدار می شود."""
+    path = str(tmp_path / "state.db")
+    stamps, other_worker = VersionStamps(SharedState(path)), VersionStamps(SharedState(path))
+    user_id = uuid.uuid4()
+
+    async def wait_while(bump) -> float:
+        version = stamps.get(user_id)
+        started = time.monotonic()
+        async with anyio.create_task_group() as group:
+            async def bump_later() -> None:
+                await anyio.sleep(0.1)
+                await anyio.to_thread.run_sync(bump, user_id)
+            group.start_soon(bump_later)
+            assert await stamps.wait_for_change(user_id, version, 10)
+        return time.monotonic() - started
+
+    async def main() -> None:
+        assert await wait_while(stamps.bump) < 1
+        assert await wait_while(other_worker.bump) < 5
+        assert not await stamps.wait_for_change(user_id, stamps.get(user_id), 0.1)
+
+    anyio.run(main)
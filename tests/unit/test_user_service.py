@@ -32,4 +32,54 @@ def test_authenticate_failure(db_session: Session):
     user_login = UserLogin(email="fail@example.com", password="wrongpass")
     authenticated_user = user_service.authenticate(db_session, user_login)
     
-    assert authenticated_user is None
\ No newline at end of file
+    assert authenticated_user is None
+
+def test_delete_user_removes_dresses_in_batches(db_session: Session):
+    """تست حذف دسته‌ای لباس‌ها همراه با حساب کاربری."""
+    from app.models.user import User
+    from app.models.dress import Dress
+
+    user = user_service.create_user(db_session, UserCreate(email="delete@example.com", password="deletepass"))
+    for i in range(5):
+        db_session.add(Dress(user_id=user.id, file_path=f"storage/dresses/missing-{i}.png", gender="female"))
+    db_session.commit()
+
+    user_id = user.id
+    file_paths = user_service.delete_user(db_session, user_id, batch_size=2)
+
+    assert len(file_paths) == 5
+    assert db_session.query(Dress).filter(Dress.user_id == user_id).count() == 0
+    assert db_session.query(User).filter(User.id == user_id).first() is None
+
+def test_failed_account_deletion_is_requeued(tmp_path, monkeypatch):
+    """بعد از failed شدن کار حذف حساب، درخواست دوباره همان کار را با تلاش‌های تازه اجرا می کند."""
+    from sqlalchemy import create_engine
+    from app.core.config import settings
+    from app.db.base import Base
+    from app.models.user import User
+    from app.services.job_queue import job_queue
+
+    # دیتابیس جداگانه؛ rollback بعد از شکست کار نباید تراکنش تست را از بین ببرد
+    engine = create_engine(f"sqlite:///{tmp_path / 'deletion.db'}")
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(settings, "JOB_MAX_ATTEMPTS", 1)
+    with Session(engine) as db:
+        user = user_service.create_user(db, UserCreate(email="retry@example.com", password="retrypass"))
+        user_id = user.id
+
+        def broken_delete(*args, **kwargs):
+            raise RuntimeError("database is locked")
+
+        monkeypatch.setattr(user_service, "delete_user", broken_delete)
+        job = user_service.request_account_deletion(db, user)
+        assert job_queue.run_pending(db) == 1
+        assert job.status == "failed"
+
+        monkeypatch.undo()
+        retried = user_service.request_account_deletion(db, db.get(User, user_id))
+        assert (retried.id, retried.status, retried.attempts) == (job.id, "queued", 0)
+        assert job_queue.run_pending(db) == 1
+        db.refresh(retried)
+        assert retried.status == "succeeded"
+        assert db.get(User, user_id) is None
+    engine.dispose()